@@ -0,0 +1,56 @@
+"""Benchmark del coste de importación de la integración.
+
+Importa cada módulo de la integración en un intérprete limpio con `-X importtime`
+y muestra el tiempo acumulado del propio paquete y las dependencias más pesadas.
+Home Assistant tiene que estar instalado en el entorno.
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/import_time.py [--runs 5] [--top 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.octopus_spain_intelligent"
+MODULES = ["", ".config_flow", ".sensor", ".select", ".button", ".switch"]
+
+
+def _import_profile(module: str) -> dict[str, int]:
+    """Devuelve {módulo: µs acumulados} para una importación en frío."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for suffix in MODULES:
+        module = PACKAGE + suffix
+        runs = [_import_profile(module) for _ in range(args.runs)]
+        own = [r.get(module, 0) for r in runs]
+        print(f"{module}: mediana {statistics.median(own) / 1000:.1f} ms (min {min(own) / 1000:.1f} ms)")
+
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[: args.top]
+    print(f"\nImportaciones más pesadas de {module}:")
+    for name, cumulative in heaviest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
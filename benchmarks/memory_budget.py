@@ -0,0 +1,244 @@
+"""Presupuesto de memoria por cuenta y por dispositivo a lo largo de 1000 refrescos.
+
+Ejecuta los dos coordinadores reales (inteligente y horario, con el cliente compartido)
+contra un transporte sintético: cada refresco trae un estado de dispositivo nuevo, el
+control inteligente se suspende y reanuda cada 10 refrescos y el token se renueva cada
+100. Con `tracemalloc` comprueba que:
+
+- la memoria retenida no crece con los refrescos (fugas), por cuenta;
+- la memoria que retiene la integración tras los refrescos cabe en un presupuesto por cuenta
+  (el historial de demanda de un año, descargado en páginas, tiene el suyo);
+- ninguna entidad guarda una copia o referencia a los diccionarios de dispositivo del
+  snapshot, solo IDs (se leen siempre del snapshot compartido del coordinador).
+
+Sale con código 1 si se supera algún presupuesto. Home Assistant tiene que estar instalado.
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/memory_budget.py [--accounts 20] [--refreshes 1000]
+"""
+import argparse
+import asyncio
+import base64
+import gc
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import CoreState, HomeAssistant  # noqa: E402
+
+from custom_components.octopus_spain_intelligent.coordinator import (  # noqa: E402
+    OctopusHourlyCoordinator,
+    OctopusIntelligentCoordinator,
+)
+from custom_components.octopus_spain_intelligent.kraken_client import operation_info  # noqa: E402
+from custom_components.octopus_spain_intelligent.octopus_spain import OctopusSpain  # noqa: E402
+from custom_components.octopus_spain_intelligent.telemetry import Telemetry  # noqa: E402
+
+from platform_setup import FakeCoordinator, fleet, setup_platforms  # noqa: E402
+
+PACKAGE = str(Path(__file__).resolve().parent.parent / "custom_components" / "octopus_spain_intelligent")
+WARMUP_REFRESHES = 50  # Llenan los buffers circulares (trazas, spans) antes de medir
+TOKEN_ROTATION = 100
+SUSPEND_TOGGLE = 10
+
+GROWTH_BUDGET = 1024  # Bytes por cuenta (con un dispositivo) en todos los refrescos medidos
+FOOTPRINT_BUDGET = 48 * 1024  # Bytes retenidos por la integración por cuenta
+DEMAND_BUDGET = 256 * 1024  # Además, un año de demanda cuartohoraria por cuenta (`DemandHistory`)
+DEMAND_SLOT = timedelta(minutes=15)
+
+
+def _fake_token(serial: int) -> str:
+    payload = json.dumps({"exp": time.time() + 3600, "serial": serial}).encode()
+    return f"e30.{base64.urlsafe_b64encode(payload).decode().rstrip('=')}.firma"
+
+
+class SyntheticTransport:
+    """Responde como Kraken a las consultas del coordinador, sin red."""
+
+    def __init__(self, accounts: list[str]):
+        self.accounts = accounts
+        self.tick = 0
+        self._logins = 0
+
+    def _device(self, account: str) -> dict:
+        return {
+            "id": f"device-{account}",
+            "name": "Tesla Model 3",
+            "deviceType": "ELECTRIC_VEHICLES",
+            "status": {
+                "current": "LIVE",
+                "currentState": "SMART_CONTROL_CAPABLE",
+                "isSuspended": (self.tick // SUSPEND_TOGGLE) % 2 == 1,
+                "stateOfChargeLimit": {"isLimitViolated": False, "timestamp": f"t{self.tick}", "upperSocLimit": 80},
+            },
+            "make": "Tesla",
+            "model": "Model 3",
+            "alerts": [],
+            "chargePointVariant": {"model": "Tesla 3 Pin mains charger", "powerInKw": "2.400"},
+            "vehicleVariant": {"model": "Model 3 Long Range Dual Motor", "batterySize": "73.50"},
+            "preferences": {
+                "mode": "CHARGE",
+                "schedules": [
+                    {"dayOfWeek": day, "max": 80, "time": "08:00:00"}
+                    for day in ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY")
+                ],
+            },
+        }
+
+    @staticmethod
+    def _billing() -> dict:
+        statement = {"edges": [{"node": {
+            "amount": 4170, "consumptionStartDate": "2025-02-01", "consumptionEndDate": "2025-02-28", "issuedDate": "2025-03-03",
+        }}]}
+        return {"accountBillingInfo": {"ledgers": [
+            {"ledgerType": "SOLAR_WALLET_LEDGER", "statementsWithDetails": statement, "balance": 1250},
+            {"ledgerType": "SPAIN_ELECTRICITY_LEDGER", "statementsWithDetails": statement, "balance": 320},
+        ]}}
+
+    @staticmethod
+    def _demand_page(variables: dict) -> dict:
+        """Una página de lecturas cuartohorarias entre `startAt` y `endAt` (como mucho hasta ahora)."""
+        start = datetime.fromisoformat(variables["startAt"])
+        end = min(datetime.fromisoformat(variables["endAt"]), datetime.now(start.tzinfo))
+        total = max(0, int((end - start) / DEMAND_SLOT))
+        offset = int(variables["after"] or 0)
+        last = min(offset + variables["first"], total)
+        edges = []
+        for index in range(offset, last):
+            started = start + index * DEMAND_SLOT
+            edges.append({"node": {
+                "value": f"{0.1 + index % 96 / 200:.3f}",
+                "startAt": started.isoformat(),
+                "endAt": (started + DEMAND_SLOT).isoformat(),
+            }})
+        return {"account": {"properties": [{"measurements": {
+            "pageInfo": {"hasNextPage": last < total, "endCursor": str(last)},
+            "edges": edges,
+        }}]}}
+
+    async def execute_raw(self, query: str, variables: dict | None = None, headers: dict | None = None) -> bytes:
+        operation = operation_info(query)[1]
+        if operation == "obtainKrakenToken":
+            self._logins += 1
+            data = {"obtainKrakenToken": {"token": _fake_token(self._logins)}}
+        elif operation == "getAccountNames":
+            data = {"viewer": {"accounts": [{"number": account} for account in self.accounts]}}
+        elif operation == "devices":
+            data = {"devices": [self._device(variables["accountNumber"])]}
+        elif operation == "accountBillingInfo":
+            data = self._billing()
+        elif operation == "demandReadings":
+            data = self._demand_page(variables)
+        else:
+            data = {}
+        return json.dumps({"data": data}).encode()
+
+    async def close(self) -> None:
+        pass
+
+
+def _package_bytes(snapshot: tracemalloc.Snapshot) -> int:
+    """Memoria asignada desde algún marco de la integración."""
+    return sum(
+        trace.size for trace in snapshot.traces
+        if any(frame.filename.startswith(PACKAGE) for frame in trace.traceback)
+    )
+
+
+async def measure_refreshes(accounts: int, refreshes: int) -> dict:
+    numbers = [f"A-{index:08X}" for index in range(accounts)]
+    transport = SyntheticTransport(numbers)
+    api = OctopusSpain("bench@example.com", "-", telemetry=Telemetry(), cache_ttl=0, transport=transport)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.set_state(CoreState.running)
+        intelligent = OctopusIntelligentCoordinator(hass, "bench@example.com", "-", api=api)
+        hourly = OctopusHourlyCoordinator(hass, "bench@example.com", "-", api=api)
+        await intelligent.async_load_history()
+        await hourly.async_load_balances()
+
+        async def refresh() -> None:
+            transport.tick += 1
+            if transport.tick % TOKEN_ROTATION == 0:
+                api.invalidate_token()
+            await intelligent.async_refresh()
+            await hourly.async_refresh()
+
+        try:
+            for _ in range(WARMUP_REFRESHES):
+                await refresh()
+            tracemalloc.start(10)
+            gc.collect()
+            before = tracemalloc.take_snapshot()
+            for _ in range(refreshes):
+                await refresh()
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        finally:
+            await api.close()
+            await hass.async_stop(force=True)
+
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "growth_per_account": growth / accounts,
+        "footprint_per_account": _package_bytes(after) / accounts,
+        "last_update_success": intelligent.last_update_success and hourly.last_update_success,
+    }
+
+
+def entities_holding_devices(devices: int) -> list[str]:
+    """Entidades que guardan alguno de los diccionarios de dispositivo del snapshot."""
+    coordinator = FakeCoordinator(fleet(devices))
+    entities = asyncio.run(setup_platforms(coordinator))
+    device_dicts = {
+        id(device)
+        for account_data in coordinator.data.values()
+        for device in account_data["devices"]
+    }
+    return [
+        f"{type(entity).__name__}.{name}"
+        for entity in entities
+        for name, value in vars(entity).items()
+        if id(value) in device_dicts
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--refreshes", type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    result = asyncio.run(measure_refreshes(args.accounts, args.refreshes))
+    holders = entities_holding_devices(args.accounts)
+
+    failures = []
+    if not result["last_update_success"]:
+        failures.append("el último refresco ha fallado")
+    if result["growth_per_account"] > GROWTH_BUDGET:
+        failures.append(f"crecimiento {result['growth_per_account']:.0f} B/cuenta > {GROWTH_BUDGET} B")
+    if result["footprint_per_account"] > FOOTPRINT_BUDGET + DEMAND_BUDGET:
+        failures.append(f"memoria retenida {result['footprint_per_account']:.0f} B/cuenta > {FOOTPRINT_BUDGET + DEMAND_BUDGET} B")
+    if holders:
+        failures.append(f"entidades con el dispositivo completo: {sorted(set(holders))}")
+
+    print(f"{'cuentas':>8} {'refrescos':>10} {'crecimiento B/cuenta':>21} {'retenido B/cuenta':>18}")
+    print(f"{args.accounts:>8} {args.refreshes:>10} {result['growth_per_account']:>21.0f} {result['footprint_per_account']:>18.0f}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Benchmark del alta de plataformas con flotas de vehículos simuladas.
+
+Ejecuta `async_setup_entry` de las plataformas sensor, select, button y switch para 1, 10,
+100 y 500 vehículos (una cuenta por vehículo) y mide el tiempo de alta y la memoria
+asignada por entidad con `tracemalloc`. Después simula un refresco del coordinador leyendo
+el estado de cada entidad, que es donde se nota si el coste por entidad crece con la flota.
+
+No se arranca Home Assistant: el coordinador es un doble con el mismo snapshot que el real
+y las entidades no se registran. Home Assistant tiene que estar instalado en el entorno.
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/platform_setup.py [--sizes 1 10 100 500]
+"""
+import argparse
+import asyncio
+import copy
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.octopus_spain_intelligent import button, select, sensor, switch  # noqa: E402
+from custom_components.octopus_spain_intelligent.const import CONF_EMAIL, CONF_PASSWORD, DOMAIN  # noqa: E402
+from custom_components.octopus_spain_intelligent.coordinator import OctopusBaseCoordinator  # noqa: E402
+from custom_components.octopus_spain_intelligent.sessions import ChargeSessionDetector  # noqa: E402
+from custom_components.octopus_spain_intelligent.telemetry import Telemetry  # noqa: E402
+
+PLATFORMS = (sensor, select, button, switch)
+
+DEVICE = {
+    "name": "Tesla Model 3",
+    "deviceType": "ELECTRIC_VEHICLES",
+    "make": "Tesla",
+    "model": "Model 3",
+    "alerts": [],
+    "chargePointVariant": {"model": "Tesla 3 Pin mains charger", "powerInKw": "2.400"},
+    "vehicleVariant": {"model": "Model 3 Long Range Dual Motor", "batterySize": "73.50"},
+    "preferences": {
+        "mode": "CHARGE",
+        "schedules": [{"dayOfWeek": day, "max": 80, "time": "08:00:00"} for day in select.DAY_TRANSLATION],
+    },
+    "status": {
+        "current": "LIVE",
+        "currentState": "SMART_CONTROL_IN_PROGRESS",
+        "isSuspended": False,
+        "stateOfChargeLimit": {"isLimitViolated": False, "timestamp": None, "upperSocLimit": 80},
+    },
+}
+BILLING = {
+    "solar_wallet": 12.5,
+    "octopus_credit": 3.2,
+    "last_invoice": {"amount": 41.7, "start": "2025-02-01", "end": "2025-02-28", "issued": "2025-03-03"},
+}
+
+
+class FakeCoordinator:
+    """Doble del coordinador con el snapshot y los métodos que leen las entidades."""
+
+    device = OctopusBaseCoordinator.device
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.telemetry = Telemetry()
+        self.sessions = ChargeSessionDetector()
+        self._device_index = (None, {})
+        self.last_update_success = True
+        self.api = None
+        self.outbox = SimpleNamespace(pending=[])
+
+    def history(self, device_id: str):
+        return None
+
+    def balance_history(self, account: str, key: str):
+        return None
+
+    def async_add_listener(self, update_callback):
+        return lambda: None
+
+
+def fleet(size: int) -> dict:
+    data = {}
+    for index in range(size):
+        device = copy.deepcopy(DEVICE)
+        device["id"] = f"00000000-0002-4000-805e-{index:012x}"
+        data[f"A-{index:08X}"] = {**BILLING, "devices": [device], "stale": False, "error": None}
+    return data
+
+
+async def setup_platforms(coordinator: FakeCoordinator) -> list:
+    entities = []
+    # La facturación usa el mismo snapshot; en HA es otro coordinador con el mismo cliente
+    hass = SimpleNamespace(data={DOMAIN: {"intelligent_coordinator": coordinator, "hourly_coordinator": coordinator}})
+    entry = SimpleNamespace(data={CONF_EMAIL: "bench@example.com", CONF_PASSWORD: "-"}, async_on_unload=lambda unsub: None)
+    for platform in PLATFORMS:
+        await platform.async_setup_entry(hass, entry, entities.extend)
+    return entities
+
+
+def read_states(entities: list) -> None:
+    """Lo que hace HA al escribir el estado de cada entidad tras un refresco."""
+    for entity in entities:
+        for attribute in ("native_value", "current_option", "is_on", "extra_state_attributes"):
+            getattr(entity, attribute, None)
+
+
+def run(size: int) -> dict:
+    coordinator = FakeCoordinator(fleet(size))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    entities = asyncio.run(setup_platforms(coordinator))
+    setup_s = time.perf_counter() - started
+    allocated = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    coordinator.data = dict(coordinator.data)  # Snapshot nuevo, como tras un refresco
+    started = time.perf_counter()
+    read_states(entities)
+    refresh_s = time.perf_counter() - started
+
+    return {
+        "devices": size,
+        "entities": len(entities),
+        "setup_ms": setup_s * 1000,
+        "us_per_entity": setup_s * 1e6 / len(entities),
+        "bytes_per_entity": allocated / len(entities),
+        "refresh_ms": refresh_s * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'vehículos':>9} {'entidades':>9} {'alta ms':>9} {'µs/entidad':>11} {'bytes/entidad':>14} {'refresco ms':>12}")
+    for size in args.sizes:
+        result = run(size)
+        print(
+            f"{result['devices']:>9} {result['entities']:>9} {result['setup_ms']:>9.1f} "
+            f"{result['us_per_entity']:>11.1f} {result['bytes_per_entity']:>14.0f} {result['refresh_ms']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Benchmark de filas y bytes que escribe el recorder en un día para un vehículo simulado.
+
+Simula un sondeo por minuto durante 24 h de un vehículo SmartFlex (cambios de estado,
+marca de tiempo del límite de SOC que avanza en cada lectura y una alerta a media mañana)
+y aplica el modelo del recorder: una fila en `states` por cada cambio de estado o de
+atributos grabados, y una fila en `state_attributes` por cada combinación de atributos
+que no se haya visto antes. Cuenta también los eventos `state_changed` (cualquier cambio
+de estado o de atributos, grabados o no). Compara la entidad única con todos los atributos
+(antes) con el reparto en entidades ligeras y atributos excluidos (después); el límite de
+SOC se lee de la entidad real.
+
+Uso (desde la raíz del repositorio, con Home Assistant instalado):
+
+    python benchmarks/recorder_footprint.py
+"""
+import copy
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.octopus_spain_intelligent.alerts import latest_alert  # noqa: E402
+from custom_components.octopus_spain_intelligent.sensor import (  # noqa: E402
+    DAY_TRANSLATION,
+    OctopusDevice,
+    OctopusSocLimitSensor,
+    traducir_current_state,
+    traducir_devicetype,
+    traducir_modo,
+    traducir_state,
+    vehicle_attributes,
+)
+
+from platform_setup import FakeCoordinator  # noqa: E402
+
+TICKS_PER_DAY = 24 * 60
+STATE_CHANGES = {0: "SMART_CONTROL_IN_PROGRESS", 7 * 60: "SMART_CONTROL_CAPABLE", 18 * 60: "BOOSTING", 19 * 60: "SMART_CONTROL_IN_PROGRESS"}
+
+DEVICE = {
+    "id": "00000000-0002-4000-805e-0000000009c6",
+    "name": "Tesla Model 3",
+    "deviceType": "ELECTRIC_VEHICLES",
+    "make": "Tesla",
+    "model": "Model 3",
+    "alerts": [],
+    "chargePointVariant": {"model": "Tesla 3 Pin mains charger", "powerInKw": "2.400"},
+    "vehicleVariant": {"model": "Model 3 Long Range Dual Motor", "batterySize": "73.50"},
+    "preferences": {
+        "mode": "CHARGE",
+        "schedules": [{"dayOfWeek": day, "max": 80, "time": "08:00:00"} for day in DAY_TRANSLATION],
+    },
+    "status": {
+        "current": "LIVE",
+        "currentState": "SMART_CONTROL_IN_PROGRESS",
+        "isSuspended": False,
+        "stateOfChargeLimit": {"isLimitViolated": False, "timestamp": None, "upperSocLimit": 80},
+    },
+}
+
+
+def legacy_attributes(device: dict) -> dict:
+    """Copia congelada de los atributos que `OctopusDevice` publicaba antes del reparto."""
+    status = device["status"]
+    limit = status["stateOfChargeLimit"]
+    return {
+        "deviceType": traducir_devicetype(device["deviceType"]),
+        "alerts": device["alerts"],
+        "Status": traducir_state(status["current"]),
+        "Current State": traducir_current_state(status["currentState"]),
+        "Is Suspended": status["isSuspended"],
+        "State of Charge Limit": f"{limit['upperSocLimit']}%",
+        "Timestamp": limit["timestamp"],
+        "isLimitViolated": "⚠️ Sí" if limit["isLimitViolated"] else "✅ No",
+        "Charge Point Model": device["chargePointVariant"]["model"],
+        "Charge Point Power (kW)": device["chargePointVariant"]["powerInKw"],
+        "Make": device["make"],
+        "Model": device["model"],
+        "Mode": traducir_modo(device["preferences"]["mode"]),
+        "BatterySize": device["vehicleVariant"]["batterySize"],
+        "Charge Schedules": [
+            f"{DAY_TRANSLATION[s['dayOfWeek']]}: {s['max']}% a las {s['time']}"
+            for s in device["preferences"]["schedules"]
+        ],
+    }
+
+
+def simulated_day(device: dict):
+    for minute in range(TICKS_PER_DAY):
+        if minute in STATE_CHANGES:
+            device["status"]["currentState"] = STATE_CHANGES[minute]
+        device["status"]["stateOfChargeLimit"]["timestamp"] = f"2025-03-18T{minute // 60:02d}:{minute % 60:02d}:00Z"
+        if minute == 10 * 60:
+            device["alerts"] = [{"message": "Vehículo desconectado del cargador", "publishedAt": "2025-03-18T10:00:00Z"}]
+        yield device
+
+
+class RecorderModel:
+    """Cuenta filas y bytes como el recorder: estados por cambio, atributos deduplicados."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.events = 0
+        self._last: dict[str, tuple] = {}
+        self._last_written: dict[str, tuple] = {}
+        self._seen_attributes: set[str] = set()
+
+    def write(self, entity_id: str, state, attributes: dict, unrecorded: frozenset = frozenset()) -> None:
+        written = (str(state), json.dumps(attributes, sort_keys=True, ensure_ascii=False))
+        if self._last_written.get(entity_id) != written:
+            self._last_written[entity_id] = written
+            self.events += 1
+        shared_attrs = json.dumps({k: v for k, v in attributes.items() if k not in unrecorded}, sort_keys=True, ensure_ascii=False)
+        current = (str(state), shared_attrs)
+        if self._last.get(entity_id) == current:
+            return
+        self._last[entity_id] = current
+        self.rows += 1
+        self.bytes += len(entity_id) + len(str(state))
+        if shared_attrs not in self._seen_attributes:
+            self._seen_attributes.add(shared_attrs)
+            self.rows += 1
+            self.bytes += len(shared_attrs.encode())
+
+
+def main() -> None:
+    before, after = RecorderModel(), RecorderModel()
+    device = copy.deepcopy(DEVICE)
+    coordinator = FakeCoordinator({"A-00000001": {"devices": [device]}})
+    soc_limit = OctopusSocLimitSensor("A-00000001", device["id"], coordinator)
+    for device in simulated_day(device):
+        status = device["status"]
+        before.write("sensor.vehiculo", status["currentState"], legacy_attributes(device))
+
+        device_attrs = {
+            "deviceType": traducir_devicetype(device["deviceType"]),
+            "alert_count": len(device["alerts"]),
+            "latest_alert": latest_alert(device["alerts"]),
+            "stale": False,
+        }
+        device_attrs.update(vehicle_attributes(device))
+        after.write("sensor.vehiculo", status["currentState"], device_attrs, OctopusDevice._unrecorded_attributes)
+        after.write("sensor.limite_de_soc", soc_limit.native_value, soc_limit.extra_state_attributes, soc_limit._unrecorded_attributes)
+        after.write("sensor.potencia_del_cargador", float(device["chargePointVariant"]["powerInKw"]), {})
+        after.write("switch.control_inteligente", "off" if status["isSuspended"] else "on", {})
+
+    print(f"{'':10} {'eventos/día':>12} {'filas/día':>10} {'bytes/día':>12}")
+    print(f"{'antes':10} {before.events:>12} {before.rows:>10} {before.bytes:>12}")
+    print(f"{'después':10} {after.events:>12} {after.rows:>10} {after.bytes:>12}")
+    print(f"reducción de bytes: {100 * (1 - after.bytes / before.bytes):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
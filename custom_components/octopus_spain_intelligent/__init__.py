@@ -1,51 +1,76 @@
-# """Balance Neto"""
-# from __future__ import annotations
-
-# from homeassistant.config_entries import ConfigEntry
-# from homeassistant.const import Platform
-# from homeassistant.core import HomeAssistant
-
-# from .const import DOMAIN
-
-# PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.SELECT]
-
-
-# async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-#     """Set up the integration from a config entry."""
-#     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-
-#     entry.async_on_unload(entry.add_update_listener(_async_update_options))
-#     return True
-
-
-# async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-#     """Unload a config entry."""
-#     return await hass.config_entries.async_unload_platforms(config_entry, PLATFORMS)
-
-
-# async def _async_update_options(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
-#     """Handle options update."""
-#     hass.config_entries.async_update_entry(
-#         config_entry, data={**config_entry.data, **config_entry.options}
-#     )
-#     await hass.config_entries.async_reload(config_entry.entry_id)
-
 """Octopus Spain integration for Home Assistant."""
 
+import asyncio
 import logging
+import re
+import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.const import Platform
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
 from homeassistant.config_entries import ConfigEntryNotReady
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.start import async_at_started
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD
-from .coordinator import OctopusIntelligentCoordinator
+from .const import (
+    DOMAIN, CONF_EMAIL, CONF_PASSWORD, CONF_TOKEN,
+    SERVICE_SUSPEND_SMART_CONTROL, SERVICE_CLEAR_SMART_CONTROL_WINDOWS, SERVICE_PLAN_CHARGING, SERVICE_PROFILE,
+    ATTR_DEVICE_ID, ATTR_START, ATTR_END,
+    ATTR_DEPARTURE, ATTR_MIN_SOC, ATTR_ARRIVAL_SOC, ATTR_PLUG_IN, ATTR_PRICES, ATTR_APPLY,
+    DEFAULT_PERIOD_PRICES, DEFAULT_ARRIVAL_SOC, DEFAULT_PLUG_IN, DEFAULT_CHARGE_POWER_KW, DEFAULT_BATTERY_KWH,
+    ATTR_DURATION, ATTR_INTERVAL, DEFAULT_PROFILE_DURATION, DEFAULT_PROFILE_INTERVAL,
+    SERVICE_ANALYZE_CONTRACTED_POWER, ATTR_ACCOUNT, ATTR_CONTRACTED_P1, ATTR_CONTRACTED_P2, ATTR_DAYS,
+)
+from .coordinator import OctopusHourlyCoordinator, OctopusIntelligentCoordinator
+from .entity import active_devices
+from .maximeter import HISTORY_DAYS as DEMAND_HISTORY_DAYS, ROLLING_DAYS
+from .planner import DAYS, plan_week
+from .profiling import MAX_DURATION as MAX_PROFILE_DURATION, ProfileSession, active as active_profile
+from .scheduler import SmartControlScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
 
-PLATFORMS: list[Platform] = [Platform.SENSOR,Platform.SELECT,Platform.BUTTON]
+PLATFORMS: list[Platform] = [Platform.SENSOR,Platform.SELECT,Platform.BUTTON,Platform.SWITCH]
+
+# Selectores de la versión anterior, ligados a la cuenta en lugar de al dispositivo
+_LEGACY_SELECT_UNIQUE_ID = re.compile(r"^octopus_charge_(time|soc)_(.+)_([a-z]+)$")
+_LEGACY_BUTTON_UNIQUE_ID = re.compile(r"^octopus_boost_charge_(.+)$")
+
+SUSPEND_SMART_CONTROL_SCHEMA = vol.Schema({
+    vol.Required(ATTR_DEVICE_ID): cv.string,
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Required(ATTR_END): cv.datetime,
+})
+
+CLEAR_SMART_CONTROL_WINDOWS_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DEVICE_ID): cv.string,
+})
+
+PLAN_CHARGING_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DEVICE_ID): cv.string,
+    vol.Optional(ATTR_DEPARTURE): cv.time,
+    vol.Optional(ATTR_MIN_SOC): vol.All(vol.Coerce(int), vol.Range(min=20, max=100)),
+    vol.Optional(ATTR_ARRIVAL_SOC, default=DEFAULT_ARRIVAL_SOC): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+    vol.Optional(ATTR_PLUG_IN): cv.time,
+    vol.Optional(ATTR_PRICES): vol.Schema({vol.In(DEFAULT_PERIOD_PRICES): vol.Coerce(float)}),
+    vol.Optional(ATTR_APPLY, default=False): cv.boolean,
+})
+
+ANALYZE_CONTRACTED_POWER_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ACCOUNT): cv.string,
+    vol.Optional(ATTR_CONTRACTED_P1): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=15)),
+    vol.Optional(ATTR_CONTRACTED_P2): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=15)),
+    vol.Optional(ATTR_DAYS, default=ROLLING_DAYS): vol.All(vol.Coerce(int), vol.Range(min=1, max=DEMAND_HISTORY_DAYS)),
+})
+
+PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DURATION, default=DEFAULT_PROFILE_DURATION): vol.All(vol.Coerce(float), vol.Range(min=1, max=MAX_PROFILE_DURATION)),
+    vol.Optional(ATTR_INTERVAL, default=DEFAULT_PROFILE_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=1, max=1000)),
+})
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Octopus Spain Intelligent component."""
@@ -86,18 +111,63 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
       # ✅ Crea el intelligent_coordinator solo si no existe
     if "intelligent_coordinator" not in hass.data[DOMAIN]:
-        coordinator = OctopusIntelligentCoordinator(hass, email, password)
+        coordinator = OctopusIntelligentCoordinator(hass, email, password, token=entry.data.get(CONF_TOKEN))
+        # Lo guardado en disco se lee a la vez; el historial tiene que estar antes del primer refresco
+        await asyncio.gather(coordinator.async_load_history(), coordinator.outbox.async_load())
         await coordinator.async_config_entry_first_refresh()
         hass.data[DOMAIN]["intelligent_coordinator"] = coordinator
 
+    coordinator = hass.data[DOMAIN]["intelligent_coordinator"]
+
+    # ✅ Facturación: comparte el cliente y no retrasa el arranque; se carga cuando HA ya ha arrancado
+    if "hourly_coordinator" not in hass.data[DOMAIN]:
+        hourly_coordinator = OctopusHourlyCoordinator(hass, email, password, api=coordinator.api)
+        hass.data[DOMAIN]["hourly_coordinator"] = hourly_coordinator
+
+        async def _async_start(_hass: HomeAssistant) -> None:
+            await _async_start_hourly(hourly_coordinator)
+
+        entry.async_on_unload(async_at_started(hass, _async_start))
+
+    # ✅ Programador local de ventanas de suspensión del control inteligente
+    load_scheduler = None
+    if "smart_control_scheduler" not in hass.data[DOMAIN]:
+        scheduler = SmartControlScheduler(hass, coordinator)
+        hass.data[DOMAIN]["smart_control_scheduler"] = scheduler
+        load_scheduler = scheduler.async_load()
+
+    # Guarda el token vigente al parar HA para reutilizarlo en el siguiente arranque
+    _async_store_token(hass, entry, coordinator)
+    @callback
+    def _async_store_token_on_stop(_event) -> None:
+        _async_store_token(hass, entry, coordinator)
+
+    entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_store_token_on_stop))
+    await _async_migrate_unique_ids(hass, entry, coordinator)
+    # Los dispositivos que desaparecen o se retiran se quitan del registro con sus entidades
+    _async_prune_devices(hass, entry, coordinator)
+    entry.async_on_unload(coordinator.async_add_listener(lambda: _async_prune_devices(hass, entry, coordinator)))
+
+    _async_register_services(hass)
+
     _LOGGER.info(f"📌 Coordinador almacenado en hass.data[DOMAIN][{entry.entry_id}]")
 
-    # Configurar plataformas de integración
+    # Configurar plataformas de integración; ninguna espera a la red y el programador se carga a la vez
     _LOGGER.info(f"📡 Configurando plataformas de integración: {PLATFORMS}")
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    setups = [hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)]
+    if load_scheduler is not None:
+        setups.append(load_scheduler)
+    await asyncio.gather(*setups)
 
     return True
 
+
+async def _async_start_hourly(hourly_coordinator: OctopusHourlyCoordinator) -> None:
+    """Carga el historial de saldos y hace el primer refresco de la facturación."""
+    await hourly_coordinator.async_load_balances()
+    await hourly_coordinator.async_refresh()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload an Octopus Spain Intelligent entry."""
     _LOGGER.info("Unloading Octopus Spain Intelligent entry")
@@ -105,4 +175,171 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if entry.entry_id in hass.data[DOMAIN]:
         hass.data[DOMAIN].pop(entry.entry_id)
 
+    if scheduler := hass.data[DOMAIN].pop("smart_control_scheduler", None):
+        scheduler.async_shutdown()
+    if hourly_coordinator := hass.data[DOMAIN].get("hourly_coordinator"):
+        hourly_coordinator.async_cancel_timeout_retry()
+    if coordinator := hass.data[DOMAIN].get("intelligent_coordinator"):
+        coordinator.async_cancel_timeout_retry()
+        coordinator.async_cancel_boost_confirmations()
+        coordinator.outbox.async_shutdown()
+        _async_store_token(hass, entry, coordinator)
+
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+
+
+@callback
+def _async_store_token(hass: HomeAssistant, entry: ConfigEntry, coordinator: OctopusIntelligentCoordinator) -> None:
+    """Persiste en la entrada el token actual si ha cambiado."""
+    token = coordinator.api.token
+    if token and token != entry.data.get(CONF_TOKEN):
+        hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_TOKEN: token})
+
+
+async def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry, coordinator: OctopusIntelligentCoordinator) -> None:
+    """Pasa los selectores de `..._{cuenta}_{día}` a `..._{dispositivo}_{día}`, y el botón
+    de carga inmediata de `..._{cuenta}` a `..._{dispositivo}`.
+
+    Antes solo había selectores y botón para el primer dispositivo de cada cuenta; se asignan
+    a ese mismo dispositivo para conservar el `entity_id` y el historial.
+    """
+    first_device = {}
+    for account, account_data in (coordinator.data or {}).items():
+        device = next((d for d in account_data.get("devices", []) if d.get("id")), None)
+        if device is not None:
+            first_device[account] = device["id"]
+
+    @callback
+    def _migrate(entity_entry: er.RegistryEntry) -> dict | None:
+        if (match := _LEGACY_BUTTON_UNIQUE_ID.match(entity_entry.unique_id)) and match.group(1) in first_device:
+            new_unique_id = f"octopus_boost_charge_{first_device[match.group(1)]}"
+        elif (match := _LEGACY_SELECT_UNIQUE_ID.match(entity_entry.unique_id)) and match.group(2) in first_device:
+            kind, account, day = match.groups()
+            new_unique_id = f"octopus_charge_{kind}_{first_device[account]}_{day}"
+        else:
+            return None
+        _LOGGER.info(f"🔀 Migrando {entity_entry.entity_id}: {entity_entry.unique_id} → {new_unique_id}")
+        return {"new_unique_id": new_unique_id}
+
+    await er.async_migrate_entries(hass, entry.entry_id, _migrate)
+
+
+@callback
+def _async_prune_devices(hass: HomeAssistant, entry: ConfigEntry, coordinator: OctopusIntelligentCoordinator) -> None:
+    """Quita del registro los dispositivos (y sus entidades) que ya no están en el snapshot."""
+    if not coordinator.last_update_success or not coordinator.data:
+        return
+    devices = active_devices(coordinator.data)
+    accounts = {f"account_{account}" for account in coordinator.data}
+    registry = dr.async_get(hass)
+    for device_entry in dr.async_entries_for_config_entry(registry, entry.entry_id):
+        identifiers = {identifier for domain, identifier in device_entry.identifiers if domain == DOMAIN}
+        if identifiers and not identifiers & (devices.keys() | accounts):
+            _LOGGER.info(f"🗑️ Eliminando el dispositivo {device_entry.name or identifiers}: ya no está en Octopus")
+            registry.async_update_device(device_entry.id, remove_config_entry_id=entry.entry_id)
+
+
+def _async_register_services(hass: HomeAssistant) -> None:
+    """Registra los servicios de la integración (una sola vez)."""
+    if hass.services.has_service(DOMAIN, SERVICE_SUSPEND_SMART_CONTROL):
+        return
+
+    async def async_suspend_smart_control(call: ServiceCall) -> None:
+        scheduler: SmartControlScheduler = hass.data[DOMAIN]["smart_control_scheduler"]
+        start = call.data.get(ATTR_START) or dt_util.utcnow()
+        try:
+            await scheduler.async_add_window(call.data[ATTR_DEVICE_ID], start, call.data[ATTR_END])
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+    async def async_clear_smart_control_windows(call: ServiceCall) -> None:
+        scheduler: SmartControlScheduler = hass.data[DOMAIN]["smart_control_scheduler"]
+        await scheduler.async_clear(call.data.get(ATTR_DEVICE_ID))
+
+    async def async_plan_charging(call: ServiceCall) -> ServiceResponse:
+        coordinator: OctopusIntelligentCoordinator = hass.data[DOMAIN]["intelligent_coordinator"]
+        _, device = coordinator.find_device(call.data.get(ATTR_DEVICE_ID))
+        if device is None:
+            raise HomeAssistantError("No se ha encontrado el dispositivo")
+
+        plan = plan_week(
+            prices={**DEFAULT_PERIOD_PRICES, **call.data.get(ATTR_PRICES, {})},
+            battery_kwh=float((device.get("vehicleVariant") or {}).get("batterySize") or DEFAULT_BATTERY_KWH),
+            power_kw=float((device.get("chargePointVariant") or {}).get("powerInKw") or DEFAULT_CHARGE_POWER_KW),
+            needs=_charging_needs(device, call.data.get(ATTR_DEPARTURE), call.data.get(ATTR_MIN_SOC)),
+            arrival_soc=call.data[ATTR_ARRIVAL_SOC],
+            plug_in=call.data[ATTR_PLUG_IN].strftime("%H:%M") if ATTR_PLUG_IN in call.data else DEFAULT_PLUG_IN,
+        )
+        _LOGGER.info(f"🧮 Plan de carga calculado en {plan['elapsed_ms']} ms, coste estimado {plan['total_cost']} €")
+
+        applied = False
+        if call.data[ATTR_APPLY]:
+            applied = await coordinator.apply_charge_schedule(device["id"], plan["schedules"])
+        return {**plan, "applied": applied}
+
+    async def async_analyze_contracted_power(call: ServiceCall) -> ServiceResponse:
+        hourly: OctopusHourlyCoordinator = hass.data[DOMAIN]["hourly_coordinator"]
+        account = call.data.get(ATTR_ACCOUNT) or next(iter(hourly.data or {}), None)
+        contracted = {
+            period: call.data[attr]
+            for period, attr in (("P1", ATTR_CONTRACTED_P1), ("P2", ATTR_CONTRACTED_P2))
+            if attr in call.data
+        }
+        if account is not None and contracted:
+            hourly.async_set_contracted_power(account, contracted)
+        analysis = hourly.demand_analysis(account, call.data[ATTR_DAYS]) if account is not None else None
+        if analysis is None:
+            raise HomeAssistantError("Todavía no hay lecturas de demanda para esta cuenta")
+        return analysis
+
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        if active_profile() is not None:
+            raise HomeAssistantError("Ya hay un perfilado en curso")
+        session = ProfileSession(interval=call.data[ATTR_INTERVAL] / 1000)
+        session.start()
+        _LOGGER.warning(f"🔬 Perfilando la integración durante {call.data[ATTR_DURATION]} s")
+        try:
+            await asyncio.sleep(call.data[ATTR_DURATION])
+        finally:
+            # El muestreador termina en un intervalo; se espera fuera del event loop
+            await hass.async_add_executor_job(session.stop)
+        base_path = hass.config.path(f"{DOMAIN}_profile_{dt_util.now().strftime('%Y%m%d_%H%M%S')}")
+        stats_path, folded_path = await hass.async_add_executor_job(session.write, base_path)
+        _LOGGER.warning(f"🔬 Perfil guardado en {stats_path} y {folded_path} ({session.samples} muestras)")
+        return {"stats": stats_path, "stacks": folded_path, "samples": session.samples}
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_ANALYZE_CONTRACTED_POWER, async_analyze_contracted_power,
+        schema=ANALYZE_CONTRACTED_POWER_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, async_profile,
+        schema=PROFILE_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PLAN_CHARGING, async_plan_charging,
+        schema=PLAN_CHARGING_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_SUSPEND_SMART_CONTROL, async_suspend_smart_control, schema=SUSPEND_SMART_CONTROL_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_CLEAR_SMART_CONTROL_WINDOWS, async_clear_smart_control_windows,
+        schema=CLEAR_SMART_CONTROL_WINDOWS_SCHEMA,
+    )
+
+
+def _charging_needs(device: dict, departure, min_soc) -> list[dict]:
+    """Necesidades por día: las del servicio o, si no se indican, el horario actual del dispositivo."""
+    schedules = {
+        schedule["dayOfWeek"]: schedule
+        for schedule in (device.get("preferences") or {}).get("schedules", [])
+    }
+    needs = []
+    for day in DAYS:
+        current = schedules.get(day, {})
+        needs.append({
+            "departure": departure.strftime("%H:%M") if departure else current.get("time", "08:00")[:5],
+            "min_soc": min_soc if min_soc is not None else int(float(current.get("max", 80))),
+        })
+    return needs
@@ -0,0 +1,60 @@
+"""Índice de las alertas ya vistas de cada dispositivo, para avisar solo de las nuevas.
+
+Una alerta se identifica por `(message, publishedAt)`. El índice se guarda en `.storage`,
+así que tras un reinicio no se repiten avisos. La primera vez que se ve un dispositivo sus
+alertas se dan por vistas: al instalar la integración no llega una ráfaga de eventos.
+"""
+
+MAX_SEEN = 200  # Alertas recordadas por dispositivo; se olvidan primero las más antiguas
+
+
+def alert_key(alert: dict) -> tuple[str, str]:
+    return (alert.get("message") or "", alert.get("publishedAt") or "")
+
+
+def latest_alert(alerts: list[dict]) -> dict | None:
+    """La alerta publicada más recientemente (las fechas ISO se ordenan como texto)."""
+    return max(alerts, key=lambda alert: alert.get("publishedAt") or "", default=None)
+
+
+class AlertIndex:
+    """Alertas vistas por dispositivo, como conjunto ordenado por llegada."""
+
+    __slots__ = ("_seen", "_lists")
+
+    def __init__(self):
+        self._seen: dict[str, dict[tuple[str, str], None]] = {}
+        # Última lista procesada de cada dispositivo; si es el mismo objeto, no hay nada nuevo
+        self._lists: dict[str, list] = {}
+
+    def observe(self, device_id: str, alerts: list[dict]) -> list[dict] | None:
+        """Devuelve las alertas nuevas, ordenadas por publicación, o None si el índice no cambia."""
+        if self._lists.get(device_id) is alerts:
+            return None
+        self._lists[device_id] = alerts
+        seen = self._seen.get(device_id)
+        if seen is None:
+            self._seen[device_id] = dict.fromkeys(alert_key(alert) for alert in alerts)
+            self._trim(device_id)
+            return []
+
+        new = [alert for alert in alerts if alert_key(alert) not in seen]
+        if not new:
+            return None
+        new.sort(key=lambda alert: alert.get("publishedAt") or "")
+        for alert in new:
+            seen[alert_key(alert)] = None
+        self._trim(device_id)
+        return new
+
+    def _trim(self, device_id: str) -> None:
+        seen = self._seen[device_id]
+        while len(seen) > MAX_SEEN:
+            del seen[next(iter(seen))]
+
+    def to_store(self) -> dict:
+        return {device_id: [list(key) for key in seen] for device_id, seen in self._seen.items()}
+
+    def load(self, data: dict) -> None:
+        self._seen = {device_id: dict.fromkeys(tuple(key) for key in keys) for device_id, keys in data.items()}
+        self._lists = {}
@@ -0,0 +1,115 @@
+"""Historial submuestreado de los saldos (Solar Wallet y crédito Octopus) de cada cuenta.
+
+Tres niveles de tamaño fijo: los puntos tal cual de los últimos días, y agregados horarios
+y diarios (mínimo, máximo y cierre) de las últimas semanas y años. La memoria por saldo no
+crece, y del historial se derivan el ritmo de acumulación y el saldo previsto.
+
+También decide cuándo merece la pena volver a pedir la facturación: los saldos solo
+cambian al emitirse una factura o al cambiar de día (abonos y pagos), no en cada sondeo.
+"""
+import calendar
+from collections import deque
+from datetime import date, datetime, timedelta
+
+RAW_WINDOW = 3 * 24 * 3600  # Segundos de puntos sin agregar
+RAW_CAPACITY = 288
+HOURLY_CAPACITY = 14 * 24  # Dos semanas de agregados horarios
+DAILY_CAPACITY = 2 * 366  # Dos años de agregados diarios
+ACCRUAL_WINDOW = 30 * 24 * 3600  # Segundos sobre los que se calcula el ritmo
+MIN_ACCRUAL_SPAN = 24 * 3600  # Con menos historial no se estima el ritmo
+STATEMENT_RECHECK = timedelta(hours=1)  # Sondeo mientras se espera una factura nueva
+
+BALANCE_KEYS = ("solar_wallet", "octopus_credit")
+
+
+class BalanceHistory:
+    """Puntos recientes más agregados horarios y diarios `(inicio, mínimo, máximo, cierre)`."""
+
+    __slots__ = ("raw", "hourly", "daily")
+
+    def __init__(self):
+        self.raw: deque[tuple[float, float]] = deque(maxlen=RAW_CAPACITY)
+        self.hourly: deque[tuple[float, float, float, float]] = deque(maxlen=HOURLY_CAPACITY)
+        self.daily: deque[tuple[float, float, float, float]] = deque(maxlen=DAILY_CAPACITY)
+
+    def __bool__(self) -> bool:
+        return bool(self.raw)
+
+    def observe(self, timestamp: float, value: float) -> None:
+        """Añade una lectura; los agregados del intervalo en curso se actualizan en el sitio."""
+        self.raw.append((timestamp, value))
+        cutoff = timestamp - RAW_WINDOW
+        while len(self.raw) > 1 and self.raw[0][0] < cutoff:
+            self.raw.popleft()
+        _fold(self.hourly, timestamp - timestamp % 3600, value)
+        _fold(self.daily, timestamp - timestamp % 86400, value)
+
+    def _series(self, since: float) -> list[tuple[float, float]]:
+        """Puntos `(timestamp, valor)` desde `since` del nivel más fino que lo cubre."""
+        if self.raw[0][0] <= since:
+            return [point for point in self.raw if point[0] >= since]
+        tier = self.hourly if self.hourly and self.hourly[0][0] <= since else self.daily
+        return [(start, close) for start, _, _, close in tier if start >= since] + [self.raw[-1]]
+
+    def accrual_per_day(self, now: float) -> float | None:
+        """Variación media del saldo por día en la ventana de acumulación."""
+        if not self.raw:
+            return None
+        series = self._series(now - ACCRUAL_WINDOW)
+        (first_ts, first), (last_ts, last) = series[0], series[-1]
+        if last_ts - first_ts < MIN_ACCRUAL_SPAN:
+            return None
+        return (last - first) * 86400 / (last_ts - first_ts)
+
+    def projected(self, now: float, at: float) -> float | None:
+        """Saldo previsto en el instante `at` si se mantiene el ritmo de acumulación."""
+        rate = self.accrual_per_day(now)
+        if rate is None:
+            return None
+        last_ts, last = self.raw[-1]
+        return last + rate * (at - last_ts) / 86400
+
+    def as_dict(self) -> dict:
+        return {
+            "raw": [list(point) for point in self.raw],
+            "hourly": [list(bucket) for bucket in self.hourly],
+            "daily": [list(bucket) for bucket in self.daily],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BalanceHistory":
+        history = cls()
+        history.raw.extend(tuple(point) for point in data.get("raw", []))
+        history.hourly.extend(tuple(bucket) for bucket in data.get("hourly", []))
+        history.daily.extend(tuple(bucket) for bucket in data.get("daily", []))
+        return history
+
+
+def _fold(tier: deque, start: float, value: float) -> None:
+    if tier and tier[-1][0] == start:
+        _, low, high, _ = tier[-1]
+        tier[-1] = (start, min(low, value), max(high, value), value)
+    else:
+        tier.append((start, value, value, value))
+
+
+def billing_due(billing: dict | None, last_fetch: datetime | None, now: datetime) -> bool:
+    """Indica si la facturación puede haber cambiado desde `last_fetch` (horas locales).
+
+    Se pide si no hay datos, una vez al cambiar de día y, cuando el periodo siguiente a la
+    última factura ya ha terminado, cada `STATEMENT_RECHECK` hasta que llegue la nueva.
+    """
+    if not billing or last_fetch is None or now.date() != last_fetch.date():
+        return True
+    end = (billing.get("last_invoice") or {}).get("end")
+    if isinstance(end, date) and now.date() > _next_period_end(end):
+        return now - last_fetch >= STATEMENT_RECHECK
+    return False
+
+
+def _next_period_end(end: date) -> date:
+    """Fin del periodo mensual que empieza al día siguiente de `end`."""
+    start = end + timedelta(days=1)
+    years, month = divmod(start.month, 12)
+    year, month = start.year + years, month + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1])) - timedelta(days=1)
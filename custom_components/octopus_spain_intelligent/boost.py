@@ -0,0 +1,98 @@
+"""Confirmación de una carga inmediata sondeando solo el estado del dispositivo afectado.
+
+Tras `triggerBoostCharge`, Kraken tarda unos segundos en reflejar el cambio. En lugar de un
+refresco completo (login, facturación y dispositivos de todas las cuentas), se consulta el
+estado del dispositivo con esperas crecientes (2, 4, 8... s) hasta ver `BOOSTING` o agotar
+el tiempo máximo.
+"""
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+from .kraken_client import KrakenTransportError
+from .sessions import BOOST_STATE
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_FIRST_DELAY = 2  # Segundos hasta el primer sondeo
+POLL_FACTOR = 2
+POLL_MAX_DELAY = 30
+CONFIRM_TIMEOUT = 120  # Segundos; después se da la carga por no confirmada
+
+CONFIRM_PENDING = "pending"
+CONFIRM_CONFIRMED = "confirmed"
+CONFIRM_TIMEOUT_STATE = "timeout"
+CONFIRM_QUEUED = "queued"
+CONFIRM_FAILED = "failed"
+
+
+class BoostConfirmation:
+    """Estado de la confirmación de la última carga inmediata pedida para un dispositivo."""
+
+    __slots__ = ("account", "device_id", "state", "started", "finished", "attempts", "last_state")
+
+    def __init__(self, account: str, device_id: str | None, state: str = CONFIRM_PENDING):
+        self.account = account
+        self.device_id = device_id
+        self.state = state
+        self.started = time.time()
+        self.finished: float | None = None if state == CONFIRM_PENDING else self.started
+        self.attempts = 0
+        self.last_state: str | None = None
+
+    def finish(self, state: str) -> None:
+        self.state = state
+        self.finished = time.time()
+
+    def as_dict(self) -> dict:
+        return {
+            "confirmation": self.state,
+            "device_id": self.device_id,
+            "started": self.started,
+            "finished": self.finished,
+            "attempts": self.attempts,
+            "last_state": self.last_state,
+        }
+
+
+async def async_poll_until_boosting(
+    confirmation: BoostConfirmation,
+    fetch_status: Callable[[], Awaitable[dict | None]],
+    on_update: Callable[[dict | None], None],
+    timeout: float = CONFIRM_TIMEOUT,
+) -> dict | None:
+    """Sondea `fetch_status` con backoff geométrico hasta ver `BOOSTING` o agotar `timeout`.
+
+    `on_update` se llama tras cada sondeo con el estado leído (o `None`). Devuelve el estado
+    que confirmó la carga, o `None` si no llegó a confirmarse.
+    """
+    deadline = time.monotonic() + timeout
+    delay = POLL_FIRST_DELAY
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            confirmation.finish(CONFIRM_TIMEOUT_STATE)
+            on_update(None)
+            return None
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * POLL_FACTOR, POLL_MAX_DELAY)
+
+        confirmation.attempts += 1
+        try:
+            status = await fetch_status()
+        except (KrakenTransportError, TimeoutError) as err:
+            # Un fallo puntual de red no cancela la confirmación
+            _LOGGER.debug(f"🔁 Sondeo {confirmation.attempts} de {confirmation.device_id} sin respuesta: {err}")
+            status = None
+        except Exception as err:
+            # Errores de la API (p. ej. token caducado): se sigue sondeando, pero queda rastro
+            _LOGGER.warning(f"⚠️ Sondeo {confirmation.attempts} de {confirmation.device_id} fallido: {err}")
+            status = None
+        if status is not None:
+            confirmation.last_state = status.get("currentState")
+        if confirmation.last_state == BOOST_STATE:
+            confirmation.finish(CONFIRM_CONFIRMED)
+            on_update(status)
+            return status
+        on_update(None)
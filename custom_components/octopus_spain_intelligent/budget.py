@@ -0,0 +1,102 @@
+"""Control del presupuesto de complejidad de la API Kraken.
+
+Kraken limita la complejidad acumulada de las consultas por token. Se anota el coste de
+cada operación (el que informa Kraken en `extensions` cuando lo hace, o un modelo estático
+si no) en una ventana deslizante de cubetas de un minuto, y los datos de baja prioridad se aplazan cuando el
+presupuesto se estrecha. El estado de los dispositivos siempre tiene prioridad.
+"""
+import time
+from collections import deque
+
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+BUDGET_LIMIT = 5000  # Puntos de complejidad por ventana
+BUDGET_WINDOW = 3600  # Segundos
+BUCKET_SECONDS = 60  # Los costes de un mismo minuto se suman en una sola entrada
+LOW_PRIORITY_SHARE = 0.6  # Por encima de esta fracción del límite se aplazan los datos de baja prioridad
+
+# Coste estimado por operación cuando la respuesta no lo informa
+QUERY_COSTS = {
+    "obtainKrakenToken": 1,
+    "getAccountNames": 2,
+    "devices": 25,
+    "deviceStatus": 5,
+    "accountBillingInfo": 30,
+    "demandReadings": 40,
+}
+DEFAULT_QUERY_COST = 10
+
+_EXTENSION_COST_KEYS = ("cost", "queryComplexity", "complexity")
+
+
+def cost_from_extensions(response: dict) -> int | None:
+    """Coste informado por Kraken en `extensions`, si viene."""
+    extensions = response.get("extensions") or {}
+    for key in _EXTENSION_COST_KEYS:
+        value = extensions.get(key)
+        if isinstance(value, dict):
+            value = value.get("requestedQueryCost") or value.get("actualQueryCost") or value.get("total")
+        if isinstance(value, (int, float)):
+            return int(value)
+    return None
+
+
+class ComplexityBudget:
+    """Ventana deslizante con el coste de las operaciones enviadas a Kraken.
+
+    Se guarda una entrada `[inicio de la cubeta, coste]` por minuto con llamadas, así la
+    ventana ocupa como mucho `window / BUCKET_SECONDS` entradas por muchas que se hagan.
+    """
+
+    def __init__(self, limit: int = BUDGET_LIMIT, window: float = BUDGET_WINDOW, low_priority_share: float = LOW_PRIORITY_SHARE):
+        self.limit = limit
+        self.window = window
+        self.low_priority_share = low_priority_share
+        self._events: deque[list] = deque()
+        self._used = 0
+        self._last_cost: dict[str, int] = {}
+        self.deferred: dict[str, int] = {}
+
+    def estimated_cost(self, operation: str) -> int:
+        """Último coste observado de la operación o, si no hay, el del modelo estático."""
+        return self._last_cost.get(operation, QUERY_COSTS.get(operation, DEFAULT_QUERY_COST))
+
+    def record(self, operation: str, cost: int | None = None) -> None:
+        """Anota una llamada real a la API."""
+        if cost is None:
+            cost = self.estimated_cost(operation)
+        else:
+            self._last_cost[operation] = cost
+        bucket = time.monotonic() // BUCKET_SECONDS * BUCKET_SECONDS
+        if self._events and self._events[-1][0] == bucket:
+            self._events[-1][1] += cost
+        else:
+            self._events.append([bucket, cost])
+        self._used += cost
+
+    @property
+    def used(self) -> int:
+        # Una cubeta sale entera de la ventana cuando termina su último segundo
+        cutoff = time.monotonic() - self.window - BUCKET_SECONDS
+        while self._events and self._events[0][0] <= cutoff:
+            self._used -= self._events.popleft()[1]
+        return self._used
+
+    def allows(self, operation: str, priority: str = PRIORITY_HIGH) -> bool:
+        """Indica si se puede lanzar `operation` ahora; la alta prioridad siempre pasa."""
+        if priority == PRIORITY_HIGH:
+            return True
+        allowed = self.used + self.estimated_cost(operation) <= self.limit * self.low_priority_share
+        if not allowed:
+            self.deferred[operation] = self.deferred.get(operation, 0) + 1
+        return allowed
+
+    def as_dict(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window_s": self.window,
+            "used": self.used,
+            "last_cost": dict(self._last_cost),
+            "deferred": dict(self.deferred),
+        }
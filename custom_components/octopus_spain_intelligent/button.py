@@ -1,4 +1,7 @@
 import logging
+from collections.abc import Mapping
+from typing import Any
+
 from homeassistant.components.button import ButtonEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
@@ -7,6 +10,7 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
 from .coordinator import OctopusIntelligentCoordinator
+from .entity import async_setup_device_entities, device_info
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,30 +23,24 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
         _LOGGER.error("❌ intelligent_coordinator no está disponible en hass.data para la plataforma de botones.")
         return
 
-    buttons = []
-    accounts = intelligentcoordinator.data.keys()
-    for account in accounts:
-        # Añadimos un botón de carga inmediata por cada cuenta que tenga dispositivos
-        if intelligentcoordinator.data[account].get("devices"):
-            _LOGGER.info(f"📡 Creando botón de carga inmediata para la cuenta {account}")
-            devices = intelligentcoordinator.data[account].get("devices", [])
-            if devices:
-                device = devices[0]
-                device_id = device.get("id")  # ID del dispositivo de la API
-                device_name = device.get("name") or "Vehículo Eléctrico"
-                _LOGGER.info(f"✅ Botón con device_id={device_id}, device_name={device_name}")
-                buttons.append(OctopusBoostChargeButton(account, intelligentcoordinator, device_id, device_name))
-
-    if buttons:
-        async_add_entities(buttons)
-        _LOGGER.info(f"✅ Se han añadido {len(buttons)} botones")
-    else:
-        _LOGGER.warning("⚠️ No se ha añadido ningún botón de carga inmediata")
+    # Un botón de carga inmediata por dispositivo, también para los que aparezcan después
+    async_setup_device_entities(
+        entry, intelligentcoordinator, async_add_entities,
+        lambda account, device: [
+            OctopusBoostChargeButton(account, intelligentcoordinator, device["id"], device.get("name") or "Vehículo Eléctrico")
+        ],
+    )
 
 class OctopusBoostChargeButton(CoordinatorEntity, ButtonEntity):
-    """Define el botón para activar la carga inmediata (boost)."""
+    """Define el botón para activar la carga inmediata (boost).
+
+    `triggerBoostCharge` solo admite el número de cuenta: Kraken activa la carga inmediata de
+    toda la cuenta, no de un vehículo. Hay un botón por dispositivo para confirmar la carga
+    sondeando ese dispositivo, pero en una cuenta con varios vehículos todos los botones
+    lanzan la misma carga; el atributo `boost_scope` lo indica.
+    """
 
-    def __init__(self, account: str, coordinator: OctopusIntelligentCoordinator, device_id: str = "", device_name: str = ""):
+    def __init__(self, account: str, coordinator: OctopusIntelligentCoordinator, device_id: str, device_name: str = ""):
         """Inicializa el botón."""
         super().__init__(coordinator)
         self._account = account
@@ -53,16 +51,30 @@ class OctopusBoostChargeButton(CoordinatorEntity, ButtonEntity):
         self._attr_name = "Carga Inmediata"
 
         # ID único para la entidad
-        self._attr_unique_id = f"octopus_boost_charge_{account}"
+        self._attr_unique_id = f"octopus_boost_charge_{device_id}"
 
         # Icono para el botón
         self._attr_icon = "mdi:rocket-launch"
 
         # Vincular al dispositivo
-        self._attr_device_info = {"identifiers": {(DOMAIN, device_id)}} if device_id else None
+        self._attr_device_info = device_info(device_id)
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # La confirmación avanza entre refrescos: el botón se actualiza en cada sondeo
+        self.async_on_remove(self.coordinator.async_add_boost_listener(self.async_write_ha_state))
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        """Alcance de la carga inmediata y progreso de su última confirmación en este dispositivo."""
+        confirmation = self.coordinator.boost_confirmation(self._device_id)
+        attributes = {"boost_scope": "account", "account": self._account}
+        if confirmation is not None:
+            attributes.update(confirmation.as_dict())
+        return attributes
 
     async def async_press(self) -> None:
         """Gestiona el evento de pulsar el botón."""
-        _LOGGER.info(f"🔘 Botón de carga inmediata presionado para la cuenta {self._account}")
-        # Llama a la función que ya habíamos creado en el coordinador
-        await self.coordinator.boost_charge(self._account)
\ No newline at end of file
+        _LOGGER.info(f"🔘 Botón de carga inmediata presionado en {self._device_name}: se activa para toda la cuenta {self._account}")
+        # La carga es de toda la cuenta; el coordinador la confirma sondeando solo este dispositivo
+        await self.coordinator.boost_charge(self._account, self._device_id)
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""Transportes de grabación y reproducción del tráfico con Kraken ("cassettes").
+
+`RecordingTransport` envuelve al transporte real y guarda cada pareja petición/respuesta en
+un fichero JSON, con credenciales, tokens, datos personales y números de cuenta ya
+anonimizados. `ReplayTransport` sirve esas respuestas sin red, con la latencia original o
+acelerada, para perfilar el coordinador de forma reproducible.
+
+Ambos tienen la misma interfaz que `KrakenGraphQLClient` (`execute_raw` y `close`) y se
+pasan a `OctopusSpain` con el argumento `transport`.
+"""
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .kraken_client import KrakenTransportError, decode_response, operation_info
+from .octopus_spain import token_expiry
+
+CASSETTE_VERSION = 1
+REDACTED = "**REDACTED**"
+
+# Claves cuyo valor nunca se guarda, ni en variables ni en respuestas
+SENSITIVE_KEYS = frozenset({
+    "email",
+    "password",
+    "refreshToken",
+    "fullName",
+    "givenName",
+    "familyName",
+    "preferredName",
+    "mobile",
+    "landline",
+    "address",
+    "postcode",
+})
+TOKEN_KEY = "token"
+
+_ACCOUNT_RE = re.compile(r"\bA-[0-9A-F]{8}\b")
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Redactor:
+    """Anonimiza peticiones y respuestas de forma consistente dentro de una grabación.
+
+    Cada número de cuenta real se sustituye siempre por el mismo número ficticio, así las
+    consultas grabadas siguen encajando con las cuentas que devuelve la respuesta grabada.
+    """
+
+    def __init__(self):
+        self._accounts: dict[str, str] = {}
+
+    def __call__(self, value):
+        return self._accounts_in(_redact_keys(value))
+
+    def _accounts_in(self, value):
+        text = _ACCOUNT_RE.sub(self._account, json.dumps(value, ensure_ascii=False))
+        return json.loads(text)
+
+    def _account(self, match: re.Match) -> str:
+        account = match.group(0)
+        if account not in self._accounts:
+            self._accounts[account] = f"A-{len(self._accounts) + 1:08X}"
+        return self._accounts[account]
+
+
+def _redact_keys(value):
+    if isinstance(value, dict):
+        return {
+            key: _fake_token(item) if key == TOKEN_KEY else REDACTED if key in SENSITIVE_KEYS and item is not None else _redact_keys(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_redact_keys(item) for item in value]
+    return value
+
+
+def _fake_token(token):
+    """JWT sin firma que solo conserva la caducidad, para que el cliente lo trate como válido."""
+    if not isinstance(token, str):
+        return token
+    payload = json.dumps({"exp": token_expiry(token) or 0}).encode()
+    return ".".join(base64.urlsafe_b64encode(part).decode().rstrip("=") for part in (b'{"alg":"none"}', payload, b""))
+
+
+def _match_key(operation: str, variables: dict | None) -> tuple[str, str]:
+    return operation, json.dumps(_redact_keys(variables or {}), sort_keys=True)
+
+
+class RecordingTransport:
+    """Pasa cada petición al transporte real y la anota en el cassette."""
+
+    def __init__(self, transport, path: str | Path):
+        self._transport = transport
+        self._path = Path(path)
+        self._redact = Redactor()
+        self._started = time.monotonic()
+        self._interactions: list[dict] = []
+
+    @property
+    def interactions(self) -> list[dict]:
+        return self._interactions
+
+    async def execute_raw(self, query: str, variables: dict | None = None, headers: dict | None = None) -> bytes:
+        kind, operation = operation_info(query)
+        interaction = {
+            "operation": operation,
+            "kind": kind,
+            "variables": self._redact(variables or {}),
+            "offset": round(time.monotonic() - self._started, 3),
+        }
+        started = time.monotonic()
+        try:
+            body = await self._transport.execute_raw(query, variables, headers)
+            # Un cuerpo ilegible se graba y se lanza como el fallo de transporte que espera el cliente
+            response = decode_response(body)
+        except KrakenTransportError as err:
+            interaction.update(elapsed=round(time.monotonic() - started, 3), error=str(err), response=None)
+            self._interactions.append(interaction)
+            raise
+        interaction.update(elapsed=round(time.monotonic() - started, 3), error=None, response=self._redact(response))
+        self._interactions.append(interaction)
+        return body
+
+    def save(self) -> None:
+        """Escribe el cassette; se puede llamar varias veces durante la grabación."""
+        cassette = {
+            "version": CASSETTE_VERSION,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "interactions": self._interactions,
+        }
+        self._path.write_text(json.dumps(cassette, ensure_ascii=False, indent=1))
+        _LOGGER.info(f"📼 Cassette guardado en {self._path} ({len(self._interactions)} peticiones)")
+
+    async def close(self) -> None:
+        self.save()
+        await self._transport.close()
+
+
+class ReplayTransport:
+    """Sirve las respuestas de un cassette en el orden grabado, sin red.
+
+    Las peticiones se emparejan por operación y variables. Cada pareja se consume en orden
+    y la última se repite indefinidamente, así se pueden reproducir más refrescos de los
+    grabados. `speed` escala la latencia original: 1 la respeta, 10 la divide entre diez y
+    0 responde al instante.
+    """
+
+    def __init__(self, path: str | Path, speed: float = 1.0, telemetry=None):
+        cassette = json.loads(Path(path).read_text())
+        if cassette.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Versión de cassette no soportada: {cassette.get('version')}")
+        self._speed = speed
+        self._telemetry = telemetry
+        self._queues: dict[tuple[str, str], deque[dict]] = {}
+        for interaction in cassette["interactions"]:
+            key = (interaction["operation"], json.dumps(interaction["variables"], sort_keys=True))
+            self._queues.setdefault(key, deque()).append(interaction)
+
+    async def execute_raw(self, query: str, variables: dict | None = None, headers: dict | None = None) -> bytes:
+        _, operation = operation_info(query)
+        queue = self._queues.get(_match_key(operation, variables))
+        if not queue:
+            raise KrakenTransportError(f"El cassette no tiene respuesta para {operation} {variables}")
+        interaction = queue.popleft() if len(queue) > 1 else queue[0]
+
+        started = time.monotonic()
+        if self._speed > 0 and interaction["elapsed"] > 0:
+            await asyncio.sleep(interaction["elapsed"] / self._speed)
+        if interaction["error"] is not None:
+            self._record(operation, started, 0, interaction["error"])
+            raise KrakenTransportError(interaction["error"])
+        body = json.dumps(interaction["response"]).encode()
+        self._record(operation, started, len(body))
+        return body
+
+    def _record(self, operation: str, started: float, size: int, error: str | None = None) -> None:
+        if self._telemetry is not None:
+            self._telemetry.record_span(operation, time.monotonic() - started, size, 0, error)
+
+    async def close(self) -> None:
+        """Nada que liberar."""
@@ -2,7 +2,8 @@ import logging
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import HomeAssistant
-from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD, CONF_TOKEN
 from .octopus_spain import OctopusSpain
 
 _LOGGER = logging.getLogger(__name__)
@@ -19,7 +20,7 @@ class OctopusSpainConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         password = user_input[CONF_PASSWORD]
 
         # Aquí validamos las credenciales mediante la API de OctopusSpain
-        octopus_spain = OctopusSpain(email, password)
+        octopus_spain = OctopusSpain(email, password, session=async_get_clientsession(self.hass))
         if not await octopus_spain.login():
             return self.async_show_form(
                 step_id="user",
@@ -27,10 +28,11 @@ class OctopusSpainConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 data_schema=self._get_data_schema(),
             )
 
-        # Si las credenciales son correctas, guardamos la configuración
+        # Si las credenciales son correctas, guardamos la configuración y el token ya validado,
+        # así el primer arranque no necesita otro login
         return self.async_create_entry(
             title=f"Octopus Spain Intelligent - {email}",
-            data=user_input
+            data={**user_input, CONF_TOKEN: octopus_spain.token}
         )
 
     def _get_data_schema(self):
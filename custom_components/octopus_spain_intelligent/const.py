@@ -4,6 +4,7 @@ DOMAIN = "octopus_spain_intelligent"
 
 CONF_EMAIL = 'email'
 CONF_PASSWORD = 'password'
+CONF_TOKEN = 'token'  # Último token JWT válido, para no hacer login en cada arranque
 
 UPDATE_INTERVAL = 1 # Hours
 
@@ -43,3 +44,48 @@ INTELLIGENT_CHARGE_TIMES = [
 # Días de la semana (se utilizan para iterar sobre ellos)
 DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
+
+# Control inteligente (updateDeviceSmartControl)
+SMART_CONTROL_SUSPEND = "SUSPEND"
+SMART_CONTROL_RESUME = "UNSUSPEND"
+
+# Servicios
+SERVICE_SUSPEND_SMART_CONTROL = "suspend_smart_control"
+SERVICE_CLEAR_SMART_CONTROL_WINDOWS = "clear_smart_control_windows"
+ATTR_DEVICE_ID = "device_id"
+ATTR_START = "start"
+ATTR_END = "end"
+
+# Planificador semanal de carga
+SERVICE_PLAN_CHARGING = "plan_charging"
+ATTR_DEPARTURE = "departure"
+ATTR_MIN_SOC = "min_soc"
+ATTR_ARRIVAL_SOC = "arrival_soc"
+ATTR_PLUG_IN = "plug_in"
+ATTR_PRICES = "prices"
+ATTR_APPLY = "apply"
+
+# Precios orientativos (€/kWh) por periodo de la tarifa 2.0TD; el servicio permite sobrescribirlos
+DEFAULT_PERIOD_PRICES = {"P1": 0.25, "P2": 0.17, "P3": 0.09}
+DEFAULT_ARRIVAL_SOC = 30
+DEFAULT_PLUG_IN = "18:00"
+DEFAULT_CHARGE_POWER_KW = 7.4
+DEFAULT_BATTERY_KWH = 60
+
+# Maxímetro y potencia contratada
+SERVICE_ANALYZE_CONTRACTED_POWER = "analyze_contracted_power"
+ATTR_ACCOUNT = "account"
+ATTR_CONTRACTED_P1 = "contracted_p1"
+ATTR_CONTRACTED_P2 = "contracted_p2"
+ATTR_DAYS = "days"
+
+# Perfilado
+SERVICE_PROFILE = "profile"
+ATTR_DURATION = "duration"
+ATTR_INTERVAL = "interval"
+DEFAULT_PROFILE_DURATION = 60  # Segundos
+DEFAULT_PROFILE_INTERVAL = 5  # Milisegundos entre muestras
+
+# Eventos
+EVENT_CHARGE_SESSION = f"{DOMAIN}_charge_session"
+EVENT_DEVICE_ALERT = f"{DOMAIN}_device_alert"
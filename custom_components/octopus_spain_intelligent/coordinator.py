@@ -1,45 +1,455 @@
+import asyncio
 import logging
-from datetime import timedelta
-from homeassistant.core import HomeAssistant
+import time
+from abc import abstractmethod
+from datetime import date, datetime, timedelta
+from homeassistant.core import CALLBACK_TYPE, CoreState, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from .alerts import AlertIndex
+from .balance_history import BALANCE_KEYS, BalanceHistory, billing_due
+from .boost import CONFIRM_FAILED, CONFIRM_PENDING, CONFIRM_QUEUED, BoostConfirmation, async_poll_until_boosting
+from .budget import PRIORITY_HIGH, PRIORITY_LOW
+from .kraken_client import KrakenTransportError
+from .maximeter import HISTORY_DAYS as DEMAND_HISTORY_DAYS, ROLLING_DAYS, DemandHistory, analyze as analyze_demand
+from .outbox import MUTATION_BOOST, MUTATION_PREFERENCES, MUTATION_SMART_CONTROL, MutationOutbox
 from .octopus_spain import OctopusSpain
-from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD, UPDATE_INTERVAL
+from .profiling import active as active_profile, profiled
+from .telemetry import Telemetry
+from .sessions import ChargeSession, ChargeSessionDetector
+from .timeseries import DeviceHistory
+from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD, UPDATE_INTERVAL, EVENT_CHARGE_SESSION, EVENT_DEVICE_ALERT
 
 _LOGGER = logging.getLogger(__name__)
 
-
-class OctopusIntelligentCoordinator(DataUpdateCoordinator):
-
-    def __init__(self, hass: HomeAssistant, email: str, password: str):
-        super().__init__(hass=hass, logger=_LOGGER, name="Octopus Intelligent Go", update_interval=timedelta(minutes=UPDATE_INTERVAL))
-        self._api = OctopusSpain(email, password)
-        self._data = {}
-
+HISTORY_STORAGE_VERSION = 1
+HISTORY_STORAGE_KEY = f"{DOMAIN}.device_history"
+HISTORY_SAVE_DELAY = 300  # Segundos; las transiciones se agrupan en una escritura
+BALANCE_STORAGE_VERSION = 1
+BALANCE_STORAGE_KEY = f"{DOMAIN}.balance_history"
+BALANCE_SAVE_DELAY = 60
+DEMAND_STORAGE_VERSION = 1
+DEMAND_STORAGE_KEY = f"{DOMAIN}.demand_history"
+DEMAND_SAVE_DELAY = 300
+DEMAND_CHUNK_DAYS = 31  # Días de lecturas por refresco; el primer año se completa en unas horas
+DEMAND_LAG_DAYS = 3  # Días recientes que se vuelven a pedir cada día
+DEMAND_KEY = "demand"
+
+REFRESH_DEADLINE = 20  # Segundos por refresco; las consultas que no terminen a tiempo se cancelan
+TIMEOUT_RETRY_DELAY = 30  # Segundos hasta reintentar lo cancelado; se dobla con cada vencimiento seguido
+TIMEOUT_BACKOFF_MAX = 30 * 60
+
+# Facturación aún no pedida (arranque de HA); el mismo objeto para no rehacer el snapshot
+_BILLING_PENDING: dict = {}
+
+
+def _dataset(operation: str, account: str | None) -> str:
+    return operation if account is None else f"{operation}:{account}"
+
+
+class AccountState:
+    """Última copia válida de una cuenta, su antigüedad y el error del último intento."""
+
+    __slots__ = ("data", "updated_at", "error", "_view")
+
+    def __init__(self):
+        self.data: dict | None = None
+        self.updated_at: datetime | None = None
+        self.error: str | None = None
+        self._view: tuple | None = None
+
+    @property
+    def stale(self) -> bool:
+        """Hay datos, pero el último refresco de la cuenta falló."""
+        return self.data is not None and self.error is not None
+
+    def as_dict(self) -> dict:
+        """Vista que leen las entidades; es el mismo objeto mientras no cambien datos ni error."""
+        view = self._view
+        if view is None or view[0] is not self.data or view[1] != self.error:
+            view = self._view = (self.data, self.error, {**self.data, "stale": self.stale, "error": self.error})
+        return view[2]
+
+
+class OctopusBaseCoordinator(DataUpdateCoordinator):
+    """Coordinador base: refresca cada cuenta por separado y traza cada refresco en `Telemetry`.
+
+    Cada cuenta conserva su última copia válida. Si su refresco falla, sus entidades siguen
+    mostrando esos datos con `stale: true` hasta que vuelva a refrescarse bien; y cada cuenta
+    se publica en cuanto termina, sin esperar a las más lentas.
+
+    Cuando las respuestas de la API son idénticas a las anteriores, el cliente devuelve los
+    mismos objetos; el snapshot resultante es igual al anterior y, con `always_update=False`,
+    no se notifica a las entidades.
+
+    Cada refresco tiene una fecha límite (`refresh_deadline`): las consultas que no han
+    terminado se cancelan, se publica lo que sí llegó y lo cancelado se reintenta antes del
+    siguiente ciclo. Las consultas de baja prioridad que vencen seguidas se espacian.
+    """
+
+    def __init__(self, hass: HomeAssistant, email: str, password: str, name: str, update_interval: timedelta, api: OctopusSpain | None = None, token: str | None = None):
+        super().__init__(hass=hass, logger=_LOGGER, name=name, update_interval=update_interval, always_update=False)
+        # Si se comparte el cliente, también se comparten su deduplicación, su telemetría y su token
+        if api is None:
+            api = OctopusSpain(email, password, session=async_get_clientsession(hass), telemetry=Telemetry(), token=token)
+        self._api = api
+        self.telemetry = api.telemetry
+        self._accounts: dict[str, AccountState] = {}
+        self._device_index: tuple[dict | None, dict[str, dict]] = (None, {})
+        self.refresh_deadline = REFRESH_DEADLINE
+        self._deadline = 0.0
+        # {operación[:cuenta]: (vencimientos seguidos, instante monotónico hasta el que se espacia)}
+        self._timeouts: dict[str, tuple[int, float]] = {}
+        self._unsub_retry: CALLBACK_TYPE | None = None
+        # Hora local de la última facturación descargada de cada cuenta
+        self._billing_fetched: dict[str, datetime] = {}
+
+    @property
+    def api(self) -> OctopusSpain:
+        """Cliente de la API usado por este coordinador."""
+        return self._api
+
+    @profiled(lambda self: f"refresh {self.name}")
     async def _async_update_data(self):
-        _LOGGER.info("🔄 Ejecutando `_async_update_data()`")
-
-        if await self._api.login():
-            _LOGGER.info("🔑 Login exitoso en OctopusSpain")
-            self._data = {}
-            accounts = await self._api.accounts()
-            _LOGGER.info(f"📂 Cuentas obtenidas: {accounts}")
-
-            for account in accounts:
-                account_data = await self._api.account(account)
-                _LOGGER.info(f"📋 Datos de la cuenta {account}: {account_data}")
-
-                devices = await self._api.devices(account) or []
-                _LOGGER.info(f"📱 Dispositivos obtenidos: {len(devices)} dispositivo(s)")
-
-                self._data[account] = {
-                    **account_data,
-                    "devices": devices,
-                }
+        trace = self.telemetry.start_refresh(self.name, self.update_interval.total_seconds())
+        try:
+            data = await self._async_fetch_data()
+        except Exception as err:
+            self.telemetry.finish_refresh(trace, err)
+            raise
+        self.telemetry.finish_refresh(trace)
+        return data
+
+    async def _async_fetch_data(self):
+        _LOGGER.info(f"🔄 Ejecutando `_async_update_data()` ({self.name})")
+        self._deadline = asyncio.get_running_loop().time() + self.refresh_deadline
+
+        # Solo hay login si no hay token o está a punto de caducar
+        try:
+            logged_in = await self._with_deadline("obtainKrakenToken", self._api.ensure_token())
+        except TimeoutError as err:
+            logged_in = False
+            _LOGGER.warning(f"⌛ {err}")
+        if not logged_in:
+            self._mark_failed(self._accounts, "Login fallido")
+            return self._snapshot_or_fail("Error al autenticar en Octopus Spain")
 
-            _LOGGER.info(f"📊 Datos obtenidos y almacenados: {self._data}")
+        try:
+            accounts = await self._with_deadline("getAccountNames", self._api.accounts())
+        except Exception as err:
+            # Un error de la API puede ser un token revocado: el siguiente refresco hará login
+            if not isinstance(err, (KrakenTransportError, TimeoutError)):
+                self._api.invalidate_token()
+            self._mark_failed(self._accounts, str(err))
+            return self._snapshot_or_fail(f"Error obteniendo las cuentas: {err}")
+        _LOGGER.info(f"📂 Cuentas obtenidas: {accounts}")
+
+        # Las cuentas que ya no existen desaparecen del snapshot y de todo lo que se guarda de ellas
+        for account in set(self._accounts) - set(accounts):
+            self._forget_account(account)
+
+        await asyncio.gather(*(self._async_refresh_account(account) for account in accounts))
+        _LOGGER.debug(f"📊 Datos obtenidos y almacenados ({self.name}): {self._snapshot()}")
+        return self._snapshot_or_fail("No se pudo obtener ninguna cuenta")
+
+    async def _async_refresh_account(self, account: str) -> None:
+        state = self._accounts.setdefault(account, AccountState())
+        try:
+            data = await self._async_fetch_account(account)
+        except Exception as err:
+            state.error = f"{type(err).__name__}: {err}"
+            _LOGGER.warning(f"⚠️ Fallo al refrescar la cuenta {account}, se mantienen los últimos datos: {err}")
+            return
+        changed = data is not state.data or state.error is not None
+        state.data = data
+        state.error = None
+        state.updated_at = dt_util.utcnow()
+
+        # Publica ya esta cuenta si ha cambiado y hay un snapshot previo; las demás siguen refrescándose
+        if changed and self.data is not None:
+            self.data = self._snapshot()
+            self.async_update_listeners()
+
+    @abstractmethod
+    async def _async_fetch_account(self, account: str) -> dict:
+        """Datos de una cuenta; cada coordinador decide qué consultas hace."""
+
+    def _forget_account(self, account: str) -> None:
+        self._accounts.pop(account, None)
+        self._billing_fetched.pop(account, None)
+
+    async def _with_deadline(self, operation: str, awaitable, account: str | None = None):
+        """Espera `awaitable` como mucho hasta la fecha límite del refresco; si no, lo cancela."""
+        remaining = self._deadline - asyncio.get_running_loop().time()
+        dataset = _dataset(operation, account)
+        try:
+            result = await asyncio.wait_for(awaitable, max(remaining, 0))
+        except TimeoutError as err:
+            self._record_timeout(operation, dataset)
+            raise TimeoutError(f"`{operation}` cancelada por la fecha límite del refresco ({self.refresh_deadline} s)") from err
+        self._timeouts.pop(dataset, None)
+        return result
+
+    def _record_timeout(self, operation: str, dataset: str) -> None:
+        streak = self._timeouts.get(dataset, (0, 0.0))[0] + 1
+        delay = min(TIMEOUT_RETRY_DELAY * 2 ** (streak - 1), TIMEOUT_BACKOFF_MAX)
+        self._timeouts[dataset] = (streak, time.monotonic() + delay)
+        self.telemetry.record_timeout(operation)
+        self._schedule_timeout_retry()
+
+    @callback
+    def _schedule_timeout_retry(self) -> None:
+        """Un único temporizador: el reintento más cercano de lo cancelado por la fecha límite."""
+        self.async_cancel_timeout_retry()
+        now = time.monotonic()
+        pending = [until for _, until in self._timeouts.values() if until > now]
+        if pending:
+            self._unsub_retry = async_call_later(self.hass, min(pending) - now, self._async_retry_timed_out)
+
+    async def _async_retry_timed_out(self, _now=None) -> None:
+        self._unsub_retry = None
+        _LOGGER.info(f"🔁 Reintentando lo cancelado por la fecha límite ({self.name}): {list(self._timeouts)}")
+        await self.async_request_refresh()
+
+    @callback
+    def async_cancel_timeout_retry(self) -> None:
+        """Cancela el reintento pendiente (al descargar la integración)."""
+        if self._unsub_retry:
+            self._unsub_retry()
+            self._unsub_retry = None
+
+    def _billing_due(self, account: str, billing: dict | None) -> bool:
+        """La facturación solo se vuelve a pedir cuando ha podido cambiar (ver `billing_due`)."""
+        if billing_due(billing, self._billing_fetched.get(account), dt_util.now()):
+            return True
+        self.telemetry.incr("deferred")
+        return False
+
+    def _should_fetch(self, operation: str, priority: str, have_previous: bool, account: str | None = None) -> bool:
+        """Consulta el presupuesto y los vencimientos; solo se aplaza si hay datos anteriores que seguir usando."""
+        if not have_previous:
+            return True
+        timeout = self._timeouts.get(_dataset(operation, account))
+        if priority != PRIORITY_HIGH and timeout is not None and timeout[1] > time.monotonic():
+            self.telemetry.incr("deferred")
+            _LOGGER.info(f"⏳ `{operation}` venció {timeout[0]} vez/veces seguidas, se aplaza")
+            return False
+        if self._api.budget.allows(operation, priority):
+            return True
+        self.telemetry.incr("deferred")
+        _LOGGER.info(f"⏳ Presupuesto de complejidad ajustado, se aplaza `{operation}`")
+        return False
+
+    @staticmethod
+    def _mark_failed(accounts: dict[str, AccountState], error: str) -> None:
+        for state in accounts.values():
+            state.error = error
+
+    def _snapshot(self) -> dict:
+        return {
+            account: state.as_dict()
+            for account, state in self._accounts.items()
+            if state.data is not None
+        }
+
+    def _snapshot_or_fail(self, message: str) -> dict:
+        snapshot = self._snapshot()
+        if not snapshot:
+            raise UpdateFailed(message)
+        return snapshot
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Con un perfilado en curso, mide por separado la actualización de cada entidad."""
+        if (session := active_profile()) is None:
+            super().async_update_listeners()
+            return
+        for update_callback, _ in list(self._listeners.values()):
+            owner = getattr(update_callback, "__self__", None)
+            label = getattr(owner, "entity_id", None) or getattr(update_callback, "__qualname__", repr(update_callback))
+            session.run(f"update {label}", update_callback)
+
+    def account_state(self, account: str) -> AccountState | None:
+        """Estado de refresco de una cuenta."""
+        return self._accounts.get(account)
+
+    def device(self, device_id: str) -> dict | None:
+        """Dispositivo por ID; el índice se rehace solo cuando cambia el snapshot."""
+        data, index = self._device_index
+        if data is not self.data:
+            index = {
+                device["id"]: device
+                for account_data in (self.data or {}).values()
+                for device in account_data.get("devices", [])
+                if device.get("id")
+            }
+            self._device_index = (self.data, index)
+        return index.get(device_id)
+
+
+class OctopusIntelligentCoordinator(OctopusBaseCoordinator):
+
+    def __init__(self, hass: HomeAssistant, email: str, password: str, token: str | None = None, api: OctopusSpain | None = None):
+        super().__init__(hass, email, password, name="Octopus Intelligent Go", update_interval=timedelta(minutes=UPDATE_INTERVAL), api=api, token=token)
+        self._merged: dict[str, tuple] = {}
+        self._history: dict[str, DeviceHistory] = {}
+        self.sessions = ChargeSessionDetector()
+        self.alerts = AlertIndex()
+        self.outbox = MutationOutbox(hass, self)
+        self._history_store = Store(hass, HISTORY_STORAGE_VERSION, HISTORY_STORAGE_KEY)
+        # Confirmaciones de carga inmediata y sus sondeos, por dispositivo
+        self._boosts: dict[str, BoostConfirmation] = {}
+        self._boost_tasks: dict[str, asyncio.Task] = {}
+        self._boost_listeners: list[CALLBACK_TYPE] = []
+
+    async def async_load_history(self) -> None:
+        """Carga el historial de transiciones guardado; debe llamarse antes del primer refresco."""
+        stored = await self._history_store.async_load() or {}
+        self._history = {
+            device_id: DeviceHistory.from_dict(data)
+            for device_id, data in stored.get("devices", {}).items()
+        }
+        self.sessions.load(stored.get("sessions", {}))
+        self.alerts.load(stored.get("alerts", {}))
+
+    def history(self, device_id: str) -> DeviceHistory | None:
+        """Historial de transiciones de estado de un dispositivo."""
+        return self._history.get(device_id)
+
+    def _record_readings(self, devices: list[dict]) -> None:
+        """Pasa cada lectura al historial de transiciones, al detector de sesiones y al índice de alertas."""
+        now = dt_util.utcnow().timestamp()
+        changed = False
+        for device in devices:
+            if not device.get("id"):
+                continue
+            new_alerts = self.alerts.observe(device["id"], device.get("alerts") or [])
+            if new_alerts is not None:
+                changed = True
+                for alert in new_alerts:
+                    self._async_fire_alert(device, alert)
+
+            status = device.get("status") or {}
+            if not status:
+                continue
+            history = self._history.get(device["id"])
+            if history is None:
+                history = self._history[device["id"]] = DeviceHistory()
+            changed |= history.observe(now, status)
+
+            power = (device.get("chargePointVariant") or {}).get("powerInKw")
+            soc_limit = (status.get("stateOfChargeLimit") or {}).get("upperSocLimit")
+            session = self.sessions.observe(device["id"], now, status.get("currentState"), float(power or 0), soc_limit)
+            if session is not None:
+                self._async_publish_session(session)
+        if changed:
+            self._history_store.async_delay_save(self._history_data, HISTORY_SAVE_DELAY)
+
+    def _history_data(self) -> dict:
+        return {
+            "devices": {device_id: history.as_dict() for device_id, history in self._history.items()},
+            "sessions": self.sessions.to_store(),
+            "alerts": self.alerts.to_store(),
+        }
+
+    def _async_fire_alert(self, device: dict, alert: dict) -> None:
+        """Emite una alerta nueva del dispositivo; cada `(message, publishedAt)` se emite una sola vez."""
+        _LOGGER.info(f"🔔 Nueva alerta en {device.get('name') or device['id']}: {alert.get('message')}")
+        self.hass.bus.async_fire(EVENT_DEVICE_ALERT, {
+            "device_id": device["id"],
+            "device_name": device.get("name"),
+            "message": alert.get("message"),
+            "published_at": alert.get("publishedAt"),
+        })
+
+    def _async_publish_session(self, session: ChargeSession) -> None:
+        """Emite la sesión completada como evento y como fila de estadísticas a largo plazo."""
+        data = session.as_dict()
+        _LOGGER.info(f"🔋 Sesión de carga completada en {session.device_id}: {data['energy_kwh']} kWh")
+        self.hass.bus.async_fire(EVENT_CHARGE_SESSION, data)
+
+        if "recorder" not in self.hass.config.components:
+            return
+        from homeassistant.components.recorder.models import StatisticData, StatisticMeanType, StatisticMetaData
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+        from homeassistant.const import UnitOfEnergy
+        from homeassistant.util.unit_conversion import EnergyConverter
+
+        _, device = self.find_device(session.device_id)
+        statistic_id = f"{DOMAIN}:charge_energy_{session.device_id.replace('-', '_').lower()}"
+        metadata = StatisticMetaData(
+            mean_type=StatisticMeanType.NONE,
+            has_sum=True,
+            name=f"Energía cargada {(device or {}).get('name', session.device_id)}",
+            source=DOMAIN,
+            statistic_id=statistic_id,
+            unit_class=EnergyConverter.UNIT_CLASS,
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+        end = dt_util.utc_from_timestamp(session.end)
+        statistic = StatisticData(
+            start=end.replace(minute=0, second=0, microsecond=0),
+            state=session.energy_kwh,
+            sum=self.sessions.stats(session.device_id).total_energy_kwh,
+        )
+        async_add_external_statistics(self.hass, metadata, [statistic])
+
+    def _forget_account(self, account: str) -> None:
+        super()._forget_account(account)
+        self._merged.pop(account, None)
+
+    async def _async_fetch_account(self, account: str) -> dict:
+        cached = self._merged.get(account)
+        # El estado de los dispositivos siempre se consulta; la facturación puede esperar,
+        # y durante el arranque de HA no se pide para no alargarlo
+        billing = cached[0] if cached else _BILLING_PENDING
+        if (
+            self.hass.state is CoreState.running
+            and self._billing_due(account, billing)
+            and self._should_fetch("accountBillingInfo", PRIORITY_LOW, cached is not None, account)
+        ):
+            account_data, devices = await asyncio.gather(
+                self._billing_or(account, billing), self._with_deadline("devices", self._api.devices(account), account)
+            )
+        else:
+            account_data, devices = billing, await self._with_deadline("devices", self._api.devices(account), account)
+
+        # Cada lectura cuenta aunque no haya cambiado: la energía se integra en el tiempo
+        self._record_readings(devices or [])
+
+        # Respuestas idénticas a las anteriores: se reutiliza el mismo diccionario
+        if cached is not None and cached[0] is account_data and cached[1] is devices:
+            return cached[2]
+
+        _LOGGER.debug(f"📋 Datos de la cuenta {account}: {account_data}")
+        _LOGGER.info(f"📱 Dispositivos obtenidos: {len(devices or [])} dispositivo(s)")
+        merged = {
+            **account_data,
+            "devices": devices or [],
+        }
+        self._merged[account] = (account_data, devices, merged)
+        return merged
+
+    async def _billing_or(self, account: str, fallback: dict) -> dict:
+        """Facturación de la cuenta; si falla o vence la fecha límite se publican los dispositivos con la anterior.
+
+        Cualquier fallo propio de la facturación (red, errores GraphQL, respuesta sin el ledger
+        de electricidad) se queda aquí: el estado de los dispositivos no depende de ella.
+        """
+        try:
+            billing = await self._with_deadline("accountBillingInfo", self._api.account(account), account)
+        except TimeoutError as err:
+            _LOGGER.warning(f"⌛ {err}; se mantiene la facturación anterior de {account}")
+            return fallback
+        except Exception as err:
+            _LOGGER.warning(f"⚠️ No se pudo obtener la facturación de {account}, se mantiene la anterior: {err}")
+            return fallback
+        self._billing_fetched[account] = dt_util.now()
+        return billing
 
-        return self._data
-    
     async def set_vehicle_charge_preferences(self, account_number: str, weekday_target_time: str, weekend_target_time: str) -> bool:
         """Actualiza las preferencias de carga del vehículo en la API de Octopus."""
         _LOGGER.info(f"🚗 Enviando nueva configuración de carga para {account_number}: {weekday_target_time} / {weekend_target_time}")
@@ -65,47 +475,276 @@ class OctopusIntelligentCoordinator(DataUpdateCoordinator):
             _LOGGER.error(f"❌ Excepción en `set_vehicle_charge_preferences`: {e}")
             return False
 
-    async def boost_charge(self, account_number: str):
-        """Función para ser llamada desde el servicio de Home Assistant."""
+    async def boost_charge(self, account_number: str, device_id: str | None = None):
+        """Activa la carga inmediata y confirma en segundo plano que el dispositivo la aplica.
+
+        Kraken aplica la carga inmediata a la cuenta; en vez de un refresco completo se sondea
+        solo el estado de `device_id` (`boost.py`), y el progreso queda en
+        `boost_confirmation(device_id)`. Cada dispositivo tiene su propia confirmación.
+        """
         _LOGGER.info(f"⚡ Intentando activar la carga inmediata para la cuenta {account_number}")
-        success = await self._api.trigger_boost_charge(account_number)
-        if success:
-            _LOGGER.info(f"✅ Carga inmediata activada para la cuenta {account_number}")
-            await self.async_request_refresh() # Forzamos la actualización para ver el cambio de estado
-        else:
+        if device_id is None:
+            device_id = next((device.get("id") for device in self.data.get(account_number, {}).get("devices", [])), None) if self.data else None
+        confirmation = None
+        if device_id is not None:
+            self._async_cancel_boost_task(device_id)
+            confirmation = self._boosts[device_id] = BoostConfirmation(account_number, device_id)
+            self._async_boost_changed()
+
+        success = await self.outbox.async_submit(MUTATION_BOOST, {account_number: None})
+        if not success:
+            if confirmation is not None:
+                queued = any(entry["kind"] == MUTATION_BOOST and entry["target"] == account_number for entry in self.outbox.pending)
+                confirmation.finish(CONFIRM_QUEUED if queued else CONFIRM_FAILED)
+                self._async_boost_changed()
             _LOGGER.error(f"❌ Fallo al activar la carga inmediata para la cuenta {account_number}")
-        return success
+            return success
 
+        _LOGGER.info(f"✅ Carga inmediata activada para la cuenta {account_number}")
+        if confirmation is None:
+            await self.async_request_refresh()
+        else:
+            self._boost_tasks[device_id] = self.hass.async_create_task(
+                self._async_confirm_boost(confirmation), f"{DOMAIN} boost confirmation {device_id}"
+            )
+        return success
 
-class OctopusHourlyCoordinator(DataUpdateCoordinator):
-    """Coordinator para actualizar datos cada hora."""
-
-    def __init__(self, hass: HomeAssistant, email: str, password: str):
-        super().__init__(hass=hass, logger=_LOGGER, name="Octopus Hourly Data", update_interval=timedelta(hours=1))
-        self._api = OctopusSpain(email, password)
-        self._data = {}
+    async def _async_confirm_boost(self, confirmation: BoostConfirmation) -> None:
+        account, device_id = confirmation.account, confirmation.device_id
 
-    async def _async_update_data(self):
-        _LOGGER.info("🔄 Ejecutando `_async_update_data()` (cada hora)")
+        def _update(status: dict | None) -> None:
+            if status is not None:
+                self._async_patch_device_status(account, device_id, status)
+            self._async_boost_changed()
 
-        if await self._api.login():
-            _LOGGER.info("🔑 Login exitoso en OctopusSpain (Hourly Coordinator)")
-            self._data = {}
-            accounts = await self._api.accounts()
-            _LOGGER.info(f"📂 Cuentas obtenidas: {accounts}")
+        try:
+            confirmed = await async_poll_until_boosting(
+                confirmation, lambda: self._api.device_status(account, device_id), _update
+            )
+        finally:
+            if self._boost_tasks.get(device_id) is asyncio.current_task():
+                del self._boost_tasks[device_id]
+        if confirmed is not None:
+            _LOGGER.info(f"🚀 Carga inmediata confirmada en {device_id} tras {confirmation.attempts} sondeo(s)")
+        else:
+            # Sin confirmación: el refresco completo deja el estado real que tenga Kraken
+            _LOGGER.warning(f"⌛ La carga inmediata de {device_id} no se ha confirmado; se refrescan los datos")
+            await self.async_request_refresh()
+
+    @callback
+    def _async_patch_device_status(self, account: str, device_id: str, status: dict) -> None:
+        """Publica el estado sondeado de un dispositivo sin tocar el resto del snapshot."""
+        state = self._accounts.get(account)
+        if state is None or state.data is None:
+            return
+        devices = [
+            {**device, "status": {**(device.get("status") or {}), **status}} if device.get("id") == device_id else device
+            for device in state.data.get("devices", [])
+        ]
+        # Copias nuevas: los diccionarios en caché del cliente son compartidos
+        state.data = {**state.data, "devices": devices}
+        state.updated_at = dt_util.utcnow()
+        self._record_readings([device for device in devices if device.get("id") == device_id])
+        if self.data is not None:
+            self.data = self._snapshot()
+            self.async_update_listeners()
+
+    def boost_confirmation(self, device_id: str) -> BoostConfirmation | None:
+        """Confirmación de la última carga inmediata pedida desde un dispositivo."""
+        return self._boosts.get(device_id)
+
+    @callback
+    def async_add_boost_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Avisa a `update_callback` en cada paso de una confirmación; devuelve la función para darse de baja."""
+        self._boost_listeners.append(update_callback)
+        return lambda: self._boost_listeners.remove(update_callback)
+
+    @callback
+    def _async_boost_changed(self) -> None:
+        for update_callback in list(self._boost_listeners):
+            update_callback()
+
+    @callback
+    def _async_cancel_boost_task(self, device_id: str) -> None:
+        task = self._boost_tasks.pop(device_id, None)
+        if task is not None:
+            task.cancel()
+        confirmation = self._boosts.get(device_id)
+        if confirmation is not None and confirmation.state == CONFIRM_PENDING:
+            confirmation.finish(CONFIRM_FAILED)
+
+    @callback
+    def async_cancel_boost_confirmations(self) -> None:
+        """Cancela los sondeos de confirmación en curso (al descargar la integración)."""
+        for device_id in list(self._boost_tasks):
+            self._async_cancel_boost_task(device_id)
+
+    def find_device(self, device_id: str | None = None) -> tuple[str, dict] | tuple[None, None]:
+        """Busca un dispositivo por ID (o el primero si no se indica) y devuelve (cuenta, dispositivo)."""
+        for account, account_data in (self.data or {}).items():
+            for device in account_data.get("devices", []):
+                if device_id is None or device.get("id") == device_id:
+                    return account, device
+        return None, None
+
+    async def apply_charge_schedule(self, device_id: str, schedules: list[dict]) -> bool:
+        """Envía los 7 horarios de carga en una única llamada a `setDevicePreferences`.
+
+        Si Kraken no responde, el horario queda en el outbox y se reenvía al recuperarse.
+        """
+        if not await self.outbox.async_submit(MUTATION_PREFERENCES, {device_id: schedules}):
+            _LOGGER.error(f"❌ No se pudo aplicar el plan de carga a {device_id}")
+            return False
+        await self.async_request_refresh()
+        return True
 
-            for account in accounts:
-                account_data = await self._api.account(account)
-                _LOGGER.info(f"📋 Datos de la cuenta {account}: {account_data}")
+    async def set_smart_control(self, actions: dict[str, str]) -> bool:
+        """Suspende o reanuda el control inteligente de uno o varios dispositivos en una sola llamada."""
+        _LOGGER.info(f"⏸️ Cambiando control inteligente: {actions}")
+        success = await self.outbox.async_submit(MUTATION_SMART_CONTROL, actions)
+        if success:
+            await self.async_request_refresh()
+        else:
+            _LOGGER.error(f"❌ Fallo al cambiar el control inteligente: {actions}")
+        return success
 
-                self._data[account] = {
-                    **account_data
-                }
 
-            _LOGGER.info(f"📊 Datos obtenidos y almacenados (Hourly Coordinator): {self._data}")
+class OctopusHourlyCoordinator(OctopusBaseCoordinator):
+    """Coordinator para actualizar datos cada hora.
+
+    Cada hora solo comprueba si la facturación ha podido cambiar; cuando la descarga, anota
+    los saldos en su historial submuestreado (`BalanceHistory`), que se guarda en `.storage`.
+
+    Una vez al día pide además la demanda por intervalos desde el último día guardado (como
+    mucho `DEMAND_CHUNK_DAYS` por refresco) y recalcula el maxímetro (`maximeter.py`); el
+    análisis se publica en el snapshot de la cuenta bajo `demand`.
+    """
+
+    def __init__(self, hass: HomeAssistant, email: str, password: str, api: OctopusSpain | None = None):
+        super().__init__(hass, email, password, name="Octopus Hourly Data", update_interval=timedelta(hours=1), api=api)
+        self._balances: dict[str, dict[str, BalanceHistory]] = {}
+        self._balance_store = Store(hass, BALANCE_STORAGE_VERSION, BALANCE_STORAGE_KEY)
+        self._demand: dict[str, DemandHistory] = {}
+        self._contracted: dict[str, dict[str, float]] = {}
+        # Día local en que cada cuenta quedó al día de lecturas
+        self._demand_synced: dict[str, date] = {}
+        # Primer día de la siguiente petición de lecturas
+        self._demand_cursor: dict[str, date] = {}
+        self._demand_store = Store(hass, DEMAND_STORAGE_VERSION, DEMAND_STORAGE_KEY)
+
+    async def async_load_balances(self) -> None:
+        """Carga el historial de saldos y el de demanda guardados; debe llamarse antes del primer refresco."""
+        stored, demand = await asyncio.gather(self._balance_store.async_load(), self._demand_store.async_load())
+        self._balances = {
+            account: {key: BalanceHistory.from_dict(data) for key, data in balances.items()}
+            for account, balances in (stored or {}).get("accounts", {}).items()
+        }
+        for account, data in (demand or {}).get("accounts", {}).items():
+            self._demand[account] = DemandHistory.from_dict(data)
+            self._contracted[account] = data.get("contracted", {})
+
+    def balance_history(self, account: str, key: str) -> BalanceHistory | None:
+        """Historial de `solar_wallet` u `octopus_credit` de una cuenta."""
+        return self._balances.get(account, {}).get(key)
+
+    def _record_balances(self, account: str, billing: dict) -> None:
+        now = dt_util.utcnow().timestamp()
+        balances = self._balances.setdefault(account, {})
+        for key in BALANCE_KEYS:
+            if billing.get(key) is not None:
+                balances.setdefault(key, BalanceHistory()).observe(now, billing[key])
+        self._balance_store.async_delay_save(self._balance_data, BALANCE_SAVE_DELAY)
+
+    def _balance_data(self) -> dict:
+        return {
+            "accounts": {
+                account: {key: history.as_dict() for key, history in balances.items()}
+                for account, balances in self._balances.items()
+            }
+        }
+
+    def _demand_data(self) -> dict:
+        return {
+            "accounts": {
+                account: {**history.as_dict(), "contracted": self._contracted.get(account, {})}
+                for account, history in self._demand.items()
+            }
+        }
+
+    def _forget_account(self, account: str) -> None:
+        super()._forget_account(account)
+        self._demand_synced.pop(account, None)
+        self._demand_cursor.pop(account, None)
+
+    async def _async_fetch_account(self, account: str) -> dict:
+        state = self._accounts.get(account)
+        previous = state.data if state is not None else None
+        billing = previous
+        if self._billing_due(account, previous) and self._should_fetch("accountBillingInfo", PRIORITY_LOW, previous is not None, account):
+            billing = await self._with_deadline("accountBillingInfo", self._api.account(account), account)
+            self._billing_fetched[account] = dt_util.now()
+            self._record_balances(account, billing)
+            _LOGGER.debug(f"📋 Datos de la cuenta {account}: {billing}")
+
+        demand = await self._async_sync_demand(account)
+        if billing is previous and demand is None:
+            return previous
+        return {**billing, DEMAND_KEY: demand if demand is not None else (previous or {}).get(DEMAND_KEY)}
+
+    async def _async_sync_demand(self, account: str) -> dict | None:
+        """Pide las lecturas que faltan y devuelve el análisis nuevo, o None si no ha cambiado.
+
+        Un fallo aquí no impide publicar la facturación: se reintenta en el siguiente refresco.
+        """
+        today = dt_util.now().date()
+        if self._demand_synced.get(account) == today:
+            return None
+        history = self._demand.setdefault(account, DemandHistory())
+        if not self._should_fetch("demandReadings", PRIORITY_LOW, bool(history), account):
+            return None
+
+        # Los últimos días se vuelven a pedir: la distribuidora los publica con retraso
+        lag = today - timedelta(days=DEMAND_LAG_DAYS)
+        first = self._demand_cursor.get(account) or (
+            min(history.last_day, lag) if history else today - timedelta(days=DEMAND_HISTORY_DAYS)
+        )
+        last = min(first + timedelta(days=DEMAND_CHUNK_DAYS), today + timedelta(days=1))
+        start = dt_util.start_of_local_day(first)
+        end = dt_util.start_of_local_day(last)
+        try:
+            readings = await self._with_deadline("demandReadings", self._api.demand_readings(account, start, end), account)
+        except Exception as err:
+            _LOGGER.warning(f"⚠️ No se pudo obtener la demanda de {account}: {err}")
+            return None
+
+        history.load_readings([(dt_util.as_local(started), hours, kwh) for started, hours, kwh in readings])
+        self._demand_cursor[account] = min(last, lag)
+        if last > today:
+            self._demand_synced[account] = today
+        self._demand_store.async_delay_save(self._demand_data, DEMAND_SAVE_DELAY)
+        _LOGGER.info(f"📈 {len(readings)} lecturas de demanda de {account} ({first} a {last})")
+        return analyze_demand(history, self._contracted.get(account, {}), today)
+
+    def demand_analysis(self, account: str, days: int = ROLLING_DAYS) -> dict | None:
+        """Análisis de maxímetro de la cuenta sobre una ventana de `days` días."""
+        history = self._demand.get(account)
+        if not history:
+            return None
+        return analyze_demand(history, self._contracted.get(account, {}), dt_util.now().date(), days)
+
+    @callback
+    def async_set_contracted_power(self, account: str, contracted: dict[str, float]) -> None:
+        """Guarda la potencia contratada por periodo y republica el análisis con los excesos."""
+        self._contracted[account] = {**self._contracted.get(account, {}), **contracted}
+        self._demand_store.async_delay_save(self._demand_data, DEMAND_SAVE_DELAY)
+        state = self._accounts.get(account)
+        if state is None or state.data is None or not self._demand.get(account):
+            return
+        state.data = {**state.data, DEMAND_KEY: self.demand_analysis(account)}
+        if self.data is not None:
+            self.data = self._snapshot()
+            self.async_update_listeners()
 
-        return self._data
-    
 ###Esto revisarlo bien que esta mal
 # class OctopusWalletCoordinator(DataUpdateCoordinator):
 #     """Coordinador para el sensor Octopus Wallet."""
@@ -0,0 +1,43 @@
+"""Diagnóstico de la entrada de configuración de Octopus Spain Intelligent."""
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD
+
+TO_REDACT = {CONF_EMAIL, CONF_PASSWORD, "token", "id", "deviceId", "integrationDeviceId", "title", "unique_id"}
+
+
+def _redact_accounts(data: dict | None) -> dict:
+    """Sustituye los números de cuenta (claves del snapshot) por alias estables."""
+    return {
+        f"account_{index}": async_redact_data(account_data, TO_REDACT)
+        for index, account_data in enumerate((data or {}).values(), start=1)
+    }
+
+
+def _coordinator_diagnostics(coordinator) -> dict[str, Any] | None:
+    if coordinator is None:
+        return None
+    return {
+        "last_update_success": coordinator.last_update_success,
+        "update_interval_s": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+        "data": _redact_accounts(coordinator.data),
+    }
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Devuelve un snapshot redactado y las últimas trazas de refresco."""
+    domain_data = hass.data.get(DOMAIN, {})
+    intelligent = domain_data.get("intelligent_coordinator")
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        # Ambos coordinadores comparten cliente y, por tanto, telemetría
+        "telemetry": intelligent.telemetry.as_dict() if intelligent else None,
+        "complexity_budget": intelligent.api.budget.as_dict() if intelligent else None,
+        "mutation_outbox": async_redact_data(intelligent.outbox.pending, TO_REDACT | {"target"}) if intelligent else None,
+        "intelligent_coordinator": _coordinator_diagnostics(intelligent),
+        "hourly_coordinator": _coordinator_diagnostics(domain_data.get("hourly_coordinator")),
+    }
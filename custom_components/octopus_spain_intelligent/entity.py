@@ -0,0 +1,75 @@
+"""Metadatos y ciclo de vida compartidos por las entidades de la integración.
+
+Con muchos vehículos, cada plataforma crea decenas de entidades por dispositivo; la
+información de dispositivo se calcula una vez por dispositivo y la comparten todas. Las
+entidades de cada dispositivo se crean cuando este aparece en el snapshot del coordinador,
+sin tener que recargar la integración.
+"""
+from collections.abc import Callable
+from functools import lru_cache
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+
+RETIRED_STATE = "RETIRED"
+
+
+@lru_cache(maxsize=None)
+def device_info(device_id: str) -> dict:
+    """Vincula la entidad al dispositivo de Octopus (no se debe modificar el dict devuelto)."""
+    return {"identifiers": {(DOMAIN, device_id)}}
+
+
+@lru_cache(maxsize=None)
+def account_device_info(account: str) -> dict:
+    """Agrupa las entidades de facturación bajo el dispositivo de la cuenta."""
+    return {
+        "identifiers": {(DOMAIN, f"account_{account}")},
+        "name": f"Cuenta {account}",
+    }
+
+
+def active_devices(data: dict | None) -> dict[str, tuple[str, dict]]:
+    """Dispositivos del snapshot que deben tener entidades: {id: (cuenta, dispositivo)}."""
+    return {
+        device["id"]: (account, device)
+        for account, account_data in (data or {}).items()
+        for device in account_data.get("devices", [])
+        if device.get("id") and (device.get("status") or {}).get("currentState") != RETIRED_STATE
+    }
+
+
+@callback
+def async_setup_device_entities(
+    entry: ConfigEntry,
+    coordinator,
+    async_add_entities: AddEntitiesCallback,
+    build: Callable[[str, dict], list[Entity]],
+) -> None:
+    """Crea las entidades de cada dispositivo y, en cada refresco, las de los que aparezcan.
+
+    Las entidades de los dispositivos que desaparecen las retira `__init__` al quitar el
+    dispositivo del registro; aquí solo se olvidan para recrearlas si vuelven.
+    """
+    known: set[str] = set()
+
+    @callback
+    def _async_add_new_devices() -> None:
+        devices = active_devices(coordinator.data)
+        known.intersection_update(devices)
+        entities = [
+            entity
+            for device_id, (account, device) in devices.items()
+            if device_id not in known
+            for entity in build(account, device)
+        ]
+        known.update(devices)
+        if entities:
+            async_add_entities(entities)
+
+    _async_add_new_devices()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_new_devices))
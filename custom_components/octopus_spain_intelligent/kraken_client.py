@@ -0,0 +1,115 @@
+"""Transporte GraphQL mínimo para la API Kraken de Octopus.
+
+Sustituye a `python_graphql_client`: solo depende de aiohttp (que Home Assistant ya trae)
+y lo importa la primera vez que se hace una petición, no al cargar la integración.
+"""
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+
+GRAPH_QL_ENDPOINT = "https://api.oees-kraken.energy/v1/graphql/"
+DEFAULT_TIMEOUT = 30  # Segundos
+QUERY_RETRIES = 1  # Reintentos ante errores de red, solo para consultas de lectura
+
+_LOGGER = logging.getLogger(__name__)
+
+_OPERATION_RE = re.compile(r"^\s*(query|mutation)\s*(\w*)")
+
+
+class KrakenTransportError(Exception):
+    """Error de red o de transporte al hablar con Kraken."""
+
+
+@lru_cache(maxsize=64)
+def operation_info(query: str) -> tuple[str, str]:
+    """Devuelve (tipo, nombre) de una operación GraphQL, p. ej. ("query", "devices")."""
+    match = _OPERATION_RE.match(query)
+    if not match:
+        return "query", "anonymous"
+    return match.group(1), match.group(2) or "anonymous"
+
+
+def decode_response(body: bytes) -> dict:
+    """Parsea el cuerpo de una respuesta; uno corrupto o truncado es un fallo de transporte."""
+    try:
+        response = json.loads(body)
+    except ValueError as err:
+        raise KrakenTransportError(f"Respuesta ilegible: {err}") from err
+    if not isinstance(response, dict):
+        raise KrakenTransportError("Respuesta ilegible: no es un objeto JSON")
+    return response
+
+
+def _check_response(status: int, content_type: str) -> None:
+    """Un estado HTTP de error o un cuerpo que no es JSON (páginas de un proxy) es un fallo de transporte."""
+    if not 200 <= status < 300:
+        raise KrakenTransportError(f"HTTP {status}")
+    if "json" not in content_type:
+        raise KrakenTransportError(f"HTTP {status} sin JSON ({content_type or 'sin tipo'})")
+
+
+class KrakenGraphQLClient:
+    """Cliente GraphQL sobre una única sesión aiohttp reutilizada entre peticiones."""
+
+    def __init__(self, endpoint: str = GRAPH_QL_ENDPOINT, session=None, timeout: float = DEFAULT_TIMEOUT, telemetry=None):
+        self._endpoint = endpoint
+        self._session = session
+        self._owns_session = session is None
+        self._timeout = timeout
+        self._telemetry = telemetry
+
+    async def execute(self, query: str, variables: dict | None = None, headers: dict | None = None) -> dict:
+        """Ejecuta una consulta o mutación y devuelve el JSON de la respuesta."""
+        return decode_response(await self.execute_raw(query, variables, headers))
+
+    async def execute_raw(self, query: str, variables: dict | None = None, headers: dict | None = None) -> bytes:
+        """Ejecuta una consulta o mutación y devuelve el cuerpo de la respuesta sin parsear.
+
+        Los errores de red, los estados HTTP de error y las respuestas que no son JSON se lanzan
+        como `KrakenTransportError`; en las consultas de lectura se reintentan antes.
+        """
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+            self._owns_session = True
+
+        kind, name = operation_info(query)
+        max_retries = QUERY_RETRIES if kind == "query" else 0
+        payload = {"query": query, "variables": variables or {}}
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                async with self._session.post(
+                    self._endpoint,
+                    json=payload,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=self._timeout),
+                ) as response:
+                    body = await response.read()
+                    _check_response(response.status, response.content_type)
+                break
+            except (aiohttp.ClientError, TimeoutError, KrakenTransportError) as err:
+                if attempt < max_retries:
+                    attempt += 1
+                    _LOGGER.debug(f"🔁 Reintentando {name} tras error de red: {err}")
+                    continue
+                self._record(name, started, 0, attempt, type(err).__name__)
+                if isinstance(err, KrakenTransportError):
+                    raise
+                raise KrakenTransportError(str(err) or type(err).__name__) from err
+
+        self._record(name, started, len(body), attempt)
+        return body
+
+    def _record(self, name: str, started: float, size: int, retries: int, error: str | None = None) -> None:
+        if self._telemetry is not None:
+            self._telemetry.record_span(name, time.monotonic() - started, size, retries, error)
+
+    async def close(self) -> None:
+        """Cierra la sesión si la creó el propio cliente."""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
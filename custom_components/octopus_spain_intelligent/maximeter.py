@@ -0,0 +1,186 @@
+"""Maxímetro y potencia contratada a partir de la demanda cuartohoraria del suministro.
+
+Cada día guarda sus 96 cuartos de hora (hora local) en un `array` de vatios de 2 bytes,
+y al cargarlo se calcula el máximo de ese día en cada periodo de potencia. Las consultas
+(máximo de los últimos N días, máximos mensuales, recomendación) recorren solo esos
+máximos diarios; los excesos sobre la potencia contratada sí recorren los cuartos de hora,
+una vez por análisis. Volver a cargar un día lo sustituye entero, así que los datos que la
+distribuidora publica con retraso se pueden pedir otra vez sin duplicar nada.
+"""
+import base64
+import math
+from array import array
+from datetime import date, datetime, timedelta
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+HISTORY_DAYS = 366
+MISSING = 0xFFFF  # Cuarto de hora sin lectura
+
+# Periodos de potencia de la tarifa 2.0TD: P1 de 8 a 24 h en días laborables, P2 el resto
+POWER_PERIODS = ("P1", "P2")
+_P1_FIRST_SLOT = 8 * 60 // SLOT_MINUTES
+
+ROLLING_DAYS = 30
+RECOMMEND_MARGIN = 1.05  # Holgura sobre el máximo anual
+POWER_STEP = 0.1  # kW
+
+
+def power_period(day: date, slot: int) -> str:
+    """Periodo de potencia de un cuarto de hora (los festivos nacionales no se distinguen)."""
+    return "P1" if day.weekday() < 5 and slot >= _P1_FIRST_SLOT else "P2"
+
+
+class DemandHistory:
+    """Demanda cuartohoraria del último año y su máximo diario por periodo de potencia."""
+
+    __slots__ = ("_days", "_daily_max")
+
+    def __init__(self):
+        # {ordinal del día: demanda en W de cada cuarto de hora}
+        self._days: dict[int, array] = {}
+        # {ordinal del día: (máximo P1, máximo P2) en W; MISSING si no hay lecturas}
+        self._daily_max: dict[int, tuple[int, int]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._days)
+
+    @property
+    def last_day(self) -> date | None:
+        """Último día con lecturas."""
+        return date.fromordinal(max(self._days)) if self._days else None
+
+    def load_readings(self, readings: list[tuple[datetime, float, float]]) -> set[date]:
+        """Sustituye los días que cubren `readings` (`(inicio local, horas, kWh)`); devuelve esos días.
+
+        Una lectura de más de un cuarto de hora (p. ej. horaria) reparte su potencia media
+        entre los cuartos de hora que cubre.
+        """
+        days: dict[int, array] = {}
+        for start, hours, kwh in readings:
+            if hours <= 0:
+                continue
+            watts = min(round(kwh / hours * 1000), MISSING - 1)
+            slot = (start.hour * 60 + start.minute) // SLOT_MINUTES
+            ordinal = start.toordinal()
+            for _ in range(max(1, round(hours * 60 / SLOT_MINUTES))):
+                if slot >= SLOTS_PER_DAY:
+                    slot, ordinal = 0, ordinal + 1
+                values = days.get(ordinal)
+                if values is None:
+                    values = days[ordinal] = array("H", [MISSING]) * SLOTS_PER_DAY
+                # El cuarto de hora repetido al atrasar la hora se queda con el mayor
+                previous = values[slot]
+                values[slot] = watts if previous == MISSING else max(previous, watts)
+                slot += 1
+
+        for ordinal, values in days.items():
+            self._days[ordinal] = values
+            self._daily_max[ordinal] = _period_maxima(date.fromordinal(ordinal), values)
+        self._trim()
+        return {date.fromordinal(ordinal) for ordinal in days}
+
+    def _trim(self) -> None:
+        if not self._days:
+            return
+        cutoff = max(self._days) - HISTORY_DAYS
+        for ordinal in [ordinal for ordinal in self._days if ordinal <= cutoff]:
+            del self._days[ordinal]
+            del self._daily_max[ordinal]
+
+    def window_max(self, period: str, end: date, days: int) -> float | None:
+        """Máxima demanda (kW) del periodo en los `days` días que terminan en `end`."""
+        index = POWER_PERIODS.index(period)
+        first = end.toordinal() - days
+        values = [
+            maxima[index] for ordinal, maxima in self._daily_max.items()
+            if first < ordinal <= end.toordinal() and maxima[index] != MISSING
+        ]
+        return max(values) / 1000 if values else None
+
+    def monthly_max(self, period: str) -> dict[str, float]:
+        """Maxímetro de cada mes (`AAAA-MM`: kW), como lo registraría el contador."""
+        index = POWER_PERIODS.index(period)
+        months: dict[str, int] = {}
+        for ordinal in sorted(self._daily_max):
+            value = self._daily_max[ordinal][index]
+            if value != MISSING:
+                month = date.fromordinal(ordinal).strftime("%Y-%m")
+                months[month] = max(months.get(month, 0), value)
+        return {month: value / 1000 for month, value in months.items()}
+
+    def exceedances(self, period: str, contracted_kw: float, end: date, days: int) -> int:
+        """Cuartos de hora del periodo por encima de `contracted_kw` en los `days` días hasta `end`."""
+        threshold = contracted_kw * 1000
+        index = POWER_PERIODS.index(period)
+        first = end.toordinal() - days
+        count = 0
+        for ordinal, values in self._days.items():
+            if not first < ordinal <= end.toordinal():
+                continue
+            # Sin excesos ese día: no hace falta recorrer sus cuartos de hora
+            daily = self._daily_max[ordinal][index]
+            if daily == MISSING or daily <= threshold:
+                continue
+            day = date.fromordinal(ordinal)
+            count += sum(
+                1 for slot, watts in enumerate(values)
+                if watts != MISSING and watts > threshold and power_period(day, slot) == period
+            )
+        return count
+
+    def as_dict(self) -> dict:
+        return {
+            "days": {
+                str(ordinal): base64.b64encode(values.tobytes()).decode()
+                for ordinal, values in self._days.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DemandHistory":
+        history = cls()
+        for ordinal, encoded in data.get("days", {}).items():
+            values = array("H")
+            values.frombytes(base64.b64decode(encoded))
+            if len(values) != SLOTS_PER_DAY:
+                continue
+            history._days[int(ordinal)] = values
+            history._daily_max[int(ordinal)] = _period_maxima(date.fromordinal(int(ordinal)), values)
+        return history
+
+
+def _period_maxima(day: date, values: array) -> tuple[int, int]:
+    p1 = values[_P1_FIRST_SLOT:] if day.weekday() < 5 else array("H")
+    p2 = values[:_P1_FIRST_SLOT] if day.weekday() < 5 else values
+    return tuple(
+        max((watts for watts in slots if watts != MISSING), default=MISSING)
+        for slots in (p1, p2)
+    )
+
+
+def recommended_power(yearly_max_kw: float | None) -> float | None:
+    """Potencia a contratar: el máximo anual con holgura, redondeado al alza a 0,1 kW."""
+    if yearly_max_kw is None:
+        return None
+    return math.ceil(yearly_max_kw * RECOMMEND_MARGIN / POWER_STEP - 1e-9) * POWER_STEP
+
+
+def analyze(history: DemandHistory, contracted: dict[str, float], today: date, days: int = ROLLING_DAYS) -> dict:
+    """Máximos, excesos y potencia recomendada por periodo hasta ayer (el último día completo)."""
+    end = today - timedelta(days=1)
+    result = {"days": days, "last_day": history.last_day.isoformat() if history else None, "periods": {}}
+    for period in POWER_PERIODS:
+        yearly = history.window_max(period, end, HISTORY_DAYS)
+        recommended = recommended_power(yearly)
+        contracted_kw = contracted.get(period)
+        result["periods"][period] = {
+            "rolling_max_kw": history.window_max(period, end, days),
+            "yearly_max_kw": yearly,
+            "recommended_kw": None if recommended is None else round(recommended, 1),
+            "contracted_kw": contracted_kw,
+            "exceedances": None if contracted_kw is None else history.exceedances(period, contracted_kw, end, days),
+            "exceedances_year": None if contracted_kw is None else history.exceedances(period, contracted_kw, end, HISTORY_DAYS),
+            "monthly_max_kw": history.monthly_max(period),
+        }
+    return result
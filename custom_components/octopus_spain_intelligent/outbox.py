@@ -0,0 +1,181 @@
+import logging
+from datetime import timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .kraken_client import KrakenTransportError
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.mutation_outbox"
+
+MUTATION_PREFERENCES = "preferences"
+MUTATION_BOOST = "boost"
+MUTATION_SMART_CONTROL = "smart_control"
+
+RETRY_BASE = 30  # Segundos hasta el primer reintento
+RETRY_MAX = 30 * 60  # Tope del backoff exponencial
+# Antigüedad a partir de la cual la intención ya no tiene sentido y se descarta
+MAX_AGE = {
+    MUTATION_PREFERENCES: timedelta(days=1),
+    MUTATION_BOOST: timedelta(minutes=30),
+    MUTATION_SMART_CONTROL: timedelta(hours=12),
+}
+
+
+class MutationOutbox:
+    """Cola persistente de mutaciones que no se pudieron enviar por un fallo de red.
+
+    Hay como mucho una entrada por (tipo, dispositivo o cuenta): una mutación nueva sustituye
+    a la pendiente, así que solo se reenvía la última intención (p. ej. el último horario).
+    Las entradas se guardan en `.storage` y se reenvían con backoff exponencial desde un único
+    temporizador. Los errores de la API (no de red) no se reintentan.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator):
+        self._hass = hass
+        self._coordinator = coordinator
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._entries: dict[str, dict] = {}
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._listeners: list[CALLBACK_TYPE] = []
+
+    @property
+    def pending(self) -> list[dict]:
+        """Mutaciones pendientes de reenviar."""
+        return list(self._entries.values())
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Avisa a `update_callback` cada vez que cambia la cola; devuelve la función para darse de baja."""
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    async def async_load(self) -> None:
+        """Recupera las mutaciones pendientes tras un reinicio y programa su reenvío."""
+        stored = await self._store.async_load() or {}
+        self._entries = {f"{entry['kind']}:{entry['target']}": entry for entry in stored.get("entries", [])}
+        self._drop_expired(dt_util.utcnow())
+        self._schedule_next()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancela el temporizador pendiente."""
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    async def async_submit(self, kind: str, payloads: dict[str, object]) -> bool:
+        """Envía una mutación ya; si falla la red, la deja en cola y devuelve False.
+
+        `payloads` relaciona cada dispositivo o cuenta con su valor (horarios, acción...).
+        """
+        now = dt_util.utcnow()
+        # La intención nueva sustituye a la pendiente del mismo dispositivo
+        replaced = {target: self._entries.pop(f"{kind}:{target}", None) for target in payloads}
+        try:
+            success = await self._async_send(kind, payloads)
+        except KrakenTransportError as err:
+            for target, payload in payloads.items():
+                self._entries[f"{kind}:{target}"] = {
+                    "kind": kind,
+                    "target": target,
+                    "payload": payload,
+                    "created": now.isoformat(),
+                    "attempts": 0,
+                    "next_attempt": (now + timedelta(seconds=RETRY_BASE)).isoformat(),
+                    "last_error": str(err),
+                }
+            _LOGGER.warning(f"📮 Kraken no responde, `{kind}` queda en cola para {list(payloads)}: {err}")
+            await self._async_changed()
+            return False
+        except Exception:
+            self._requeue(kind, replaced)
+            raise
+        if not success:
+            # Kraken no ha confirmado la nueva: la pendiente sigue siendo la última intención válida
+            self._requeue(kind, replaced)
+        elif any(replaced.values()):
+            await self._async_changed()
+        return success
+
+    def _requeue(self, kind: str, replaced: dict[str, dict | None]) -> None:
+        """Devuelve a la cola las entradas sustituidas, salvo que mientras tanto haya llegado otra."""
+        for target, entry in replaced.items():
+            if entry is not None:
+                self._entries.setdefault(f"{kind}:{target}", entry)
+
+    async def _async_send(self, kind: str, payloads: dict[str, object]) -> bool:
+        api = self._coordinator.api
+        if kind == MUTATION_SMART_CONTROL:
+            return await api.update_devices_smart_control(payloads)
+        success = True
+        for target, payload in payloads.items():
+            if kind == MUTATION_PREFERENCES:
+                response = await api.set_device_preferences(device_id=target, mode="CHARGE", unit="PERCENTAGE", schedules=payload)
+                success &= not (isinstance(response, dict) and response.get("success") is False)
+            elif kind == MUTATION_BOOST:
+                success &= await api.trigger_boost_charge(target)
+        return success
+
+    async def _async_replay(self, _now=None) -> None:
+        """Reenvía las entradas vencidas; las de control inteligente van en una sola petición."""
+        self._unsub_timer = None
+        now = dt_util.utcnow()
+        self._drop_expired(now)
+        due: dict[str, dict[str, dict]] = {}
+        for entry in self._entries.values():
+            if dt_util.parse_datetime(entry["next_attempt"]) <= now:
+                due.setdefault(entry["kind"], {})[entry["target"]] = entry
+
+        sent = False
+        for kind, entries in due.items():
+            try:
+                success = await self._async_send(kind, {target: entry["payload"] for target, entry in entries.items()})
+            except KrakenTransportError as err:
+                for entry in entries.values():
+                    entry["attempts"] += 1
+                    delay = min(RETRY_BASE * 2 ** entry["attempts"], RETRY_MAX)
+                    entry["next_attempt"] = (now + timedelta(seconds=delay)).isoformat()
+                    entry["last_error"] = str(err)
+                _LOGGER.debug(f"📮 Reintento de `{kind}` fallido: {err}")
+                continue
+            for target, entry in entries.items():
+                # Si mientras tanto llegó una intención nueva para el dispositivo, esa se conserva
+                if self._entries.get(f"{kind}:{target}") is entry:
+                    del self._entries[f"{kind}:{target}"]
+            sent = True
+            if success:
+                _LOGGER.info(f"📬 Mutación `{kind}` pendiente enviada para {list(entries)}")
+            else:
+                _LOGGER.error(f"❌ Kraken rechazó la mutación pendiente `{kind}` para {list(entries)}")
+
+        await self._async_changed()
+        if sent:
+            await self._coordinator.async_request_refresh()
+
+    def _drop_expired(self, now) -> None:
+        for key, entry in list(self._entries.items()):
+            if now - dt_util.parse_datetime(entry["created"]) > MAX_AGE.get(entry["kind"], timedelta(days=1)):
+                _LOGGER.warning(f"🗑️ Se descarta la mutación `{entry['kind']}` para {entry['target']}: demasiado antigua")
+                del self._entries[key]
+
+    async def _async_changed(self) -> None:
+        await self._store.async_save({"entries": list(self._entries.values())})
+        self._schedule_next()
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _schedule_next(self) -> None:
+        self.async_shutdown()
+        if not self._entries:
+            return
+        when = min(dt_util.parse_datetime(entry["next_attempt"]) for entry in self._entries.values())
+        delay = max((when - dt_util.utcnow()).total_seconds(), 0)
+        self._unsub_timer = async_call_later(self._hass, delay, self._async_replay)
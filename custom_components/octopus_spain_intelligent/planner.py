@@ -0,0 +1,147 @@
+"""Planificador semanal de horas de carga y SOC objetivo.
+
+Busca, para cada día, la mejor combinación (hora de "listo a las", SOC objetivo) de la
+rejilla 48 franjas × 17 pasos de SOC que cumpla la necesidad de energía del día. Cada
+candidato se puntúa con:
+
+- el coste de cargar en las franjas más baratas de la ventana, según la tarifa;
+- menos el valor de la energía cargada por encima del SOC mínimo (`stored_value` €/kWh,
+  por defecto el precio medio de la semana): en valle sale a cuenta llenar más, hasta
+  `max_soc`, porque esa energía no habrá que comprarla a otra hora;
+- menos el margen entre "listo a las" y la salida (`slack_value` € por hora): a igual
+  coste, o si cuesta poco más, se prefiere tener el coche listo antes.
+
+Para cada día se precalculan, por hora de fin, las sumas acumuladas de los precios
+ordenados de la ventana de carga; así cada candidato se puntúa con una sola consulta
+a la tabla y la semana entera (5.712 candidatos) se resuelve en milisegundos.
+"""
+import bisect
+import math
+import time
+
+SLOTS_PER_DAY = 48
+SLOT_HOURS = 0.5
+SOC_STEPS = tuple(range(20, 101, 5))
+MAX_DAILY_SOC = 90  # Tope del SOC extra cargado por precio (el SOC mínimo del día puede superarlo)
+SLACK_VALUE = 0.02  # € por hora de margen entre "listo a las" y la salida
+DAYS = ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY")
+
+# Periodos de la tarifa 2.0TD por franja de media hora en días laborables
+# (P1 punta 10-14 y 18-22, P2 llano 8-10, 14-18 y 22-24, P3 valle 0-8). Fines de semana: P3.
+_WEEKDAY_PERIODS = tuple(
+    "P3" if hour < 8 else "P1" if 10 <= hour < 14 or 18 <= hour < 22 else "P2"
+    for hour in (slot // 2 for slot in range(SLOTS_PER_DAY))
+)
+_WEEKEND_PERIODS = ("P3",) * SLOTS_PER_DAY
+
+
+def tariff_periods(day_index: int) -> tuple[str, ...]:
+    """Periodo tarifario de cada franja del día (0 = lunes)."""
+    return _WEEKEND_PERIODS if day_index >= 5 else _WEEKDAY_PERIODS
+
+
+def slot_from_time(value: str) -> int:
+    """'08:30' o '08:30:00' -> índice de franja (17)."""
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 2 + int(minutes) // 30
+
+
+def time_from_slot(slot: int) -> str:
+    return f"{slot // 2:02d}:{(slot % 2) * 30:02d}"
+
+
+def _window_tables(prices: list[float], plug_in: int) -> list[list[float]]:
+    """Para cada hora de fin, sumas acumuladas de los precios ordenados de la ventana.
+
+    `prices` cubre 96 franjas: el día anterior (desde el que se enchufa) y el propio día.
+    La tabla `tables[r][n]` es el coste por kWh·franja de cargar `n` franjas en las
+    `n` más baratas entre `plug_in` y la franja `r` del día.
+    """
+    tables = []
+    window = sorted(prices[plug_in:SLOTS_PER_DAY])
+    for ready_by in range(SLOTS_PER_DAY):
+        if ready_by:
+            # Inserción ordenada de la franja que entra en la ventana
+            bisect.insort(window, prices[SLOTS_PER_DAY + ready_by - 1])
+        prefix = [0.0]
+        for price in window:
+            prefix.append(prefix[-1] + price)
+        tables.append(prefix)
+    return tables
+
+
+def plan_week(
+    prices: dict[str, float],
+    battery_kwh: float,
+    power_kw: float,
+    needs: list[dict],
+    arrival_soc: float = 30,
+    plug_in: str = "18:00",
+    stored_value: float | None = None,
+    slack_value: float = SLACK_VALUE,
+    max_soc: int = MAX_DAILY_SOC,
+) -> dict:
+    """Calcula el mejor plan para los 7 días.
+
+    `needs[d]` contiene `min_soc` (SOC mínimo que debe tener el coche) y `departure`
+    (hora límite "HH:MM" a la que tiene que estar listo) del día `d` (0 = lunes).
+    Devuelve los `schedules` listos para `setDevicePreferences` y el coste estimado.
+    """
+    started = time.perf_counter()
+    kwh_per_slot = power_kw * SLOT_HOURS
+    plug_in_slot = slot_from_time(plug_in)
+    day_prices = [[prices[period] for period in tariff_periods(day)] for day in range(7)]
+    if stored_value is None:
+        stored_value = sum(map(sum, day_prices)) / (7 * SLOTS_PER_DAY)
+
+    # Franjas necesarias por cada paso de SOC: no depende del día
+    slots_needed = [
+        math.ceil(max(0.0, soc - arrival_soc) / 100 * battery_kwh / kwh_per_slot) if kwh_per_slot > 0 else 0
+        for soc in SOC_STEPS
+    ]
+
+    schedules, days = [], []
+    for day in range(7):
+        need = needs[day]
+        departure = slot_from_time(need["departure"])
+        min_soc = need["min_soc"]
+        tables = _window_tables(day_prices[day - 1] + day_prices[day], plug_in_slot)
+
+        min_step = next((step for step in SOC_STEPS if step >= min_soc), SOC_STEPS[-1])
+        ceiling = max(min_step, max_soc)
+
+        best = None
+        for ready_by in range(departure + 1):
+            table = tables[ready_by]
+            available = len(table) - 1
+            slack_credit = slack_value * (departure - ready_by) * SLOT_HOURS
+            for soc, slots in zip(SOC_STEPS, slots_needed):
+                if soc < min_soc or soc > ceiling or slots > available:
+                    continue
+                cost = table[slots] * kwh_per_slot
+                score = cost - stored_value * (soc - min_soc) / 100 * battery_kwh - slack_credit
+                # Empate: preferimos el SOC más bajo y la hora más temprana
+                candidate = (round(score, 6), soc, ready_by, cost)
+                if best is None or candidate < best:
+                    best = candidate
+
+        if best is None:
+            # Ninguna combinación cumple: se pide el SOC mínimo a la hora de salida
+            ready_by = departure
+            soc = min_step
+            cost, feasible = None, False
+        else:
+            _, soc, ready_by, cost = best
+            cost = round(cost, 6)
+            feasible = True
+
+        schedules.append({"dayOfWeek": DAYS[day], "time": time_from_slot(ready_by), "max": str(soc)})
+        days.append({"day": DAYS[day], "ready_by": time_from_slot(ready_by), "soc": soc, "cost": cost, "feasible": feasible})
+
+    total = sum(day["cost"] or 0 for day in days)
+    return {
+        "schedules": schedules,
+        "days": days,
+        "total_cost": round(total, 4),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
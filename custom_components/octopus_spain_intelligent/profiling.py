@@ -0,0 +1,162 @@
+"""Perfilado por muestreo, opcional, de los puntos calientes de la integración.
+
+Los puntos de enganche (`profiled` en refrescos y llamadas a la API, y el reparto de
+actualizaciones a las entidades del coordinador) solo comprueban una variable global
+mientras no hay sesión activa. Con una sesión activa, cada enganche mide su duración y un
+hilo toma cada pocos milisegundos la pila del hilo del event loop; solo cuenta las muestras
+que caen dentro de un enganche, así el tiempo queda atribuido a esta integración.
+
+Al terminar se escriben dos ficheros: estadísticas en JSON y las pilas en formato
+"folded" (`marco;marco;marco N`), que leen flamegraph.pl o speedscope.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+
+DEFAULT_INTERVAL = 0.005  # Segundos entre muestras
+MAX_DURATION = 600  # Segundos
+TOP_FUNCTIONS = 50
+
+_session: "ProfileSession | None" = None
+
+
+def active() -> "ProfileSession | None":
+    """Sesión de perfilado en curso, si la hay."""
+    return _session
+
+
+def profiled(label: str | Callable[..., str]):
+    """Engancha una corrutina al perfilador; `label` puede calcularse a partir de los argumentos."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _session is None:
+                return await func(*args, **kwargs)
+            name = label(*args, **kwargs) if callable(label) else label
+            return await _session.async_run(name, func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfileSession:
+    """Una sesión de perfilado: tiempos por enganche y muestras de la pila del event loop."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.started = 0.0
+        self.duration = 0.0
+        self.hooks: dict[str, list[float]] = {}  # {etiqueta: [llamadas, total s, máximo s]}
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self._thread_id: int | None = None
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Activa los enganches y el muestreo; debe llamarse desde el hilo del event loop."""
+        global _session
+        if _session is not None:
+            raise RuntimeError("Ya hay una sesión de perfilado en curso")
+        self._thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name="octopus_profiler", daemon=True)
+        _session = self
+        self._sampler.start()
+
+    def stop(self) -> None:
+        global _session
+        if _session is self:
+            _session = None
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self.started
+
+    async def async_run(self, label: str, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._record(label, time.perf_counter() - started)
+
+    def run(self, label: str, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._record(label, time.perf_counter() - started)
+
+    def _record(self, label: str, elapsed: float) -> None:
+        stats = self.hooks.setdefault(label, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._sample(frame)
+            del frame
+
+    def _sample(self, frame) -> None:
+        """Guarda la pila desde el enganche más externo; fuera de los enganches no cuenta."""
+        stack = []
+        outermost = -1
+        while frame is not None:
+            code = frame.f_code
+            if code in _RUN_CODES:
+                stack.append(f"[{frame.f_locals.get('label')}]")
+                outermost = len(stack)
+            elif code not in _WRAPPER_CODES:
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        if outermost < 0:
+            return
+        self.samples += 1
+        self.stacks[tuple(reversed(stack[:outermost]))] += 1
+
+    def as_dict(self) -> dict:
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        ms = lambda seconds: round(seconds * 1000, 1)  # noqa: E731
+        return {
+            "duration_s": round(self.duration, 1),
+            "interval_ms": ms(self.interval),
+            "samples": self.samples,
+            "hooks": {
+                label: {"calls": calls, "total_ms": ms(elapsed), "max_ms": ms(longest)}
+                for label, (calls, elapsed, longest) in sorted(self.hooks.items(), key=lambda item: -item[1][1])
+            },
+            # Tiempo aproximado en el event loop: muestras × intervalo
+            "functions": [
+                {"function": name, "total_ms": ms(count * self.interval), "self_ms": ms(own[name] * self.interval)}
+                for name, count in total.most_common(TOP_FUNCTIONS)
+            ],
+        }
+
+    def write(self, base_path: str) -> tuple[str, str]:
+        """Escribe `<base>.json` y `<base>.folded`; hace E/S, llamar desde el executor."""
+        stats_path, folded_path = f"{base_path}.json", f"{base_path}.folded"
+        with open(stats_path, "w", encoding="utf-8") as file:
+            json.dump(self.as_dict(), file, indent=2, ensure_ascii=False)
+        with open(folded_path, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{';'.join(stack)} {count}\n")
+        return stats_path, folded_path
+
+
+_RUN_CODES = frozenset({ProfileSession.async_run.__code__, ProfileSession.run.__code__})
+_WRAPPER_CODES = frozenset({profiled("")(lambda: None).__code__})
@@ -0,0 +1,139 @@
+"""Graba tráfico real con Kraken y lo reproduce a través del coordinador para perfilarlo.
+
+Grabar (hace login con credenciales reales; el cassette sale ya anonimizado):
+
+    python -m custom_components.octopus_spain_intelligent.replay record cassette.json \\
+        --email usuario@example.com --password ... --refreshes 3
+
+Reproducir sin red y mostrar dónde se va el tiempo y la memoria de cada refresco:
+
+    python -m custom_components.octopus_spain_intelligent.replay play cassette.json \\
+        [--refreshes 10] [--speed 0]
+
+Con `--speed 1` se respeta la latencia grabada, con `--speed 0` se responde al instante
+(solo se mide el coste propio de la integración). Home Assistant tiene que estar instalado.
+"""
+import argparse
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import tempfile
+import time
+import tracemalloc
+
+from homeassistant.core import CoreState, HomeAssistant
+
+from .cassette import RecordingTransport, ReplayTransport
+from .coordinator import OctopusIntelligentCoordinator
+from .kraken_client import GRAPH_QL_ENDPOINT, KrakenGraphQLClient
+from .octopus_spain import OctopusSpain
+from .telemetry import Telemetry
+
+REPLAY_CREDENTIALS = ("replay@example.com", "replay")
+TOP = 20
+
+
+async def _run_coordinator(api: OctopusSpain, refreshes: int, config_dir: str) -> OctopusIntelligentCoordinator:
+    hass = HomeAssistant(config_dir)
+    hass.set_state(CoreState.running)  # Para que también se pida la facturación
+    coordinator = OctopusIntelligentCoordinator(hass, *REPLAY_CREDENTIALS, api=api)
+    await coordinator.async_load_history()
+    try:
+        for _ in range(refreshes):
+            await coordinator.async_refresh()
+    finally:
+        await api.close()
+        await hass.async_stop(force=True)
+    return coordinator
+
+
+async def _record(args) -> None:
+    telemetry = Telemetry()
+    # Sin caché de consultas: entre refrescos reales pasa más tiempo que su TTL
+    transport = RecordingTransport(KrakenGraphQLClient(GRAPH_QL_ENDPOINT, telemetry=telemetry), args.cassette)
+    api = OctopusSpain(args.email, args.password, telemetry=telemetry, cache_ttl=0, transport=transport)
+    with tempfile.TemporaryDirectory() as config_dir:
+        await _run_coordinator(api, args.refreshes, config_dir)
+    print(f"📼 {len(transport.interactions)} peticiones grabadas en {args.cassette}")
+
+
+async def _play(args) -> None:
+    telemetry = Telemetry()
+    transport = ReplayTransport(args.cassette, speed=args.speed, telemetry=telemetry)
+    api = OctopusSpain(*REPLAY_CREDENTIALS, telemetry=telemetry, cache_ttl=0, transport=transport)
+
+    profiler = cProfile.Profile()
+    tracemalloc.start(25)
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as config_dir:
+        profiler.enable()
+        coordinator = await _run_coordinator(api, args.refreshes, config_dir)
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    _print_refreshes(coordinator, elapsed)
+    _print_operations(telemetry)
+    _print_profile(profiler)
+    _print_allocations(snapshot)
+
+
+def _print_refreshes(coordinator: OctopusIntelligentCoordinator, elapsed: float) -> None:
+    print(f"\n== Refrescos ({elapsed * 1000:.1f} ms en total) ==")
+    for trace in coordinator.telemetry.traces:
+        data = trace.as_dict()
+        counters = ", ".join(f"{name}={value}" for name, value in data["counters"].items() if value)
+        print(f"{data['duration_ms']:>9.1f} ms  {data['error'] or 'ok':<12} {counters}")
+
+
+def _print_operations(telemetry: Telemetry) -> None:
+    print("\n== Peticiones por operación ==")
+    totals: dict[str, list[float]] = {}
+    for span in telemetry.spans:
+        total = totals.setdefault(span["operation"], [0, 0.0, 0])
+        total[0] += 1
+        total[1] += span["duration_ms"]
+        total[2] += span["bytes"]
+    print(f"{'operación':<28} {'llamadas':>8} {'ms':>10} {'bytes':>10}")
+    for operation, (calls, duration, size) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"{operation:<28} {calls:>8} {duration:>10.1f} {size:>10}")
+
+
+def _print_profile(profiler: cProfile.Profile) -> None:
+    print(f"\n== Tiempo de CPU (top {TOP} por tiempo acumulado) ==")
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP)
+    print(output.getvalue())
+
+
+def _print_allocations(snapshot: tracemalloc.Snapshot) -> None:
+    print(f"== Memoria viva al terminar (top {TOP} por línea) ==")
+    for stat in snapshot.statistics("lineno")[:TOP]:
+        print(f"{stat.size / 1024:>9.1f} KiB {stat.count:>7}  {stat.traceback[0]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="graba el tráfico real en un cassette anonimizado")
+    record.add_argument("cassette")
+    record.add_argument("--email", required=True)
+    record.add_argument("--password", required=True)
+    record.add_argument("--refreshes", type=int, default=3)
+
+    play = commands.add_parser("play", help="reproduce un cassette a través del coordinador y lo perfila")
+    play.add_argument("cassette")
+    play.add_argument("--refreshes", type=int, default=10)
+    play.add_argument("--speed", type=float, default=0, help="factor de la latencia grabada (0 = sin esperas)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_record(args) if args.command == "record" else _play(args))
+
+
+if __name__ == "__main__":
+    main()
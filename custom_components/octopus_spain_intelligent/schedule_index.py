@@ -0,0 +1,72 @@
+"""Índice semanal de los horarios de carga para consultar el próximo "listo a las".
+
+Los 7 horarios de `preferences.schedules` se convierten una sola vez en una lista ordenada
+de minutos de la semana (0 = lunes 00:00); la próxima carga a partir de un instante es
+un `bisect` sobre esa lista, con vuelta al principio al pasar del domingo.
+"""
+import bisect
+from datetime import date, datetime, time, timedelta
+
+from .planner import DAYS
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+class NextCharge:
+    """Próxima hora de "listo a las" y su SOC objetivo."""
+
+    __slots__ = ("ready_by", "target_soc", "day")
+
+    def __init__(self, ready_by: datetime, target_soc: int, day: str):
+        self.ready_by = ready_by
+        self.target_soc = target_soc
+        self.day = day
+
+
+class WeeklyScheduleIndex:
+    """Horarios de la semana ordenados por minuto de la semana."""
+
+    __slots__ = ("_minutes", "_targets")
+
+    def __init__(self, schedules: list[dict]):
+        entries = sorted(
+            (DAYS.index(schedule["dayOfWeek"]) * MINUTES_PER_DAY + _minute_of_day(schedule["time"]), int(float(schedule["max"])))
+            for schedule in schedules
+            if schedule.get("dayOfWeek") in DAYS and schedule.get("time")
+        )
+        self._minutes = [minute for minute, _ in entries]
+        self._targets = [target for _, target in entries]
+
+    def __bool__(self) -> bool:
+        return bool(self._minutes)
+
+    def next_after(self, moment: datetime) -> NextCharge | None:
+        """Primera hora de "listo a las" estrictamente posterior a `moment` (hora local).
+
+        La fecha se construye en la zona horaria de `moment`, así los cambios de hora no
+        desplazan el resultado.
+        """
+        if not self._minutes:
+            return None
+        now = moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+        index = bisect.bisect_right(self._minutes, now)
+        wrapped = index == len(self._minutes)
+        minute = self._minutes[0 if wrapped else index]
+        target = self._targets[0 if wrapped else index]
+
+        day_index, minute_of_day = divmod(minute, MINUTES_PER_DAY)
+        days_ahead = (day_index - moment.weekday()) % 7
+        if wrapped and days_ahead == 0:
+            days_ahead = 7  # Único horario de la semana, ya pasado hoy
+        ready_by = _at(moment.date() + timedelta(days=days_ahead), minute_of_day, moment.tzinfo)
+        return NextCharge(ready_by, target, DAYS[day_index])
+
+
+def _minute_of_day(value: str) -> int:
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _at(day: date, minute_of_day: int, tzinfo) -> datetime:
+    return datetime.combine(day, time(minute_of_day // 60, minute_of_day % 60), tzinfo=tzinfo)
@@ -0,0 +1,133 @@
+import logging
+from datetime import datetime
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, SMART_CONTROL_SUSPEND, SMART_CONTROL_RESUME
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.smart_control_windows"
+
+
+class SmartControlScheduler:
+    """Programador local de ventanas de suspensión del control inteligente.
+
+    Las ventanas se guardan en `.storage` y solo hay un temporizador activo, programado
+    en el siguiente límite (inicio o fin) de cualquier ventana. Al dispararse, todos los
+    dispositivos con un límite vencido se envían juntos en una única mutación.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator):
+        self._hass = hass
+        self._coordinator = coordinator
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._windows: list[dict] = []
+        self._unsub_timer = None
+        self._last_boundary = dt_util.utcnow()
+
+    @property
+    def windows(self) -> list[dict]:
+        """Ventanas pendientes o en curso."""
+        return list(self._windows)
+
+    async def async_load(self) -> None:
+        """Carga las ventanas guardadas y reaplica las que estén en curso."""
+        stored = await self._store.async_load() or {}
+        now = self._last_boundary = dt_util.utcnow()
+        self._windows = [
+            window for window in stored.get("windows", [])
+            if dt_util.parse_datetime(window["end"]) > now
+        ]
+        # Si HA se reinició dentro de una ventana, el dispositivo debe seguir suspendido
+        active = {w["device_id"] for w in self._windows if self._is_active(w, now)}
+        if active:
+            await self._coordinator.set_smart_control({device_id: SMART_CONTROL_SUSPEND for device_id in active})
+        self._schedule_next()
+
+    async def async_add_window(self, device_id: str, start: datetime, end: datetime) -> None:
+        """Añade una ventana de suspensión para un dispositivo."""
+        start = dt_util.as_utc(start)
+        end = dt_util.as_utc(end)
+        if end <= start:
+            raise ValueError("El fin de la ventana debe ser posterior al inicio")
+
+        self._windows.append({"device_id": device_id, "start": start.isoformat(), "end": end.isoformat()})
+        self._windows.sort(key=lambda w: w["start"])
+        await self._async_save()
+        _LOGGER.info(f"🗓️ Ventana de suspensión para {device_id}: {start} → {end}")
+
+        now = dt_util.utcnow()
+        if start <= now:
+            await self._coordinator.set_smart_control({device_id: SMART_CONTROL_SUSPEND})
+        self._schedule_next()
+
+    async def async_clear(self, device_id: str | None = None) -> None:
+        """Elimina las ventanas de un dispositivo (o todas) y reanuda los que estuvieran suspendidos."""
+        now = dt_util.utcnow()
+        removed = [w for w in self._windows if device_id is None or w["device_id"] == device_id]
+        self._windows = [w for w in self._windows if w not in removed]
+        await self._async_save()
+
+        resumed = {w["device_id"] for w in removed if self._is_active(w, now)}
+        if resumed:
+            await self._coordinator.set_smart_control({d: SMART_CONTROL_RESUME for d in resumed})
+        self._schedule_next()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancela el temporizador pendiente."""
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    @staticmethod
+    def _is_active(window: dict, now: datetime) -> bool:
+        return dt_util.parse_datetime(window["start"]) <= now < dt_util.parse_datetime(window["end"])
+
+    def _next_boundary(self, now: datetime) -> datetime | None:
+        boundaries = [
+            boundary
+            for window in self._windows
+            for boundary in (dt_util.parse_datetime(window["start"]), dt_util.parse_datetime(window["end"]))
+            if boundary > now
+        ]
+        return min(boundaries, default=None)
+
+    @callback
+    def _schedule_next(self) -> None:
+        self.async_shutdown()
+        when = self._next_boundary(dt_util.utcnow())
+        if when is not None:
+            self._unsub_timer = async_track_point_in_utc_time(self._hass, self._handle_boundary, when)
+
+    async def _handle_boundary(self, now: datetime) -> None:
+        """Aplica en un solo lote todos los cambios que vencen en este instante."""
+        self._unsub_timer = None
+        last, self._last_boundary = self._last_boundary, now
+        due = {
+            w["device_id"]
+            for w in self._windows
+            if any(last < dt_util.parse_datetime(w[key]) <= now for key in ("start", "end"))
+        }
+        self._windows = [w for w in self._windows if dt_util.parse_datetime(w["end"]) > now]
+
+        # Un dispositivo sigue suspendido si otra ventana lo cubre en este momento
+        suspended = {w["device_id"] for w in self._windows if self._is_active(w, now)}
+        actions = {
+            device_id: SMART_CONTROL_SUSPEND if device_id in suspended else SMART_CONTROL_RESUME
+            for device_id in due
+        }
+        await self._async_save()
+
+        if actions:
+            _LOGGER.info(f"⏰ Límite de ventana alcanzado, aplicando {actions}")
+            await self._coordinator.set_smart_control(actions)
+        self._schedule_next()
+
+    async def _async_save(self) -> None:
+        await self._store.async_save({"windows": self._windows})
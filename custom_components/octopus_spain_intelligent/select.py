@@ -9,6 +9,7 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
 from .coordinator import OctopusIntelligentCoordinator
+from .entity import async_setup_device_entities, device_info
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,6 +23,12 @@ DAY_TRANSLATION = {
     "SUNDAY": "Domingo",
 }
 
+# Opciones compartidas por todos los selectores (inmutables, se crean una sola vez)
+TIME_OPTIONS = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30))
+SOC_OPTIONS = tuple(str(i) for i in range(20, 101, 5))
+TIME_NAMES = {day: f"Hora de carga {name}" for day, name in DAY_TRANSLATION.items()}
+SOC_NAMES = {day: f"SOC de carga {name}" for day, name in DAY_TRANSLATION.items()}
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Configurar selectores para Octopus Spain."""
@@ -30,23 +37,25 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     if not intelligentcoordinator:
         return
 
+    # Selectores de horario para cada dispositivo SmartFlex, también los que aparezcan después
+    async_setup_device_entities(
+        entry, intelligentcoordinator, async_add_entities,
+        lambda account, device: _device_selects(account, device, intelligentcoordinator),
+    )
+
+
+def _device_selects(account: str, device: dict, coordinator: OctopusIntelligentCoordinator) -> list[SelectEntity]:
+    """Selectores de hora y SOC de los 7 días para un dispositivo con horarios de carga."""
+    if not device.get("preferences"):
+        return []
+    device_id = device["id"]
+    device_name = device.get("name") or "Vehículo Eléctrico"
+    _LOGGER.info(f"✅ Creando selectores para device_id={device_id}, device_name={device_name}")
     selects = []
-    accounts = intelligentcoordinator.data.keys()
-    for account in accounts:
-        devices = intelligentcoordinator.data[account].get("devices", [])
-        _LOGGER.info(f"📱 Dispositivos para cuenta {account}: {devices}")
-        if devices:
-            device = devices[0]
-            device_id = device.get("id")  # ID del dispositivo de la API
-            device_name = device.get("name") or "Vehículo Eléctrico"
-            _LOGGER.info(f"✅ Usando device_id={device_id}, device_name={device_name}")
-            for day in DAY_TRANSLATION:
-                selects.append(OctopusChargeTimeSelector(account, intelligentcoordinator, day, device_id, device_name))
-                selects.append(OctopusChargeSocSelector(account, intelligentcoordinator, day, device_id, device_name))
-
-    if selects:
-        async_add_entities(selects)
-        _LOGGER.info(f"✅ Se han añadido {len(selects)} selectores")
+    for day in DAY_TRANSLATION:
+        selects.append(OctopusChargeTimeSelector(account, coordinator, day, device_id, device_name))
+        selects.append(OctopusChargeSocSelector(account, coordinator, day, device_id, device_name))
+    return selects
 
 
 class BaseOctopusChargeSelector(CoordinatorEntity, SelectEntity):
@@ -59,20 +68,18 @@ class BaseOctopusChargeSelector(CoordinatorEntity, SelectEntity):
         self._device_id = device_id
         self._device_name = device_name
         # Vincular al dispositivo
-        self._attr_device_info = {"identifiers": {(DOMAIN, device_id)}} if device_id else None
+        self._attr_device_info = device_info(device_id) if device_id else None
 
     def _get_current_schedules(self) -> list[dict[str, Any]]:
         """Obtiene la lista completa de horarios del dispositivo."""
-        devices = self.coordinator.data.get(self._account, {}).get("devices", [])
-        if devices:
-            return devices[0].get("preferences", {}).get("schedules", [])
-        return []
+        device = self.coordinator.device(self._device_id) or {}
+        return (device.get("preferences") or {}).get("schedules", [])
 
     async def _update_charge_preferences(self, time: str | None = None, max_soc: int | None = None) -> None:
         """Construye y envía la configuración de horarios completa a la API."""
-        devices = self.coordinator.data.get(self._account, {}).get("devices", [])
-        if not (devices and (device_id := devices[0].get("id"))):
-            _LOGGER.error("No se encontró un ID de dispositivo válido.")
+        device_id = self._device_id
+        if self.coordinator.device(device_id) is None:
+            _LOGGER.error(f"No se encontró el dispositivo {device_id}.")
             return
 
         current_schedules = self._get_current_schedules()
@@ -90,20 +97,19 @@ class BaseOctopusChargeSelector(CoordinatorEntity, SelectEntity):
 
             new_schedules.append({"dayOfWeek": day_key, "time": day_time, "max": str(int(float(day_soc_val)))})
 
-        await self.coordinator._api.set_device_preferences(
-            device_id=device_id, mode="CHARGE", unit="PERCENTAGE", schedules=new_schedules
-        )
-        await self.coordinator.async_request_refresh()
+        # Si Kraken no responde, el horario queda en el outbox y se reenvía más tarde
+        await self.coordinator.apply_charge_schedule(device_id, new_schedules)
 
 
 class OctopusChargeTimeSelector(BaseOctopusChargeSelector):
     """Selector para la hora de carga diaria."""
 
+    _attr_options = TIME_OPTIONS
+
     def __init__(self, account: str, coordinator: OctopusIntelligentCoordinator, day: str, device_id: str = "", device_name: str = ""):
         super().__init__(account, coordinator, day, device_id, device_name)
-        self._attr_name = f"Hora de carga {DAY_TRANSLATION.get(self._day, self._day)}"
-        self._attr_unique_id = f"octopus_charge_time_{account}_{day.lower()}"
-        self._attr_options = sorted([f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30)])
+        self._attr_name = TIME_NAMES.get(self._day, f"Hora de carga {self._day}")
+        self._attr_unique_id = f"octopus_charge_time_{device_id}_{day.lower()}"
 
     @property
     def current_option(self) -> str | None:
@@ -120,11 +126,12 @@ class OctopusChargeTimeSelector(BaseOctopusChargeSelector):
 class OctopusChargeSocSelector(BaseOctopusChargeSelector):
     """Selector para el SOC máximo diario."""
 
+    _attr_options = SOC_OPTIONS
+
     def __init__(self, account: str, coordinator: OctopusIntelligentCoordinator, day: str, device_id: str = "", device_name: str = ""):
         super().__init__(account, coordinator, day, device_id, device_name)
-        self._attr_name = f"SOC de carga {DAY_TRANSLATION.get(self._day, self._day)}"
-        self._attr_unique_id = f"octopus_charge_soc_{account}_{day.lower()}"
-        self._attr_options = [str(i) for i in range(20, 101, 5)]
+        self._attr_name = SOC_NAMES.get(self._day, f"SOC de carga {self._day}")
+        self._attr_unique_id = f"octopus_charge_soc_{device_id}_{day.lower()}"
 
     @property
     def current_option(self) -> str | None:
@@ -1,23 +1,26 @@
 import logging
-from datetime import timedelta
+import math
+from abc import abstractmethod
+from datetime import datetime, timedelta
 from typing import Mapping, Any
 
 from homeassistant.helpers.typing import StateType
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, CoordinatorEntity
-from .const import (
-    CONF_PASSWORD,
-    CONF_EMAIL, UPDATE_INTERVAL, DOMAIN
-)
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from .const import DOMAIN
 
 from homeassistant.components.sensor import (
-    SensorEntityDescription, SensorEntity, SensorStateClass
+    SensorDeviceClass, SensorEntityDescription, SensorEntity, SensorStateClass
 )
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfPower, UnitOfTime
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from .octopus_spain import OctopusSpain
-from .coordinator import OctopusIntelligentCoordinator
-from .coordinator import OctopusHourlyCoordinator
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.util import dt as dt_util
+from .entity import account_device_info, async_setup_device_entities, device_info
+from .alerts import latest_alert
+from .maximeter import POWER_PERIODS, ROLLING_DAYS
+from .schedule_index import NextCharge, WeeklyScheduleIndex
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,42 +40,34 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     """Configurar sensores para Octopus Spain."""
     _LOGGER.info("🛠️ Configurando sensores de Octopus Spain")
 
-    email = entry.data[CONF_EMAIL]
-    password = entry.data[CONF_PASSWORD]
-
     sensors = []
 
-    # ✅ Usa el coordinador ya creado en `__init__.py`
+    # ✅ Usa los coordinadores ya creados en `__init__.py`
     intelligentcoordinator = hass.data[DOMAIN]["intelligent_coordinator"]
     # No llamar a async_config_entry_first_refresh() otra vez, ya está inicializado
-    
-    hourly_coordinator = OctopusHourlyCoordinator(hass, email, password)
-    await hourly_coordinator.async_config_entry_first_refresh()
+    # La facturación se carga tras el arranque de HA; sus sensores se rellenan cuando llega
+    hourly_coordinator = hass.data[DOMAIN]["hourly_coordinator"]
 
-
-    _LOGGER.info(f"📊 Datos obtenidos en el coordinador: {intelligentcoordinator.data}")
-    _LOGGER.info(f"📊 Datos obtenidos en el coordinador (hora en hora): {hourly_coordinator.data}")
+    _LOGGER.debug(f"📊 Datos obtenidos en el coordinador: {intelligentcoordinator.data}")
 
 
     accounts = intelligentcoordinator.data.keys()
     for account in accounts:  
         _LOGGER.info(f"📡 Creando sensor para la cuenta {account}")
         
-        # Obtener device_id si existe para agrupar sensores bajo el dispositivo
-        devices = intelligentcoordinator.data[account].get("devices", [])
-        device_id = devices[0].get("id") if devices else None
-        
         # sensors.append(OctopusKrakenflexDevice(account, intelligentcoordinator, len(accounts) == 1))  # Obsoleto, datos no disponibles
         # sensors.append(OctopusVehicleChargingPreferencesSensor(account, intelligentcoordinator, len(accounts) == 1))  # TODO: Esperar datos de API
-        sensors.append(OctopusWallet(account, 'solar_wallet', 'Solar Wallet', hourly_coordinator, len(accounts) == 1, device_id))
-        sensors.append(OctopusWallet(account, 'octopus_credit', 'Octopus Credit', hourly_coordinator, len(accounts) == 1, device_id))
-        sensors.append(OctopusInvoice(account, hourly_coordinator, len(accounts) == 1, device_id))
-        
-        _LOGGER.info(f"📱 Dispositivos encontrados para crear sensores: {len(devices)}")
-        for device in devices:
-            device_name = device.get('name', 'Sin nombre')
-            _LOGGER.info(f"🔧 Creando sensor para el dispositivo {device_name} (ID: {device.get('id')})")
-            sensors.append(OctopusDevice(account, device, intelligentcoordinator))
+        sensors.append(OctopusWallet(account, 'solar_wallet', 'Solar Wallet', hourly_coordinator, len(accounts) == 1))
+        sensors.append(OctopusWallet(account, 'octopus_credit', 'Octopus Credit', hourly_coordinator, len(accounts) == 1))
+        sensors.append(OctopusInvoice(account, hourly_coordinator, len(accounts) == 1))
+        for key, name in (('solar_wallet', 'Solar Wallet'), ('octopus_credit', 'Octopus Credit')):
+            sensors.append(OctopusBalanceAccrualSensor(account, key, name, hourly_coordinator, len(accounts) == 1))
+            sensors.append(OctopusBalanceProjectionSensor(account, key, name, hourly_coordinator, len(accounts) == 1))
+        for period in POWER_PERIODS:
+            sensors.append(OctopusMaximeterSensor(account, period, hourly_coordinator, len(accounts) == 1))
+            sensors.append(OctopusRecommendedPowerSensor(account, period, hourly_coordinator, len(accounts) == 1))
+
+    sensors.append(OctopusOutboxSensor(intelligentcoordinator))
 
     if sensors:
         async_add_entities(sensors)
@@ -80,7 +75,53 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     else:
         _LOGGER.warning("⚠️ No se ha añadido ningún sensor")
 
+    # Sensores por dispositivo, también para los que aparezcan más adelante
+    async_setup_device_entities(
+        entry, intelligentcoordinator, async_add_entities,
+        lambda account, device: _device_sensors(account, device, intelligentcoordinator),
+    )
+
+
+def _device_sensors(account: str, device: dict, coordinator) -> list[SensorEntity]:
+    """Sensores de un dispositivo."""
+    _LOGGER.info(f"🔧 Creando sensores para el dispositivo {device.get('name', 'Sin nombre')} (ID: {device['id']})")
+    device_id = device["id"]
+    sensors = [OctopusDevice(account, device, coordinator)]
+    if device.get("deviceType") == "ELECTRIC_VEHICLES":
+        sensors += [
+            OctopusSocLimitSensor(account, device_id, coordinator),
+            OctopusChargePointPowerSensor(account, device_id, coordinator),
+            OctopusWindowDurationSensor(account, device_id, coordinator, "boosting", "Tiempo en carga manual (24 h)"),
+            OctopusWindowDurationSensor(account, device_id, coordinator, "smart_control", "Tiempo en control inteligente (24 h)"),
+            OctopusBoostCountSensor(account, device_id, coordinator),
+            OctopusLastBoostSensor(account, device_id, coordinator),
+            OctopusChargeSessionsSensor(account, device_id, coordinator),
+        ]
+    if (device.get("preferences") or {}).get("schedules") is not None:
+        sensors += [
+            OctopusNextReadySensor(account, device_id, coordinator),
+            OctopusNextTargetSocSensor(account, device_id, coordinator),
+            OctopusHoursUntilReadySensor(account, device_id, coordinator),
+        ]
+    return sensors
+
+
+class WriteIfChangedMixin:
+    """Para entidades de coordinador: escribe el estado solo cuando cambia lo que publican."""
+
+    _last_written: tuple | None = None
 
+    @callback
+    def _async_write_if_changed(self, snapshot: Any) -> None:
+        """Escribe el estado solo si ha cambiado y lo contabiliza en la telemetría del coordinador."""
+        telemetry = self.coordinator.telemetry
+        snapshot = (self.available, snapshot)
+        if snapshot == self._last_written:
+            telemetry.incr("writes_suppressed")
+            return
+        self._last_written = snapshot
+        telemetry.incr("writes")
+        self.async_write_ha_state()
 
 
 class OctopusKrakenflexDevice(CoordinatorEntity, SensorEntity):
@@ -132,23 +173,40 @@ class OctopusKrakenflexDevice(CoordinatorEntity, SensorEntity):
         """Devuelve atributos adicionales del dispositivo Krakenflex."""
         return self._attrs
 
-class OctopusDevice(CoordinatorEntity, SensorEntity):
+def vehicle_attributes(device: dict) -> dict[str, Any]:
+    """Atributos estables de un vehículo SmartFlex.
+
+    Los valores que cambian a menudo (límite de SOC, potencia, suspensión, horarios) tienen
+    su propia entidad, así cada cambio no vuelve a grabar este bloque en el recorder.
+    """
+    status = device.get("status") or {}
+    return {
+        "Status": traducir_state(status.get("current")),
+        "Current State": traducir_current_state(status.get("currentState")),
+        "Charge Point Model": (device.get("chargePointVariant") or {}).get("model"),
+        "Make": device.get("make"),
+        "Model": device.get("model"),
+        "Mode": traducir_modo((device.get("preferences") or {}).get("mode")),
+        "BatterySize": (device.get("vehicleVariant") or {}).get("batterySize"),
+    }
+
+
+class OctopusDevice(WriteIfChangedMixin, CoordinatorEntity, SensorEntity):
     """Sensor para un dispositivo estándar de Octopus."""
 
+    _attr_icon = "mdi:power-plug"
+
     def __init__(self, account: str, device: dict, coordinator):
         super().__init__(coordinator=coordinator)
         self._account = account
-        self._device = device
+        # Solo el ID: el dispositivo se lee del snapshot compartido del coordinador
+        self._device_id = device["id"]
         self._state = None
         self._attrs: Mapping[str, Any] = {}
         # Usar nombre del dispositivo si existe, si no usar "Vehículo Eléctrico"
         device_display_name = device.get('name') or "Vehículo Eléctrico"
         self._attr_name = device_display_name
         self._attr_unique_id = f"octopus_device_{device['id']}"
-        self.entity_description = SensorEntityDescription(
-            key=f"device_{device['id']}",
-            icon="mdi:power-plug",
-        )
         # Crear dispositivo para que otros sensores/selectores se agrupren bajo él
         self._attr_device_info = {
             "identifiers": {(DOMAIN, device['id'])},
@@ -163,52 +221,24 @@ class OctopusDevice(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Actualiza el estado con los datos del dispositivo."""
-        device_id = self._device["id"]
-        devices_data = self.coordinator.data[self._account].get("devices", [])
-        device = next((d for d in devices_data if d["id"] == device_id), None)
+        device = self.coordinator.device(self._device_id)
 
         if device:
+            alerts = device.get("alerts") or []
             self._state = device.get("status", {}).get("currentState")  # Estado actual del dispositivo
             self._attrs = {
                 "deviceType": traducir_devicetype(device.get("deviceType")),
-                "alerts": device.get("alerts", []),
+                # Solo el recuento y la última: cada alerta nueva llega como evento `..._device_alert`
+                "alert_count": len(alerts),
+                "latest_alert": latest_alert(alerts),
+                "stale": self.coordinator.data[self._account].get("stale", False),
             }
 
             # Si es un SmartFlexVehicle, añade más datos
             if device.get("deviceType") == "ELECTRIC_VEHICLES":
-                self._attrs.update({
-                    # "make": device.get("make"),
-                    # "model": device.get("model"),
-                    # "integrationDeviceId": device.get("integrationDeviceId"),
-                    # "chargePointPowerInKw": device.get("chargePointVariant", {}).get("powerInKw"),
-                    # "mode": device.get("preferences", {}).get("mode"),
-                    "Status": traducir_state(device.get("status", {}).get("current")),
-                    "Current State": traducir_current_state(device.get("status", {}).get("currentState")),
-                    "Is Suspended": device.get("status", {}).get("isSuspended"),
-                    "State of Charge Limit": f"{device.get("status", {}).get("stateOfChargeLimit", {}).get("upperSocLimit")}%",
-                    "Timestamp": device.get("status", {}).get("stateOfChargeLimit", {}).get("timestamp"),
-                    "isLimitViolated": "⚠️ Sí" if device.get("status", {}).get("stateOfChargeLimit", {}).get("isLimitViolated") else "✅ No",
-                    "Charge Point Model": device.get("chargePointVariant", {}).get("model"),
-                    "Charge Point Power (kW)": device.get("chargePointVariant", {}).get("powerInKw"),
-                    "Make": device.get("make"),
-                    "Model": device.get("model"),
-                    "Mode": traducir_modo(device.get("preferences", {}).get("mode")),
-                    "BatterySize": device.get("vehicleVariant", {}).get("batterySize"),
-                })
-
-                # Si hay horarios de carga, los agregamos
-                schedules = device.get("preferences", {}).get("schedules", [])
-                if schedules:
-                    translated_schedules = []
-                    for s in schedules:
-                        day_english = s['dayOfWeek']
-                        day_spanish = DAY_TRANSLATION.get(day_english, day_english)  # Si no encuentra la traducción, usa el original
-                        print(f"🔍 Traduciendo {day_english} -> {day_spanish}")  # Depuración
-                        translated_schedules.append(f"{day_spanish}: {s['max']}% a las {s['time']}")
-    
-                    self._attrs["Charge Schedules"] = translated_schedules
+                self._attrs.update(vehicle_attributes(device))
 
-        self.async_write_ha_state()
+        self._async_write_if_changed((self._state, self._attrs))
 
     @property
     def native_value(self) -> str | None:
@@ -222,7 +252,282 @@ class OctopusDevice(CoordinatorEntity, SensorEntity):
 
 
 
+class OctopusDeviceSensor(CoordinatorEntity, SensorEntity):
+    """Base para los sensores ligeros que leen un único valor de un dispositivo."""
+
+    def __init__(self, account: str, device_id: str, coordinator, key: str, name: str):
+        super().__init__(coordinator=coordinator)
+        self._account = account
+        self._device_id = device_id
+        self._attr_name = name
+        self._attr_unique_id = f"octopus_{key}_{device_id}"
+        self._attr_device_info = device_info(device_id)
+
+    def _get_device(self) -> dict | None:
+        return self.coordinator.device(self._device_id)
+
+    def _get_status(self) -> dict:
+        return (self._get_device() or {}).get("status") or {}
+
+
+class OctopusSocLimitSensor(OctopusDeviceSensor):
+    """Límite superior de SOC que aplica Octopus al vehículo."""
+
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_device_class = SensorDeviceClass.BATTERY
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:battery-charging-high"
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "soc_limit", "Límite de SOC")
+
+    @property
+    def native_value(self) -> StateType:
+        return (self._get_status().get("stateOfChargeLimit") or {}).get("upperSocLimit")
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        # Sin la marca de tiempo de la lectura: cambia en cada sondeo y forzaría una escritura
+        limit = self._get_status().get("stateOfChargeLimit") or {}
+        return {"isLimitViolated": limit.get("isLimitViolated")}
+
+
+class OctopusChargePointPowerSensor(OctopusDeviceSensor):
+    """Potencia nominal del punto de carga."""
+
+    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:ev-station"
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "charge_point_power", "Potencia del cargador")
+
+    @property
+    def native_value(self) -> StateType:
+        power = ((self._get_device() or {}).get("chargePointVariant") or {}).get("powerInKw")
+        return float(power) if power is not None else None
+
+
+class OctopusWindowDurationSensor(OctopusDeviceSensor):
+    """Horas en un estado durante las últimas 24 h, leídas del historial de transiciones."""
+
+    _attr_native_unit_of_measurement = UnitOfTime.HOURS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(self, account: str, device_id: str, coordinator, metric: str, name: str):
+        super().__init__(account, device_id, coordinator, f"{metric}_24h", name)
+        self._metric = metric
+
+    @property
+    def native_value(self) -> StateType:
+        history = self.coordinator.history(self._device_id)
+        if history is None:
+            return None
+        return round(history.windows[self._metric].duration(dt_util.utcnow().timestamp()) / 3600, 3)
+
+
+class OctopusBoostCountSensor(OctopusDeviceSensor):
+    """Número de cargas manuales durante las últimas 24 h."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:counter"
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "boost_count_24h", "Cargas manuales (24 h)")
+
+    @property
+    def native_value(self) -> StateType:
+        history = self.coordinator.history(self._device_id)
+        return history.windows["boosting"].count(dt_util.utcnow().timestamp()) if history else None
+
+
+class OctopusLastBoostSensor(OctopusDeviceSensor):
+    """Inicio de la última carga manual que sigue en el historial."""
+
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_icon = "mdi:rocket-launch"
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "last_boost", "Última carga manual")
+
+    @property
+    def native_value(self):
+        history = self.coordinator.history(self._device_id)
+        timestamp = history.log.last("currentState", "BOOSTING") if history else None
+        return dt_util.utc_from_timestamp(timestamp) if timestamp is not None else None
+
+
+class OctopusChargeSessionsSensor(OctopusDeviceSensor):
+    """Sesiones de carga completadas en los últimos 7 días y sus agregados."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "sesiones"
+    _attr_icon = "mdi:ev-plug-type2"
+    # Crece en cada lectura mientras se carga: no se graba
+    _unrecorded_attributes = frozenset({"current_session_kwh"})
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "charge_sessions_week", "Sesiones de carga (7 días)")
+
+    def _stats(self) -> dict | None:
+        stats = self.coordinator.sessions.stats(self._device_id)
+        return stats.as_dict(dt_util.utcnow().timestamp()) if stats else None
+
+    @property
+    def native_value(self) -> StateType:
+        stats = self._stats()
+        return stats["sessions_per_week"] if stats else 0
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        attributes = self._stats() or {}
+        current = self.coordinator.sessions.current(self._device_id)
+        attributes["current_session_kwh"] = round(current.energy_kwh, 3) if current else None
+        return attributes
+
+
+class OctopusScheduleSensor(WriteIfChangedMixin, OctopusDeviceSensor):
+    """Base de los sensores derivados del horario semanal, sin llamadas a la API.
+
+    El índice semanal se rehace solo cuando cambian los horarios del dispositivo, y el
+    valor se recalcula en el siguiente límite temporal que lo hace cambiar (programado con
+    `async_track_point_in_time`), no en cada minuto.
+    """
+
+    def __init__(self, account: str, device_id: str, coordinator, key: str, name: str):
+        super().__init__(account, device_id, coordinator, key, name)
+        self._schedules: list | None = None
+        self._index = WeeklyScheduleIndex([])
+        self._value: StateType | datetime = None
+        self._unsub_boundary = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._handle_coordinator_update()
+
+    async def async_will_remove_from_hass(self) -> None:
+        self._cancel_boundary()
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        schedules = ((self._get_device() or {}).get("preferences") or {}).get("schedules") or []
+        if schedules is not self._schedules:
+            self._schedules = schedules
+            self._index = WeeklyScheduleIndex(schedules)
+            self._async_update_value()
+        else:
+            self._async_write_if_changed(self._value)
+
+    @callback
+    def _async_update_value(self, _now: datetime | None = None) -> None:
+        self._cancel_boundary()
+        now = dt_util.now()
+        next_charge = self._index.next_after(now)
+        self._value = self._compute(next_charge, now) if next_charge else None
+        if next_charge:
+            self._unsub_boundary = async_track_point_in_time(
+                self.hass, self._async_update_value, self._next_boundary(next_charge, now)
+            )
+        self._async_write_if_changed(self._value)
+
+    def _cancel_boundary(self) -> None:
+        if self._unsub_boundary:
+            self._unsub_boundary()
+            self._unsub_boundary = None
+
+    @abstractmethod
+    def _compute(self, next_charge: NextCharge, now: datetime):
+        """Valor del sensor para la próxima carga programada."""
+
+    def _next_boundary(self, next_charge: NextCharge, now: datetime) -> datetime:
+        """Instante en el que el valor deja de ser válido; por defecto, la propia hora de "listo"."""
+        return next_charge.ready_by
+
+    @property
+    def native_value(self):
+        return self._value
+
+
+class OctopusNextReadySensor(OctopusScheduleSensor):
+    """Próxima hora de "listo a las" según el horario semanal."""
+
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_icon = "mdi:clock-end"
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "next_ready_by", "Próxima carga lista a las")
+
+    def _compute(self, next_charge: NextCharge, now: datetime):
+        return next_charge.ready_by
+
+
+class OctopusNextTargetSocSensor(OctopusScheduleSensor):
+    """SOC objetivo de la próxima carga programada."""
+
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_device_class = SensorDeviceClass.BATTERY
+    _attr_icon = "mdi:battery-arrow-up"
+
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "next_target_soc", "SOC objetivo próxima carga")
+
+    def _compute(self, next_charge: NextCharge, now: datetime):
+        return next_charge.target_soc
+
+
+class OctopusHoursUntilReadySensor(OctopusScheduleSensor):
+    """Horas (redondeadas hacia arriba) que faltan para la próxima hora de "listo a las"."""
+
+    _attr_native_unit_of_measurement = UnitOfTime.HOURS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_icon = "mdi:timer-sand"
 
+    def __init__(self, account: str, device_id: str, coordinator):
+        super().__init__(account, device_id, coordinator, "hours_until_ready", "Horas hasta carga lista")
+
+    def _compute(self, next_charge: NextCharge, now: datetime):
+        return math.ceil((next_charge.ready_by - now).total_seconds() / 3600)
+
+    def _next_boundary(self, next_charge: NextCharge, now: datetime) -> datetime:
+        # El valor baja una unidad cada vez que se cruza una hora entera antes de la de "listo"
+        return next_charge.ready_by - timedelta(hours=self._compute(next_charge, now) - 1)
+
+
+class OctopusOutboxSensor(SensorEntity):
+    """Mutaciones pendientes de reenviar a Kraken (diagnóstico)."""
+
+    _attr_name = "Cambios pendientes de enviar"
+    _attr_unique_id = "octopus_mutation_outbox"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:email-fast-outline"
+    _attr_should_poll = False
+    # El detalle de la cola cambia en cada reintento; el recorder solo guarda el número
+    _unrecorded_attributes = frozenset({"pending"})
+
+    def __init__(self, coordinator):
+        self._outbox = coordinator.outbox
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self._outbox.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def native_value(self) -> StateType:
+        return len(self._outbox.pending)
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return {
+            "pending": [
+                {key: entry[key] for key in ("kind", "target", "created", "attempts", "next_attempt", "last_error")}
+                for entry in self._outbox.pending
+            ]
+        }
 
 
 CURRENT_STATE_TRANSLATIONS = {
@@ -293,7 +598,21 @@ from homeassistant.const import (
     CURRENCY_EURO,
 )
 
-class OctopusWallet(CoordinatorEntity, SensorEntity):
+# Descripciones compartidas por todas las cuentas
+WALLET_DESCRIPTION = SensorEntityDescription(
+    key="wallet",
+    icon="mdi:piggy-bank-outline",
+    native_unit_of_measurement=CURRENCY_EURO,
+    state_class=SensorStateClass.MEASUREMENT,
+)
+INVOICE_DESCRIPTION = SensorEntityDescription(
+    key="last_invoice",
+    icon="mdi:currency-eur",
+    native_unit_of_measurement=CURRENCY_EURO,
+    state_class=SensorStateClass.MEASUREMENT,
+)
+
+class OctopusWallet(WriteIfChangedMixin, CoordinatorEntity, SensorEntity):
 
     def __init__(self, account: str, key: str, name: str, coordinator, single: bool, device_id: str = None):
         super().__init__(coordinator=coordinator)
@@ -303,17 +622,9 @@ class OctopusWallet(CoordinatorEntity, SensorEntity):
         self._attrs: Mapping[str, Any] = {}
         self._attr_name = f"{name}" if single else f"{name} ({account})"
         self._attr_unique_id = f"{key}_{account}"
-        self.entity_description = SensorEntityDescription(
-            key=f"{key}_{account}",
-            icon="mdi:piggy-bank-outline",
-            native_unit_of_measurement=CURRENCY_EURO,
-            state_class=SensorStateClass.MEASUREMENT
-        )
+        self.entity_description = WALLET_DESCRIPTION
         # Agrupar bajo el dispositivo de la cuenta con nombre visible
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"account_{account}")},
-            "name": f"Cuenta {account}",
-        }
+        self._attr_device_info = account_device_info(account)
 
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
@@ -323,18 +634,88 @@ class OctopusWallet(CoordinatorEntity, SensorEntity):
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
         # Asegúrate de que la clave exista antes de acceder
+        if self.coordinator.data is None:
+            return  # Facturación aún no cargada
         if self._account in self.coordinator.data and self._key in self.coordinator.data[self._account]:
             self._state = self.coordinator.data[self._account][self._key]
-            self.async_write_ha_state()
+            self._attrs = {"stale": self.coordinator.data[self._account].get("stale", False)}
+            self._async_write_if_changed((self._state, self._attrs))
         else:
             _LOGGER.error(f"❌ ERROR: No data found for account {self._account} with key {self._key}")
 
     @property
     def native_value(self) -> StateType:
         return self._state
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return self._attrs
     
 
-class OctopusInvoice(CoordinatorEntity, SensorEntity):
+class OctopusBalanceSensor(WriteIfChangedMixin, CoordinatorEntity, SensorEntity):
+    """Base de los sensores derivados del historial de un saldo; solo se recalculan al llegar datos."""
+
+    def __init__(self, account: str, key: str, coordinator, name: str, unique_id: str):
+        super().__init__(coordinator=coordinator)
+        self._account = account
+        self._key = key
+        self._state = None
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+        self._attr_device_info = account_device_info(account)
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        history = self.coordinator.balance_history(self._account, self._key)
+        value = self._compute(history, dt_util.now()) if history else None
+        self._state = None if value is None else round(value, 2)
+        self._async_write_if_changed(self._state)
+
+    @abstractmethod
+    def _compute(self, history, now: datetime) -> float | None:
+        """Valor derivado del historial de saldos."""
+
+    @property
+    def native_value(self) -> StateType:
+        return self._state
+
+
+class OctopusBalanceAccrualSensor(OctopusBalanceSensor):
+    """Variación media diaria del saldo en los últimos 30 días."""
+
+    _attr_native_unit_of_measurement = f"{CURRENCY_EURO}/d"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:chart-line"
+
+    def __init__(self, account: str, key: str, name: str, coordinator, single: bool):
+        name = f"{name} ritmo diario"
+        super().__init__(account, key, coordinator, name if single else f"{name} ({account})", f"{key}_accrual_{account}")
+
+    def _compute(self, history, now: datetime) -> float | None:
+        return history.accrual_per_day(now.timestamp())
+
+
+class OctopusBalanceProjectionSensor(OctopusBalanceSensor):
+    """Saldo previsto a final de mes con el ritmo de acumulación actual."""
+
+    _attr_native_unit_of_measurement = CURRENCY_EURO
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_icon = "mdi:piggy-bank"
+
+    def __init__(self, account: str, key: str, name: str, coordinator, single: bool):
+        name = f"{name} previsto a fin de mes"
+        super().__init__(account, key, coordinator, name if single else f"{name} ({account})", f"{key}_projected_{account}")
+
+    def _compute(self, history, now: datetime) -> float | None:
+        month_end = (now.replace(day=28) + timedelta(days=4)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return history.projected(now.timestamp(), month_end.timestamp())
+
+
+class OctopusInvoice(WriteIfChangedMixin, CoordinatorEntity, SensorEntity):
 
     def __init__(self, account: str, coordinator, single: bool, device_id: str = None):
         super().__init__(coordinator=coordinator)
@@ -343,17 +724,9 @@ class OctopusInvoice(CoordinatorEntity, SensorEntity):
         self._attrs: Mapping[str, Any] = {}
         self._attr_name = "Última Factura Octopus" if single else f"Última Factura Octopus ({account})"
         self._attr_unique_id = f"last_invoice_{account}"
-        self.entity_description = SensorEntityDescription(
-            key=f"last_invoice_{account}",
-            icon="mdi:currency-eur",
-            native_unit_of_measurement=CURRENCY_EURO,
-            state_class=SensorStateClass.MEASUREMENT
-        )
+        self.entity_description = INVOICE_DESCRIPTION
         # Agrupar bajo el dispositivo de la cuenta con nombre visible
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"account_{account}")},
-            "name": f"Cuenta {account}",
-        }
+        self._attr_device_info = account_device_info(account)
 
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
@@ -362,14 +735,58 @@ class OctopusInvoice(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
+        if self._account not in (self.coordinator.data or {}):
+            return  # Facturación aún no cargada
         data = self.coordinator.data[self._account]['last_invoice']
         self._state = data['amount']
         self._attrs = {
             'Inicio': data['start'],
             'Fin': data['end'],
-            'Emitida': data['issued']
+            'Emitida': data['issued'],
+            'stale': self.coordinator.data[self._account].get('stale', False),
         }
-        self.async_write_ha_state()
+        self._async_write_if_changed((self._state, self._attrs))
+
+    @property
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return self._attrs
+
+
+class OctopusDemandSensor(WriteIfChangedMixin, CoordinatorEntity, SensorEntity):
+    """Base de los sensores del maxímetro de un periodo de potencia; leen el análisis del snapshot."""
+
+    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
+    _attr_device_class = SensorDeviceClass.POWER
+
+    def __init__(self, account: str, period: str, coordinator, name: str, unique_id: str):
+        super().__init__(coordinator=coordinator)
+        self._account = account
+        self._period = period
+        self._state = None
+        self._attrs: Mapping[str, Any] = {}
+        self._attr_name = name
+        self._attr_unique_id = unique_id
+        self._attr_device_info = account_device_info(account)
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        demand = ((self.coordinator.data or {}).get(self._account) or {}).get("demand")
+        if demand is None:
+            return  # Lecturas aún no cargadas
+        self._state, self._attrs = self._compute(demand["periods"][self._period])
+        self._async_write_if_changed((self._state, self._attrs))
+
+    @abstractmethod
+    def _compute(self, period: dict) -> tuple[StateType, dict]:
+        """Estado y atributos a partir del análisis de un periodo de potencia."""
 
     @property
     def native_value(self) -> StateType:
@@ -380,6 +797,43 @@ class OctopusInvoice(CoordinatorEntity, SensorEntity):
         return self._attrs
 
 
+class OctopusMaximeterSensor(OctopusDemandSensor):
+    """Máxima demanda cuartohoraria del periodo en los últimos 30 días."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:gauge"
+    # Los máximos mensuales ya se leen del propio sensor; no hace falta grabarlos cada día
+    _unrecorded_attributes = frozenset({"monthly_max_kw"})
+
+    def __init__(self, account: str, period: str, coordinator, single: bool):
+        name = f"Maxímetro {period} ({ROLLING_DAYS} días)"
+        super().__init__(account, period, coordinator, name if single else f"{name} ({account})", f"maximeter_{period.lower()}_{account}")
+
+    def _compute(self, period: dict) -> tuple[StateType, dict]:
+        return period["rolling_max_kw"], {
+            "yearly_max_kw": period["yearly_max_kw"],
+            "exceedances": period["exceedances"],
+            "monthly_max_kw": period["monthly_max_kw"],
+        }
+
+
+class OctopusRecommendedPowerSensor(OctopusDemandSensor):
+    """Potencia a contratar en el periodo según el último año de demanda."""
+
+    _attr_icon = "mdi:transmission-tower"
+
+    def __init__(self, account: str, period: str, coordinator, single: bool):
+        name = f"Potencia recomendada {period}"
+        super().__init__(account, period, coordinator, name if single else f"{name} ({account})", f"recommended_power_{period.lower()}_{account}")
+
+    def _compute(self, period: dict) -> tuple[StateType, dict]:
+        return period["recommended_kw"], {
+            "contracted_kw": period["contracted_kw"],
+            "yearly_max_kw": period["yearly_max_kw"],
+            "exceedances_year": period["exceedances_year"],
+        }
+
+
 class OctopusVehicleChargingPreferencesSensor(CoordinatorEntity, SensorEntity):
     def __init__(self, account: str, coordinator, single: bool):
         super().__init__(coordinator=coordinator)
@@ -0,0 +1,161 @@
+"""Detección incremental de sesiones de carga a partir de las transiciones de estado.
+
+Una sesión se abre cuando el vehículo entra en un estado de carga y se cierra cuando sale.
+La energía se estima integrando la potencia del punto de carga entre lecturas, y los
+agregados semanales se actualizan en O(1) (amortizado) con cada sesión completada.
+"""
+from collections import deque
+
+CHARGING_STATES = frozenset({"SMART_CONTROL_IN_PROGRESS", "BOOSTING"})
+BOOST_STATE = "BOOSTING"
+STATS_WINDOW = 7 * 24 * 3600  # Segundos
+MAX_READING_GAP = 15 * 60  # Segundos; huecos mayores no se integran (HA parado, API caída)
+
+
+class ChargeSession:
+    """Sesión de carga en curso o completada."""
+
+    __slots__ = ("device_id", "start", "end", "energy_kwh", "boost_seconds", "soc_limit", "_last_ts", "_last_power", "_last_boosting")
+
+    def __init__(self, device_id: str, start: float, power_kw: float, boosting: bool, soc_limit: int | None):
+        self.device_id = device_id
+        self.start = start
+        self.end: float | None = None
+        self.energy_kwh = 0.0
+        self.boost_seconds = 0.0
+        self.soc_limit = soc_limit
+        self._last_ts = start
+        self._last_power = power_kw
+        self._last_boosting = boosting
+
+    @property
+    def duration(self) -> float:
+        return (self.end or self._last_ts) - self.start
+
+    @property
+    def boosted(self) -> bool:
+        return self.boost_seconds > 0
+
+    def advance(self, timestamp: float, power_kw: float, boosting: bool) -> None:
+        """Integra el intervalo desde la lectura anterior con la potencia y el estado de esa lectura."""
+        elapsed = timestamp - self._last_ts
+        if 0 < elapsed <= MAX_READING_GAP:
+            self.energy_kwh += self._last_power * elapsed / 3600
+            if self._last_boosting:
+                self.boost_seconds += elapsed
+        self._last_ts = timestamp
+        self._last_power = power_kw
+        self._last_boosting = boosting
+
+    def as_dict(self) -> dict:
+        return {
+            "device_id": self.device_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_s": round(self.duration),
+            "energy_kwh": round(self.energy_kwh, 3),
+            "boosted": self.boosted,
+            "boost_s": round(self.boost_seconds),
+            "soc_limit": self.soc_limit,
+        }
+
+
+class SessionStats:
+    """Agregados de las sesiones completadas en la última semana."""
+
+    __slots__ = ("window", "_sessions", "_energy", "_boosted", "total_sessions", "total_energy_kwh")
+
+    def __init__(self, window: float = STATS_WINDOW):
+        self.window = window
+        self._sessions: deque[tuple[float, float, bool]] = deque()
+        self._energy = 0.0
+        self._boosted = 0
+        self.total_sessions = 0
+        self.total_energy_kwh = 0.0  # Acumulado histórico, base de las estadísticas a largo plazo
+
+    def add(self, end: float, energy_kwh: float, boosted: bool) -> None:
+        self._sessions.append((end, energy_kwh, boosted))
+        self._energy += energy_kwh
+        self._boosted += boosted
+        self.total_sessions += 1
+        self.total_energy_kwh += energy_kwh
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._sessions and self._sessions[0][0] < cutoff:
+            _, energy, boosted = self._sessions.popleft()
+            self._energy -= energy
+            self._boosted -= boosted
+
+    def as_dict(self, now: float) -> dict:
+        self._evict(now)
+        count = len(self._sessions)
+        return {
+            "sessions_per_week": count,
+            "average_kwh": round(self._energy / count, 2) if count else None,
+            "boost_share": round(self._boosted / count, 2) if count else None,
+            "energy_kwh_week": round(self._energy, 2),
+            "total_sessions": self.total_sessions,
+            "total_energy_kwh": round(self.total_energy_kwh, 3),
+        }
+
+    def to_store(self) -> dict:
+        return {
+            "recent": [list(session) for session in self._sessions],
+            "total_sessions": self.total_sessions,
+            "total_energy_kwh": self.total_energy_kwh,
+        }
+
+    @classmethod
+    def from_store(cls, data: dict) -> "SessionStats":
+        stats = cls()
+        for end, energy, boosted in data.get("recent", []):
+            stats._sessions.append((end, energy, boosted))
+            stats._energy += energy
+            stats._boosted += boosted
+        stats.total_sessions = data.get("total_sessions", len(stats._sessions))
+        stats.total_energy_kwh = data.get("total_energy_kwh", stats._energy)
+        return stats
+
+
+class ChargeSessionDetector:
+    """Abre y cierra sesiones por dispositivo a partir de cada lectura de estado."""
+
+    def __init__(self):
+        self._open: dict[str, ChargeSession] = {}
+        self._stats: dict[str, SessionStats] = {}
+
+    def stats(self, device_id: str) -> SessionStats | None:
+        return self._stats.get(device_id)
+
+    def current(self, device_id: str) -> ChargeSession | None:
+        return self._open.get(device_id)
+
+    def observe(self, device_id: str, timestamp: float, state: str | None, power_kw: float, soc_limit: int | None = None) -> ChargeSession | None:
+        """Procesa una lectura; devuelve la sesión si esta lectura la ha cerrado."""
+        session = self._open.get(device_id)
+        if session is not None:
+            session.advance(timestamp, power_kw, state == BOOST_STATE)
+            if soc_limit is not None:
+                session.soc_limit = soc_limit
+        if state in CHARGING_STATES:
+            if session is None:
+                self._open[device_id] = ChargeSession(device_id, timestamp, power_kw, state == BOOST_STATE, soc_limit)
+            return None
+        if session is None:
+            return None
+
+        del self._open[device_id]
+        session.end = timestamp
+        stats = self._stats.get(device_id)
+        if stats is None:
+            stats = self._stats[device_id] = SessionStats()
+        stats.add(timestamp, session.energy_kwh, session.boosted)
+        return session
+
+    def to_store(self) -> dict:
+        return {device_id: stats.to_store() for device_id, stats in self._stats.items()}
+
+    def load(self, data: dict) -> None:
+        self._stats = {device_id: SessionStats.from_store(stats) for device_id, stats in data.items()}
+
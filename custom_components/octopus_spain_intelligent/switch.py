@@ -0,0 +1,58 @@
+import logging
+from typing import Any
+
+from homeassistant.components.switch import SwitchEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN, SMART_CONTROL_SUSPEND, SMART_CONTROL_RESUME
+from .coordinator import OctopusIntelligentCoordinator
+from .entity import async_setup_device_entities, device_info
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Configura los interruptores de control inteligente."""
+    _LOGGER.info("🛠️ Configurando interruptores de Octopus Spain")
+    intelligentcoordinator = hass.data[DOMAIN].get("intelligent_coordinator")
+    if not intelligentcoordinator:
+        return
+
+    async_setup_device_entities(
+        entry, intelligentcoordinator, async_add_entities,
+        lambda account, device: [OctopusSmartControlSwitch(account, intelligentcoordinator, device["id"])],
+    )
+
+
+class OctopusSmartControlSwitch(CoordinatorEntity, SwitchEntity):
+    """Interruptor para suspender o reanudar el control inteligente de un dispositivo."""
+
+    _attr_name = "Control Inteligente"
+    _attr_icon = "mdi:car-electric"
+
+    def __init__(self, account: str, coordinator: OctopusIntelligentCoordinator, device_id: str):
+        super().__init__(coordinator)
+        self._account = account
+        self._device_id = device_id
+        self._attr_unique_id = f"octopus_smart_control_{device_id}"
+        self._attr_device_info = device_info(device_id)
+
+    def _get_status(self) -> dict[str, Any]:
+        return (self.coordinator.device(self._device_id) or {}).get("status") or {}
+
+    @property
+    def is_on(self) -> bool | None:
+        """Encendido mientras el control inteligente no esté suspendido."""
+        suspended = self._get_status().get("isSuspended")
+        return None if suspended is None else not suspended
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Reanuda el control inteligente."""
+        await self.coordinator.set_smart_control({self._device_id: SMART_CONTROL_RESUME})
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Suspende el control inteligente."""
+        await self.coordinator.set_smart_control({self._device_id: SMART_CONTROL_SUSPEND})
@@ -0,0 +1,134 @@
+"""Trazas de refresco y contadores en memoria para el diagnóstico.
+
+Todo se guarda en buffers circulares de tamaño fijo; generar el diagnóstico solo
+copia lo que ya hay en memoria.
+"""
+import time
+from collections import deque
+from contextvars import ContextVar
+
+MAX_TRACES = 20
+MAX_SPANS = 100
+
+COUNTERS = (
+    "requests",
+    "retries",
+    "errors",
+    "bytes",
+    "cache_hits",
+    "cache_misses",
+    "collapsed",
+    "payloads_changed",
+    "payloads_unchanged",
+    "deferred",
+    "writes",
+    "writes_suppressed",
+    "timeouts",
+)
+
+_current_trace: ContextVar["RefreshTrace | None"] = ContextVar("octopus_current_trace", default=None)
+
+
+class RefreshTrace:
+    """Traza de un refresco del coordinador: una lista de spans y sus contadores."""
+
+    __slots__ = ("name", "started", "duration", "update_interval", "spans", "counters", "error", "_token")
+
+    def __init__(self, name: str, update_interval: float | None):
+        self.name = name
+        self.started = time.time()
+        self.duration: float | None = None
+        self.update_interval = update_interval
+        self.spans: list[dict] = []
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.error: str | None = None
+        self._token = None
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started": self.started,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 1),
+            "update_interval_s": self.update_interval,
+            "error": self.error,
+            "counters": dict(self.counters),
+            "spans": list(self.spans),
+        }
+
+
+class Telemetry:
+    """Buffers circulares con las últimas trazas, los últimos spans y contadores acumulados."""
+
+    def __init__(self, max_traces: int = MAX_TRACES, max_spans: int = MAX_SPANS):
+        self.traces: deque[RefreshTrace] = deque(maxlen=max_traces)
+        self.spans: deque[dict] = deque(maxlen=max_spans)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # {operación: [respuestas procesadas, respuestas idénticas omitidas]}
+        self.datasets: dict[str, list[int]] = {}
+        # {operación: consultas canceladas por la fecha límite del refresco}
+        self.timeouts: dict[str, int] = {}
+
+    def start_refresh(self, name: str, update_interval: float | None = None) -> RefreshTrace:
+        """Abre una traza; los spans del contexto actual se asociarán a ella."""
+        trace = RefreshTrace(name, update_interval)
+        trace._token = _current_trace.set(trace)
+        return trace
+
+    def finish_refresh(self, trace: RefreshTrace, error: BaseException | None = None) -> None:
+        trace.duration = time.time() - trace.started
+        trace.error = None if error is None else f"{type(error).__name__}: {error}"
+        self.traces.append(trace)
+        if trace._token is not None:
+            _current_trace.reset(trace._token)
+            trace._token = None
+
+    def incr(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] += amount
+        if (trace := _current_trace.get()) is not None:
+            trace.counters[counter] += amount
+
+    def record_span(self, operation: str, duration: float, size: int, retries: int, error: str | None = None) -> None:
+        """Registra una llamada a la API."""
+        span = {
+            "operation": operation,
+            "duration_ms": round(duration * 1000, 1),
+            "bytes": size,
+            "retries": retries,
+            "error": error,
+        }
+        self.spans.append(span)
+        self.incr("requests")
+        self.incr("bytes", size)
+        if retries:
+            self.incr("retries", retries)
+        if error:
+            self.incr("errors")
+        if (trace := _current_trace.get()) is not None:
+            trace.spans.append(span)
+
+    def record_dataset(self, operation: str, unchanged: bool) -> None:
+        """Cuenta una respuesta de `operation`, indicando si era idéntica a la anterior."""
+        counts = self.datasets.setdefault(operation, [0, 0])
+        counts[1 if unchanged else 0] += 1
+        self.incr("payloads_unchanged" if unchanged else "payloads_changed")
+
+    def record_timeout(self, operation: str) -> None:
+        """Cuenta una consulta cancelada por la fecha límite del refresco."""
+        self.timeouts[operation] = self.timeouts.get(operation, 0) + 1
+        self.incr("timeouts")
+
+    def skip_ratios(self) -> dict[str, float]:
+        """Proporción de respuestas cuyo procesado se ha omitido, por operación."""
+        return {
+            operation: round(skipped / (processed + skipped), 3)
+            for operation, (processed, skipped) in self.datasets.items()
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "skip_ratios": self.skip_ratios(),
+            "timeouts": dict(self.timeouts),
+            "traces": [trace.as_dict() for trace in self.traces],
+            "recent_spans": list(self.spans),
+        }
@@ -0,0 +1,165 @@
+"""Historial compacto en memoria de las transiciones de estado de cada dispositivo.
+
+Cada dispositivo tiene un buffer circular de capacidad fija respaldado por `array`
+(marca de tiempo, campo y código del valor), así que la memoria por dispositivo no crece.
+Las duraciones y recuentos en ventanas deslizantes se mantienen de forma incremental al
+registrar cada transición, sin recorrer el historial.
+"""
+from array import array
+from collections import deque
+
+TRACKED_FIELDS = ("currentState", "current", "isSuspended")
+HISTORY_CAPACITY = 512  # Transiciones por dispositivo
+ROLLING_WINDOW = 24 * 3600  # Segundos
+
+# (campo, valor) cuyos intervalos se acumulan en la ventana deslizante
+WINDOW_METRICS = {
+    "boosting": ("currentState", "BOOSTING"),
+    "smart_control": ("currentState", "SMART_CONTROL_IN_PROGRESS"),
+    "suspended": ("isSuspended", True),
+}
+
+
+class TransitionLog:
+    """Buffer circular de transiciones `(timestamp, campo, valor)` sobre arrays."""
+
+    __slots__ = ("capacity", "_ts", "_field", "_code", "_next", "_size", "_values", "_codes")
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._field = array("B", bytes(capacity))
+        self._code = array("H", bytes(2 * capacity))
+        self._next = 0
+        self._size = 0
+        # Vocabulario de valores: los estados se guardan como códigos de 2 bytes
+        self._values: list = []
+        self._codes: dict = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _encode(self, value) -> int:
+        key = (type(value).__name__, value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def append(self, timestamp: float, field: str, value) -> None:
+        index = self._next
+        self._ts[index] = timestamp
+        self._field[index] = TRACKED_FIELDS.index(field)
+        self._code[index] = self._encode(value)
+        self._next = (index + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def __reversed__(self):
+        """Transiciones de la más reciente a la más antigua."""
+        for offset in range(1, self._size + 1):
+            index = (self._next - offset) % self.capacity
+            yield self._ts[index], TRACKED_FIELDS[self._field[index]], self._values[self._code[index]]
+
+    def last(self, field: str, value) -> float | None:
+        """Momento de la última transición de `field` a `value`, si sigue en el buffer."""
+        for timestamp, entry_field, entry_value in reversed(self):
+            if entry_field == field and entry_value == value:
+                return timestamp
+        return None
+
+    def as_dict(self) -> dict:
+        entries = list(reversed(self))
+        entries.reverse()
+        return {"entries": [[ts, field, value] for ts, field, value in entries]}
+
+
+class RollingWindow:
+    """Duración total y número de intervalos de un estado dentro de una ventana deslizante.
+
+    Solo guarda los intervalos cerrados que aún caen en la ventana y su suma; al consultar
+    se descartan los que han salido por la izquierda y se recorta el primero.
+    """
+
+    __slots__ = ("window", "_closed", "_closed_total", "_open_since")
+
+    def __init__(self, window: float = ROLLING_WINDOW):
+        self.window = window
+        self._closed: deque[tuple[float, float]] = deque()
+        self._closed_total = 0.0
+        self._open_since: float | None = None
+
+    def start(self, timestamp: float) -> None:
+        if self._open_since is None:
+            self._open_since = timestamp
+
+    def stop(self, timestamp: float) -> None:
+        if self._open_since is not None:
+            self._closed.append((self._open_since, timestamp))
+            self._closed_total += timestamp - self._open_since
+            self._open_since = None
+
+    def _evict(self, cutoff: float) -> None:
+        while self._closed and self._closed[0][1] <= cutoff:
+            start, end = self._closed.popleft()
+            self._closed_total -= end - start
+
+    def duration(self, now: float) -> float:
+        """Segundos en el estado dentro de la ventana que termina en `now`."""
+        cutoff = now - self.window
+        self._evict(cutoff)
+        total = self._closed_total
+        if self._closed and self._closed[0][0] < cutoff:
+            total -= cutoff - self._closed[0][0]
+        if self._open_since is not None:
+            total += now - max(self._open_since, cutoff)
+        return max(total, 0.0)
+
+    def count(self, now: float) -> int:
+        """Número de intervalos en el estado que se solapan con la ventana que termina en `now`."""
+        self._evict(now - self.window)
+        return len(self._closed) + (self._open_since is not None)
+
+
+class DeviceHistory:
+    """Transiciones y métricas de ventana deslizante de un dispositivo."""
+
+    __slots__ = ("log", "windows", "last_values")
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.log = TransitionLog(capacity)
+        self.windows = {name: RollingWindow() for name in WINDOW_METRICS}
+        self.last_values: dict = {}
+
+    def observe(self, timestamp: float, status: dict) -> bool:
+        """Registra los campos que han cambiado; devuelve si hubo alguna transición."""
+        changed = False
+        for field in TRACKED_FIELDS:
+            value = status.get(field)
+            if field in self.last_values and self.last_values[field] == value:
+                continue
+            self._apply(timestamp, field, value)
+            changed = True
+        return changed
+
+    def _apply(self, timestamp: float, field: str, value) -> None:
+        self.last_values[field] = value
+        self.log.append(timestamp, field, value)
+        for name, (metric_field, metric_value) in WINDOW_METRICS.items():
+            if metric_field == field:
+                if value == metric_value:
+                    self.windows[name].start(timestamp)
+                else:
+                    self.windows[name].stop(timestamp)
+
+    def as_dict(self) -> dict:
+        return self.log.as_dict()
+
+    @classmethod
+    def from_dict(cls, data: dict, capacity: int = HISTORY_CAPACITY) -> "DeviceHistory":
+        """Reconstruye el buffer y, recorriéndolo una vez, las ventanas y últimos valores."""
+        history = cls(capacity)
+        for timestamp, field, value in data.get("entries", [])[-capacity:]:
+            if field in TRACKED_FIELDS:
+                history._apply(timestamp, field, value)
+        return history
@@ -0,0 +1,17 @@
+"""Utilidades de los tests que necesitan una instancia de Home Assistant."""
+import contextlib
+import tempfile
+
+from homeassistant.core import CoreState, HomeAssistant
+
+
+@contextlib.asynccontextmanager
+async def async_test_hass(state: CoreState = CoreState.running):
+    """Home Assistant sin configuración, en un directorio temporal."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.set_state(state)
+        try:
+            yield hass
+        finally:
+            await hass.async_stop(force=True)
@@ -0,0 +1,39 @@
+"""Tests de cuándo se vuelve a pedir la facturación."""
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent.balance_history import _next_period_end, billing_due  # noqa: E402
+
+BILLING = {"solar_wallet": 12.5, "last_invoice": {"end": date(2025, 1, 31)}}
+
+
+@pytest.mark.parametrize(("end", "expected"), [
+    (date(2025, 1, 31), date(2025, 2, 28)),
+    (date(2024, 1, 31), date(2024, 2, 29)),
+    (date(2024, 11, 30), date(2024, 12, 31)),
+    (date(2024, 12, 14), date(2025, 1, 14)),
+])
+def test_next_period_end(end, expected):
+    assert _next_period_end(end) == expected
+
+
+def test_billing_is_due_without_data_or_on_a_new_day():
+    now = datetime(2025, 2, 10, 9, 0)
+
+    assert billing_due(None, now, now)
+    assert billing_due(BILLING, None, now)
+    assert billing_due(BILLING, datetime(2025, 2, 9, 23, 59), now)
+    assert not billing_due(BILLING, datetime(2025, 2, 10, 0, 1), now)
+    assert not billing_due({"solar_wallet": 12.5}, datetime(2025, 2, 10, 0, 1), now)
+
+
+def test_billing_is_rechecked_hourly_once_the_next_period_has_ended():
+    # El periodo siguiente a la última factura termina el 28 de febrero
+    assert not billing_due(BILLING, datetime(2025, 2, 28, 8, 0), datetime(2025, 2, 28, 20, 0))
+
+    now = datetime(2025, 3, 1, 10, 0)
+    assert not billing_due(BILLING, datetime(2025, 3, 1, 9, 30), now)
+    assert billing_due(BILLING, datetime(2025, 3, 1, 9, 0), now)
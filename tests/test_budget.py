@@ -0,0 +1,68 @@
+"""Tests del presupuesto de complejidad de la API Kraken."""
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent import budget as budget_module  # noqa: E402
+from custom_components.octopus_spain_intelligent.budget import (  # noqa: E402
+    BUCKET_SECONDS,
+    PRIORITY_LOW,
+    QUERY_COSTS,
+    ComplexityBudget,
+    cost_from_extensions,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100_000.0]
+    monkeypatch.setattr(budget_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_costs_leave_the_window_after_it_ends(clock):
+    budget = ComplexityBudget(window=3600)
+    budget.record("devices")
+    clock[0] += 1800
+    budget.record("deviceStatus", 7)
+    assert budget.used == QUERY_COSTS["devices"] + 7
+
+    # La cubeta sale entera cuando ha pasado la ventana desde su último segundo
+    clock[0] += 1800 + BUCKET_SECONDS
+    assert budget.used == 7
+    clock[0] += 1800
+    assert budget.used == 0
+
+
+def test_calls_in_the_same_minute_share_one_entry(clock):
+    budget = ComplexityBudget()
+    for _ in range(1000):
+        budget.record("deviceStatus", 1)
+        clock[0] += 0.01
+
+    assert budget.used == 1000
+    assert len(budget._events) <= 2
+
+
+def test_reported_cost_replaces_the_static_estimate(clock):
+    budget = ComplexityBudget()
+    budget.record("devices", cost_from_extensions({"extensions": {"cost": {"actualQueryCost": 12}}}))
+    # Una respuesta sin parsear (idéntica a la anterior) cuenta con el último coste observado
+    budget.record("devices")
+
+    assert budget.estimated_cost("devices") == 12
+    assert budget.used == 24
+
+
+def test_low_priority_is_deferred_when_the_budget_narrows(clock):
+    budget = ComplexityBudget(limit=100, low_priority_share=0.6)
+    budget.record("devices", 25)
+    assert budget.allows("accountBillingInfo", PRIORITY_LOW)
+
+    budget.record("devices", 10)
+    assert not budget.allows("accountBillingInfo", PRIORITY_LOW)
+    assert budget.allows("devices")
+    assert budget.deferred == {"accountBillingInfo": 1}
+
+    clock[0] += budget.window + BUCKET_SECONDS
+    assert budget.allows("accountBillingInfo", PRIORITY_LOW)
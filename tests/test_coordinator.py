@@ -0,0 +1,86 @@
+"""Tests del coordinador inteligente (necesitan Home Assistant instalado)."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.core import CoreState  # noqa: E402
+
+from custom_components.octopus_spain_intelligent import coordinator as coordinator_module  # noqa: E402
+from custom_components.octopus_spain_intelligent.coordinator import OctopusIntelligentCoordinator  # noqa: E402
+from custom_components.octopus_spain_intelligent.kraken_client import KrakenTransportError  # noqa: E402
+from custom_components.octopus_spain_intelligent.telemetry import Telemetry  # noqa: E402
+
+from common import async_test_hass  # noqa: E402
+
+ACCOUNT = "A-00000001"
+
+
+def _device(state: str) -> dict:
+    return {
+        "id": "device-1",
+        "name": "Tesla Model 3",
+        "status": {"current": "LIVE", "currentState": state, "isSuspended": False},
+        "chargePointVariant": {"powerInKw": "7.000"},
+        "alerts": [],
+    }
+
+
+class FakeApi:
+    """Devuelve siempre la misma lista de dispositivos, como el cliente con respuestas idénticas."""
+
+    def __init__(self, devices: list[dict], billing_error: Exception | None = None):
+        self.telemetry = Telemetry()
+        self._devices = devices
+        self._billing_error = billing_error
+
+    async def devices(self, account: str) -> list[dict]:
+        return self._devices
+
+    async def account(self, account: str) -> dict:
+        if self._billing_error is not None:
+            raise self._billing_error
+        return {"solar_wallet": 12.5, "octopus_credit": 3.2}
+
+
+def test_identical_payloads_still_feed_the_session_detector(monkeypatch):
+    now = [datetime(2025, 3, 1, 1, 0, tzinfo=timezone.utc)]
+    monkeypatch.setattr(coordinator_module.dt_util, "utcnow", lambda: now[0])
+
+    async def run():
+        # Durante el arranque no se pide la facturación: solo los dispositivos
+        async with async_test_hass(CoreState.starting) as hass:
+            coordinator = OctopusIntelligentCoordinator(hass, "test@example.com", "-", api=FakeApi([_device("BOOSTING")]))
+            coordinator._deadline = asyncio.get_running_loop().time() + 60
+
+            first = await coordinator._async_fetch_account(ACCOUNT)
+            now[0] += timedelta(minutes=10)
+            second = await coordinator._async_fetch_account(ACCOUNT)
+
+            assert second is first
+            session = coordinator.sessions.current("device-1")
+            assert session is not None
+            assert session.energy_kwh == pytest.approx(7.0 * 10 / 60)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("error", [
+    Exception("Electricity ledger not found"),
+    KeyError("accountBillingInfo"),
+    KrakenTransportError("HTTP 503"),
+])
+def test_billing_failure_still_publishes_devices(error):
+    async def run():
+        async with async_test_hass() as hass:
+            coordinator = OctopusIntelligentCoordinator(hass, "test@example.com", "-", api=FakeApi([_device("SMART_CONTROL_CAPABLE")], error))
+            coordinator._deadline = asyncio.get_running_loop().time() + 60
+
+            data = await coordinator._async_fetch_account(ACCOUNT)
+
+            assert [device["id"] for device in data["devices"]] == ["device-1"]
+            assert "solar_wallet" not in data
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+"""Tests del maxímetro a partir de la demanda cuartohoraria."""
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent.maximeter import DemandHistory  # noqa: E402
+
+MONDAY = date(2025, 3, 3)
+
+
+def _quarter(day: date, hour: int, minute: int, kw: float) -> tuple[datetime, float, float]:
+    return datetime(day.year, day.month, day.day, hour, minute), 0.25, kw / 4
+
+
+def test_load_readings_spreads_long_readings_and_crosses_midnight():
+    history = DemandHistory()
+    # Una lectura horaria de 3 kWh a las 23:30 son 3 kW durante dos cuartos de hora de cada día
+    days = history.load_readings([(datetime(2025, 3, 3, 23, 30), 1.0, 3.0)])
+
+    assert days == {MONDAY, date(2025, 3, 4)}
+    assert history.last_day == date(2025, 3, 4)
+    assert history.window_max("P1", date(2025, 3, 4), 2) == 3.0
+    assert history.window_max("P2", date(2025, 3, 4), 2) == 3.0
+
+
+def test_reloading_a_day_replaces_it():
+    history = DemandHistory()
+    history.load_readings([_quarter(MONDAY, 12, 0, 6.0)])
+    history.load_readings([_quarter(MONDAY, 13, 0, 2.0), _quarter(MONDAY, 13, 0, 2.5)])
+
+    # El cuarto de hora repetido se queda con el mayor; la lectura de las 12 h ya no está
+    assert history.window_max("P1", MONDAY, 1) == 2.5
+    assert history.exceedances("P1", 2.0, MONDAY, 1) == 1
+
+
+def test_readings_without_duration_are_ignored():
+    history = DemandHistory()
+
+    assert history.load_readings([(datetime(2025, 3, 3, 10, 0), 0, 1.0)]) == set()
+    assert not history
+
+
+def test_exceedances_count_only_quarters_of_the_period():
+    saturday = date(2025, 3, 8)
+    history = DemandHistory()
+    history.load_readings([
+        _quarter(MONDAY, 7, 45, 5.0),  # P2: antes de las 8 h
+        _quarter(MONDAY, 8, 0, 5.0),
+        _quarter(MONDAY, 20, 15, 4.0),
+        _quarter(MONDAY, 21, 0, 3.0),
+        _quarter(saturday, 20, 0, 6.0),  # Fin de semana: todo es P2
+    ])
+
+    assert history.exceedances("P1", 3.45, saturday, 7) == 2
+    assert history.exceedances("P2", 3.45, saturday, 7) == 2
+    assert history.exceedances("P1", 5.0, saturday, 7) == 0
+    # Fuera de los días pedidos no cuenta
+    assert history.exceedances("P2", 3.45, saturday, 1) == 1
+
+
+def test_monthly_max_per_period():
+    history = DemandHistory()
+    history.load_readings([
+        _quarter(date(2025, 2, 27), 10, 0, 4.2),
+        _quarter(date(2025, 2, 28), 10, 0, 3.1),
+        _quarter(MONDAY, 2, 0, 2.4),
+        _quarter(MONDAY, 19, 0, 5.5),
+    ])
+
+    assert history.monthly_max("P1") == {"2025-02": 4.2, "2025-03": 5.5}
+    assert history.monthly_max("P2") == {"2025-03": 2.4}
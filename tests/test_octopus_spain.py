@@ -0,0 +1,197 @@
+"""Tests de la capa de consultas del cliente: llamadas compartidas, caché de lectura y huellas."""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent import octopus_spain as octopus_spain_module  # noqa: E402
+from custom_components.octopus_spain_intelligent.kraken_client import KrakenTransportError  # noqa: E402
+from custom_components.octopus_spain_intelligent.octopus_spain import OctopusSpain  # noqa: E402
+from custom_components.octopus_spain_intelligent.telemetry import Telemetry  # noqa: E402
+
+ACCOUNT = "A-00000001"
+DEVICE_QUERY = "query devices($accountNumber: String!) { devices(accountNumber: $accountNumber) { id } }"
+BOOST_MUTATION = "mutation triggerBoostCharge($input: AccountNumberInput!) { triggerBoostCharge(input: $input) { id } }"
+
+
+class FakeTransport:
+    """Transporte que cuenta las llamadas y, si se le pide, las retiene hasta `release`."""
+
+    def __init__(self, body: dict | None = None):
+        self.body = body if body is not None else {"data": {"devices": [{"id": "device-1"}]}}
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+        self.error: Exception | None = None
+
+    async def execute_raw(self, query: str, variables: dict | None = None, headers: dict | None = None) -> bytes:
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return json.dumps(self.body).encode()
+
+    async def close(self):
+        pass
+
+
+def _api(transport: FakeTransport, **kwargs) -> OctopusSpain:
+    return OctopusSpain("test@example.com", "-", telemetry=Telemetry(), transport=transport, **kwargs)
+
+
+def test_concurrent_identical_queries_share_one_call():
+    async def run():
+        transport = FakeTransport()
+        transport.release.clear()
+        api = _api(transport)
+
+        calls = [asyncio.ensure_future(api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})) for _ in range(3)]
+        await asyncio.sleep(0)
+        transport.release.set()
+        first, second, third = await asyncio.gather(*calls)
+
+        assert transport.calls == 1
+        assert first is second is third
+        assert api.telemetry.counters["collapsed"] == 2
+        assert not api._inflight
+
+    asyncio.run(run())
+
+
+def test_different_variables_are_not_shared():
+    async def run():
+        transport = FakeTransport()
+        transport.release.clear()
+        api = _api(transport, cache_ttl=0)
+
+        calls = [
+            asyncio.ensure_future(api._execute(DEVICE_QUERY, {"accountNumber": account}))
+            for account in (ACCOUNT, "A-00000002")
+        ]
+        await asyncio.sleep(0)
+        transport.release.set()
+        await asyncio.gather(*calls)
+
+        assert transport.calls == 2
+
+    asyncio.run(run())
+
+
+def test_waiters_receive_the_failure_of_the_shared_call():
+    async def run():
+        transport = FakeTransport()
+        transport.release.clear()
+        transport.error = KrakenTransportError("HTTP 503")
+        api = _api(transport)
+
+        calls = [asyncio.ensure_future(api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})) for _ in range(2)]
+        await asyncio.sleep(0)
+        transport.release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        assert transport.calls == 1
+        assert all(isinstance(result, KrakenTransportError) for result in results)
+        # Un fallo no se guarda en la caché: la siguiente consulta vuelve a la API
+        transport.error = None
+        await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        assert transport.calls == 2
+
+    asyncio.run(run())
+
+
+def test_queries_are_cached_until_the_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(octopus_spain_module.time, "monotonic", lambda: now[0])
+
+    async def run():
+        transport = FakeTransport()
+        api = _api(transport, cache_ttl=5)
+
+        first = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        now[0] += 4.9
+        assert await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT}) is first
+        assert transport.calls == 1
+        assert api.telemetry.counters["cache_hits"] == 1
+
+        now[0] += 0.1
+        await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        assert transport.calls == 2
+
+        # Los sondeos que buscan un cambio no leen de la caché
+        await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT}, use_cache=False)
+        assert transport.calls == 3
+
+    asyncio.run(run())
+
+
+def test_mutations_clear_the_cache_and_errors_are_not_cached():
+    async def run():
+        transport = FakeTransport()
+        api = _api(transport)
+
+        await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        await api._execute(BOOST_MUTATION, {"input": {"accountNumber": ACCOUNT}})
+        assert not api._cache
+        await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        assert transport.calls == 3
+
+        transport.body = {"errors": [{"message": "Device not found"}]}
+        await api._execute(DEVICE_QUERY, {"accountNumber": "A-00000002"})
+        await api._execute(DEVICE_QUERY, {"accountNumber": "A-00000002"})
+        assert transport.calls == 5
+
+    asyncio.run(run())
+
+
+def test_identical_bodies_return_the_same_parsed_object():
+    async def run():
+        transport = FakeTransport()
+        api = _api(transport, cache_ttl=0)
+
+        first = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        # Con otro token la huella es la misma: se comparte el objeto ya parseado
+        second = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT}, headers={"authorization": "otro"})
+        assert second is first
+        assert api.telemetry.datasets["devices"] == [1, 1]
+
+        transport.body = {"data": {"devices": [{"id": "device-2"}]}}
+        third = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        assert third is not first
+        assert third["data"]["devices"] == [{"id": "device-2"}]
+        assert transport.calls == 3
+
+    asyncio.run(run())
+
+
+def test_derived_results_are_rebuilt_only_for_new_payloads():
+    async def run():
+        transport = FakeTransport()
+        api = _api(transport, cache_ttl=0)
+        builds = []
+
+        def build(response):
+            builds.append(response)
+            return [device["id"] for device in response["data"]["devices"]]
+
+        for _ in range(2):
+            response = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+            assert api._derive("devices", response, build) == ["device-1"]
+        assert len(builds) == 1
+
+    asyncio.run(run())
+
+
+def test_error_responses_are_not_fingerprinted():
+    async def run():
+        transport = FakeTransport({"errors": [{"message": "Device not found"}]})
+        api = _api(transport, cache_ttl=0)
+
+        first = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+        second = await api._execute(DEVICE_QUERY, {"accountNumber": ACCOUNT})
+
+        assert second is not first
+        assert not api._payloads
+
+    asyncio.run(run())
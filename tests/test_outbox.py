@@ -0,0 +1,115 @@
+"""Tests de la cola de mutaciones contra un transporte HTTP simulado (necesitan Home Assistant)."""
+import asyncio
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+pytest.importorskip("aiohttp")
+
+from custom_components.octopus_spain_intelligent.kraken_client import KrakenGraphQLClient, KrakenTransportError  # noqa: E402
+from custom_components.octopus_spain_intelligent.octopus_spain import OctopusSpain  # noqa: E402
+from custom_components.octopus_spain_intelligent.outbox import MUTATION_BOOST, MutationOutbox  # noqa: E402
+
+from common import async_test_hass  # noqa: E402
+
+ACCOUNT = "A-00000001"
+DEVICE_QUERY = "query devices($accountNumber: String!) { devices(accountNumber: $accountNumber) { id } }"
+
+
+def _token() -> str:
+    payload = json.dumps({"exp": time.time() + 3600}).encode()
+    return f"e30.{base64.urlsafe_b64encode(payload).decode().rstrip('=')}.firma"
+
+
+class FakeResponse:
+    def __init__(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.status = status
+        self.content_type = content_type
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self) -> bytes:
+        return self._body
+
+
+class FakeSession:
+    """Sesión aiohttp que responde siempre lo mismo y cuenta las peticiones."""
+
+    closed = False
+
+    def __init__(self, response: FakeResponse):
+        self.response = response
+        self.requests = 0
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.requests += 1
+        return self.response
+
+
+UNAVAILABLE = FakeResponse(503, b"<html>Service Unavailable</html>", "text/html")
+REJECTED = FakeResponse(200, json.dumps({"errors": [{"message": "Device not found"}]}).encode())
+
+
+def _outbox(hass, session: FakeSession) -> MutationOutbox:
+    api = OctopusSpain("test@example.com", "-", token=_token(), transport=KrakenGraphQLClient(session=session))
+
+    async def async_request_refresh():
+        pass
+
+    return MutationOutbox(hass, SimpleNamespace(api=api, async_request_refresh=async_request_refresh))
+
+
+def test_http_error_is_a_transport_error_and_queries_retry():
+    session = FakeSession(UNAVAILABLE)
+    client = KrakenGraphQLClient(session=session)
+    with pytest.raises(KrakenTransportError, match="503"):
+        asyncio.run(client.execute_raw(DEVICE_QUERY, {"accountNumber": ACCOUNT}))
+    assert session.requests == 2
+
+
+def test_undecodable_body_is_a_transport_error():
+    client = KrakenGraphQLClient(session=FakeSession(FakeResponse(200, b'{"data": {"devi')))
+    with pytest.raises(KrakenTransportError):
+        asyncio.run(client.execute(DEVICE_QUERY, {"accountNumber": ACCOUNT}))
+
+
+def test_503_queues_the_mutation():
+    async def run():
+        async with async_test_hass() as hass:
+            session = FakeSession(UNAVAILABLE)
+            outbox = _outbox(hass, session)
+
+            assert await outbox.async_submit(MUTATION_BOOST, {ACCOUNT: None}) is False
+            # Las mutaciones no se reintentan en el transporte: las reenvía la cola
+            assert session.requests == 1
+            [entry] = outbox.pending
+            assert entry["target"] == ACCOUNT
+            assert "503" in entry["last_error"]
+            outbox.async_shutdown()
+
+    asyncio.run(run())
+
+
+def test_rejected_mutation_keeps_the_pending_one():
+    async def run():
+        async with async_test_hass() as hass:
+            session = FakeSession(UNAVAILABLE)
+            outbox = _outbox(hass, session)
+            await outbox.async_submit(MUTATION_BOOST, {ACCOUNT: None})
+            [queued] = outbox.pending
+
+            session.response = REJECTED
+            assert await outbox.async_submit(MUTATION_BOOST, {ACCOUNT: None}) is False
+            assert outbox.pending == [queued]
+            outbox.async_shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+"""Tests del planificador semanal de carga."""
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent.planner import plan_week  # noqa: E402
+
+PRICES = {"P1": 0.25, "P2": 0.17, "P3": 0.09}
+BATTERY_KWH = 60
+POWER_KW = 7.4
+
+
+def _plan(departure: str, min_soc: int, **kwargs) -> dict:
+    needs = [{"departure": departure, "min_soc": min_soc}] * 7
+    return plan_week(PRICES, BATTERY_KWH, POWER_KW, needs, arrival_soc=30, plug_in="18:00", **kwargs)
+
+
+def test_cheap_night_fills_beyond_the_minimum_and_leaves_margin():
+    tuesday = _plan("09:00", 50)["days"][1]
+
+    # El valle (0-8 h) es más barato que la media: se carga hasta el tope diario (10 franjas
+    # de valle desde las 0 h) y el coche queda listo en cuanto terminan, no a la hora de salida
+    assert tuesday["soc"] == 90
+    assert tuesday["ready_by"] == "05:00"
+    assert tuesday["cost"] == pytest.approx(10 * POWER_KW / 2 * PRICES["P3"])
+
+
+def test_without_value_for_stored_energy_the_minimum_is_enough():
+    tuesday = _plan("09:00", 50, stored_value=0)["days"][1]
+
+    assert tuesday["soc"] == 50
+    assert tuesday["ready_by"] == "02:00"
+    assert tuesday["cost"] == pytest.approx(4 * POWER_KW / 2 * PRICES["P3"])
+
+
+def test_minimum_above_the_daily_cap_is_still_met():
+    tuesday = _plan("09:00", 95)["days"][1]
+
+    assert tuesday["feasible"]
+    assert tuesday["soc"] == 95
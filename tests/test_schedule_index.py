@@ -0,0 +1,55 @@
+"""Tests del índice semanal de horarios de carga."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent.planner import DAYS  # noqa: E402
+from custom_components.octopus_spain_intelligent.schedule_index import WeeklyScheduleIndex  # noqa: E402
+
+MADRID = timezone(timedelta(hours=1))
+MONDAY = datetime(2025, 3, 3, tzinfo=MADRID)
+
+
+def _schedule(day: str, time: str, soc: int) -> dict:
+    return {"dayOfWeek": day, "time": time, "max": str(soc)}
+
+
+def test_next_after_picks_the_following_schedule():
+    index = WeeklyScheduleIndex([_schedule(day, "07:30", 80) for day in DAYS])
+
+    before = index.next_after(MONDAY.replace(hour=7, minute=29))
+    assert before.ready_by == MONDAY.replace(hour=7, minute=30)
+    assert before.day == "MONDAY"
+    assert before.target_soc == 80
+
+    # Estrictamente posterior: a la misma hora ya cuenta el día siguiente
+    after = index.next_after(MONDAY.replace(hour=7, minute=30))
+    assert after.ready_by == MONDAY.replace(day=4, hour=7, minute=30)
+    assert after.day == "TUESDAY"
+
+
+def test_next_after_wraps_past_sunday():
+    index = WeeklyScheduleIndex([_schedule("MONDAY", "08:00", 60), _schedule("SUNDAY", "10:00", 90)])
+
+    charge = index.next_after(MONDAY.replace(day=9, hour=11))
+    assert charge.day == "MONDAY"
+    assert charge.ready_by == MONDAY.replace(day=10, hour=8)
+    assert charge.ready_by.tzinfo is MADRID
+    assert charge.target_soc == 60
+
+
+def test_single_schedule_already_past_today_is_next_week():
+    index = WeeklyScheduleIndex([_schedule("WEDNESDAY", "06:00", 70)])
+
+    assert index.next_after(MONDAY.replace(day=5, hour=5)).ready_by == MONDAY.replace(day=5, hour=6)
+    assert index.next_after(MONDAY.replace(day=5, hour=6)).ready_by == MONDAY.replace(day=12, hour=6)
+    assert index.next_after(MONDAY.replace(day=6, hour=6)).ready_by == MONDAY.replace(day=12, hour=6)
+
+
+def test_empty_or_invalid_schedules_have_no_next_charge():
+    index = WeeklyScheduleIndex([{"dayOfWeek": "HOLIDAY", "time": "07:00", "max": 80}, {"dayOfWeek": "MONDAY", "max": 80}])
+
+    assert not index
+    assert index.next_after(MONDAY) is None
@@ -0,0 +1,148 @@
+"""Tests del programador de ventanas de suspensión (necesitan Home Assistant instalado)."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.helpers.storage import Store  # noqa: E402
+
+from custom_components.octopus_spain_intelligent import scheduler as scheduler_module  # noqa: E402
+from custom_components.octopus_spain_intelligent.const import SMART_CONTROL_RESUME, SMART_CONTROL_SUSPEND  # noqa: E402
+from custom_components.octopus_spain_intelligent.scheduler import (  # noqa: E402
+    STORAGE_KEY,
+    STORAGE_VERSION,
+    SmartControlScheduler,
+)
+
+from common import async_test_hass  # noqa: E402
+
+MIDNIGHT = datetime(2025, 3, 1, 0, 0, tzinfo=timezone.utc)
+
+
+class FakeCoordinator:
+    """Anota cada mutación de control inteligente que enviaría el coordinador."""
+
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def set_smart_control(self, actions: dict) -> None:
+        self.calls.append(actions)
+
+
+class FakeTimers:
+    """Sustituye a `async_track_point_in_utc_time`: guarda los temporizadores sin dispararlos."""
+
+    def __init__(self):
+        self.pending: list[tuple] = []
+
+    def track(self, hass, action, when):
+        entry = (action, when)
+        self.pending.append(entry)
+        return lambda: self.pending.remove(entry)
+
+    async def fire(self, now: list) -> datetime:
+        """Dispara el único temporizador pendiente como lo haría Home Assistant a su hora."""
+        [(action, when)] = self.pending
+        self.pending.clear()
+        now[0] = when
+        await action(when)
+        return when
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [MIDNIGHT]
+    monkeypatch.setattr(scheduler_module.dt_util, "utcnow", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def timers(monkeypatch):
+    timers = FakeTimers()
+    monkeypatch.setattr(scheduler_module, "async_track_point_in_utc_time", timers.track)
+    return timers
+
+
+def _at(hours: float) -> datetime:
+    return MIDNIGHT + timedelta(hours=hours)
+
+
+def test_due_devices_are_batched_and_the_timer_is_rearmed(now, timers):
+    async def run():
+        async with async_test_hass() as hass:
+            coordinator = FakeCoordinator()
+            scheduler = SmartControlScheduler(hass, coordinator)
+            await scheduler.async_add_window("device-1", _at(1), _at(2))
+            await scheduler.async_add_window("device-2", _at(1), _at(3))
+            await scheduler.async_add_window("device-3", _at(1.5), _at(2))
+
+            # Un solo temporizador, en el límite más próximo de todas las ventanas
+            assert [when for _, when in timers.pending] == [_at(1)]
+
+            assert await timers.fire(now) == _at(1)
+            assert coordinator.calls == [{"device-1": SMART_CONTROL_SUSPEND, "device-2": SMART_CONTROL_SUSPEND}]
+            assert [when for _, when in timers.pending] == [_at(1.5)]
+
+            await timers.fire(now)
+            assert coordinator.calls[-1] == {"device-3": SMART_CONTROL_SUSPEND}
+
+            await timers.fire(now)
+            assert coordinator.calls[-1] == {"device-1": SMART_CONTROL_RESUME, "device-3": SMART_CONTROL_RESUME}
+            assert [window["device_id"] for window in scheduler.windows] == ["device-2"]
+
+            await timers.fire(now)
+            assert coordinator.calls[-1] == {"device-2": SMART_CONTROL_RESUME}
+            assert len(coordinator.calls) == 4
+            assert not scheduler.windows
+            assert not timers.pending
+
+    asyncio.run(run())
+
+
+def test_back_to_back_windows_keep_the_device_suspended(now, timers):
+    async def run():
+        async with async_test_hass() as hass:
+            coordinator = FakeCoordinator()
+            scheduler = SmartControlScheduler(hass, coordinator)
+            await scheduler.async_add_window("device-1", _at(1), _at(2))
+            await scheduler.async_add_window("device-1", _at(2), _at(3))
+
+            await timers.fire(now)
+            await timers.fire(now)
+            assert coordinator.calls[-1] == {"device-1": SMART_CONTROL_SUSPEND}
+            assert [when for _, when in timers.pending] == [_at(3)]
+
+            await timers.fire(now)
+            assert coordinator.calls[-1] == {"device-1": SMART_CONTROL_RESUME}
+
+    asyncio.run(run())
+
+
+def test_windows_are_restored_from_the_store(now, timers):
+    async def run():
+        async with async_test_hass() as hass:
+            await Store(hass, STORAGE_VERSION, STORAGE_KEY).async_save({"windows": [
+                {"device_id": "device-1", "start": _at(-3).isoformat(), "end": _at(-1).isoformat()},
+                {"device_id": "device-2", "start": _at(-1).isoformat(), "end": _at(2).isoformat()},
+                {"device_id": "device-3", "start": _at(1).isoformat(), "end": _at(4).isoformat()},
+            ]})
+
+            coordinator = FakeCoordinator()
+            scheduler = SmartControlScheduler(hass, coordinator)
+            await scheduler.async_load()
+
+            # La ventana ya terminada se descarta y la que está en curso se vuelve a aplicar
+            assert [window["device_id"] for window in scheduler.windows] == ["device-2", "device-3"]
+            assert coordinator.calls == [{"device-2": SMART_CONTROL_SUSPEND}]
+            assert [when for _, when in timers.pending] == [_at(1)]
+
+            await timers.fire(now)
+            assert coordinator.calls[-1] == {"device-3": SMART_CONTROL_SUSPEND}
+            stored = await Store(hass, STORAGE_VERSION, STORAGE_KEY).async_load()
+            assert [window["device_id"] for window in stored["windows"]] == ["device-2", "device-3"]
+            scheduler.async_shutdown()
+            assert not timers.pending
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+"""Tests del historial de transiciones y de las ventanas deslizantes."""
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.octopus_spain_intelligent.timeseries import DeviceHistory, RollingWindow, TransitionLog  # noqa: E402
+
+
+def test_transition_log_wraps_around_keeping_the_latest():
+    log = TransitionLog(capacity=3)
+    for timestamp, state in enumerate(["A", "B", "C", "D", "E"]):
+        log.append(float(timestamp), "currentState", state)
+
+    assert len(log) == 3
+    assert list(reversed(log)) == [(4.0, "currentState", "E"), (3.0, "currentState", "D"), (2.0, "currentState", "C")]
+    assert log.as_dict()["entries"] == [[2.0, "currentState", "C"], [3.0, "currentState", "D"], [4.0, "currentState", "E"]]
+    # Lo que ha salido del buffer ya no se encuentra
+    assert log.last("currentState", "B") is None
+    assert log.last("currentState", "D") == 3.0
+
+
+def test_transition_log_keeps_value_types_apart():
+    log = TransitionLog(capacity=4)
+    log.append(1.0, "isSuspended", True)
+    log.append(2.0, "currentState", 1)
+
+    assert log.last("isSuspended", True) == 1.0
+    assert [value for _, _, value in reversed(log)] == [1, True]
+    assert type(next(reversed(log))[2]) is int
+
+
+def test_rolling_window_evicts_and_trims_closed_intervals():
+    window = RollingWindow(window=100)
+    window.start(0)
+    window.stop(30)
+    window.start(50)
+    window.stop(60)
+
+    assert window.duration(60) == 40
+    assert window.count(60) == 2
+    # El primer intervalo se recorta por la izquierda...
+    assert window.duration(110) == 20 + 10
+    # ...y sale de la ventana en cuanto termina antes de su comienzo
+    assert window.duration(130) == 10
+    assert window.count(130) == 1
+    assert window.duration(160) == 0
+    assert window.count(160) == 0
+
+
+def test_rolling_window_counts_the_open_interval():
+    window = RollingWindow(window=100)
+    window.start(0)
+    window.start(10)  # Ya estaba abierto: no se reinicia
+
+    assert window.duration(40) == 40
+    assert window.duration(250) == 100
+    assert window.count(250) == 1
+
+
+def test_device_history_is_rebuilt_from_its_log():
+    history = DeviceHistory(capacity=8)
+    history.observe(0, {"currentState": "BOOSTING", "current": "LIVE", "isSuspended": False})
+    assert not history.observe(10, {"currentState": "BOOSTING", "current": "LIVE", "isSuspended": False})
+    history.observe(60, {"currentState": "SMART_CONTROL_CAPABLE", "current": "LIVE", "isSuspended": False})
+
+    restored = DeviceHistory.from_dict(history.as_dict(), capacity=8)
+    assert restored.windows["boosting"].duration(120) == 60
+    assert restored.last_values == history.last_values